@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""
+Time series aggregation for Generic Model energy system.
+
+The time series are clustered to typical periods (e.g. days or weeks) and
+only these periods are optimized. The seasonal thermal energy storage is
+linked across the typical periods by its storage level at the beginning of
+every original period (Kotzur et al. 2018).
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+import numpy as np
+import pandas as pd
+from pyomo import environ as po
+from scipy.cluster.hierarchy import linkage, fcluster
+from help_funcs import timestep_length
+
+
+def aggregate_periods(data, n_periods, period_length=24, columns=None):
+    """
+    Cluster time series to typical periods.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    n_periods : int
+        Number of typical periods.
+
+    period_length : int
+        Number of time steps of each period, e.g. 24 for typical days or 168
+        for typical weeks.
+
+    columns : list of str
+        Columns of data used for clustering. All columns are used by default.
+
+    Returns
+    -------
+    typical_data : pandas.DataFrame
+        Time series of the typical periods one after another with the time
+        index of the beginning of data.
+
+    cluster_order : numpy.ndarray
+        Typical period of every original period. A last incomplete original
+        period is represented by the beginning of its typical period.
+    """
+    if columns is None:
+        columns = data.columns
+
+    n_full = len(data) // period_length
+    remainder = len(data) - n_full * period_length
+    if n_full < 1:
+        raise ValueError(
+            f"The period length of {period_length} time steps exceeds the "
+            + f"{len(data)} time steps of the time series."
+            )
+
+    # Normalize every column to [0, 1] to weight them equally
+    values = data[columns].to_numpy(dtype=float)
+    value_range = values.max(axis=0) - values.min(axis=0)
+    value_range[value_range == 0] = 1
+    values = (values - values.min(axis=0)) / value_range
+
+    profiles = values[:n_full * period_length].reshape(n_full, -1)
+
+    if n_periods >= n_full:
+        labels = np.arange(n_full)
+    else:
+        labels = fcluster(
+            linkage(profiles, method='ward'), n_periods, criterion='maxclust'
+            )
+        labels = np.unique(labels, return_inverse=True)[1]
+
+    # Medoids are the original periods closest to the cluster centers
+    medoids = list()
+    for cluster in range(labels.max() + 1):
+        members = np.flatnonzero(labels == cluster)
+        center = profiles[members].mean(axis=0)
+        distance = ((profiles[members] - center)**2).sum(axis=1)
+        medoids.append(members[distance.argmin()])
+
+    cluster_order = labels
+    if remainder:
+        rest = values[n_full * period_length:].ravel()
+        distance = [
+            ((profiles[medoid, :rest.size] - rest)**2).sum()
+            for medoid in medoids
+            ]
+        cluster_order = np.append(labels, np.argmin(distance))
+
+    typical_data = pd.concat([
+        data.iloc[medoid * period_length:(medoid + 1) * period_length]
+        for medoid in medoids
+        ])
+    typical_data.index = data.index[:len(typical_data)]
+
+    return typical_data, cluster_order
+
+
+def period_weighting(cluster_order, period_length, periods):
+    """
+    Get objective weighting of the time steps of the typical periods.
+
+    Every time step is weighted with the number of original periods its
+    typical period represents.
+
+    Parameters
+    ----------
+    cluster_order : numpy.ndarray
+        Typical period of every original period.
+
+    period_length : int
+        Number of time steps of each period.
+
+    periods : int
+        Number of time steps of the original time series.
+
+    Returns
+    -------
+    numpy.ndarray
+        Weighting factor of every time step of the typical periods.
+    """
+    weighting = np.zeros((cluster_order.max() + 1) * period_length)
+    for step, cluster in zip(
+            range(0, periods, period_length), cluster_order):
+        length = min(period_length, periods - step)
+        start = cluster * period_length
+        weighting[start:start + length] += 1
+    return weighting
+
+
+def add_seasonal_storage_linking(model, param, cluster_order, period_length,
+                                 periods):
+    """
+    Link the seasonal storage level across the typical periods.
+
+    Within a typical period the storage content of solph is the deviation
+    from the storage level at the beginning of the period. The storage level
+    at the beginning of every original period is added as variable and
+    linked with the deviation at the end of its typical period.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the typical periods.
+
+    param : dict
+        JSON parameter file of user defined constants.
+
+    cluster_order : numpy.ndarray
+        Typical period of every original period.
+
+    period_length : int
+        Number of time steps of each period.
+
+    periods : int
+        Number of time steps of the original time series.
+    """
+    storage_block = model.GenericStorageBlock
+    storages = [
+        n for n in storage_block.STORAGES if str(n.label).startswith('TES_')
+        ]
+    n_typical = cluster_order.max() + 1
+    loss = (1 - param['TES']['Q_rel_loss'])**model.timeincrement[0]
+    cap = param['TES']['Q']
+
+    block = po.Block()
+    model.add_component('SeasonalStorageBlock', block)
+    # Storages are indexed by label to keep the variables out of the results
+    block.STORAGES = po.Set(initialize=[str(n.label) for n in storages])
+    block.PERIODS = po.Set(initialize=range(len(cluster_order) + 1))
+    block.TYPICAL_PERIODS = po.Set(initialize=range(n_typical))
+
+    block.storage_level = po.Var(
+        block.STORAGES, block.PERIODS, bounds=(0, cap)
+        )
+    block.deviation_max = po.Var(block.STORAGES, block.TYPICAL_PERIODS)
+    block.deviation_min = po.Var(block.STORAGES, block.TYPICAL_PERIODS)
+
+    block.deviation_max_cstr = po.ConstraintList()
+    block.deviation_min_cstr = po.ConstraintList()
+    block.period_start = po.ConstraintList()
+    block.linking = po.ConstraintList()
+    block.level_max = po.ConstraintList()
+    block.level_min = po.ConstraintList()
+    block.initial_level = po.ConstraintList()
+    block.balanced = po.ConstraintList()
+
+    for n in storages:
+        label = str(n.label)
+        i = list(n.inputs)[0]
+        o = list(n.outputs)[0]
+
+        # Every typical period starts without deviation
+        storage_block.init_content[n].fix(0)
+        if n in storage_block.STORAGES_BALANCED:
+            storage_block.balanced_cstr[n].deactivate()
+        for k in block.TYPICAL_PERIODS:
+            start = k * period_length
+            if k > 0:
+                storage_block.balance[n, start].deactivate()
+                block.period_start.add(
+                    storage_block.storage_content[n, start]
+                    == (model.flow[i, n, start]
+                        * n.inflow_conversion_factor[start]
+                        - model.flow[n, o, start]
+                        / n.outflow_conversion_factor[start])
+                    * model.timeincrement[start]
+                    )
+            for t in range(start, start + period_length):
+                storage_block.storage_content[n, t].setlb(-cap)
+                storage_block.storage_content[n, t].setub(cap)
+                block.deviation_max_cstr.add(
+                    block.deviation_max[label, k]
+                    >= storage_block.storage_content[n, t]
+                    )
+                block.deviation_min_cstr.add(
+                    block.deviation_min[label, k]
+                    <= storage_block.storage_content[n, t]
+                    )
+
+        for d, k in enumerate(cluster_order):
+            length = min(period_length, periods - d * period_length)
+            end = k * period_length + length - 1
+            block.linking.add(
+                block.storage_level[label, d + 1]
+                == (block.storage_level[label, d] * loss**length
+                    + storage_block.storage_content[n, end])
+                )
+            block.level_max.add(
+                block.storage_level[label, d]
+                + block.deviation_max[label, k] <= cap
+                )
+            block.level_min.add(
+                block.storage_level[label, d]
+                + block.deviation_min[label, k] >= 0
+                )
+
+        if param['TES']['init_storage'] is not None:
+            block.initial_level.add(
+                block.storage_level[label, 0]
+                == param['TES']['init_storage'] * cap
+                )
+        if param['TES']['balanced']:
+            block.balanced.add(
+                block.storage_level[label, len(cluster_order)]
+                == block.storage_level[label, 0]
+                )
+
+
+def remove_seasonal_storage_linking(model, param):
+    """
+    Get seasonal storage levels and remove the linking from the solved model.
+
+    The linking variables are not indexed by time steps and have to be
+    removed before processing the results with solph.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Solved optimization model of the typical periods.
+
+    param : dict
+        JSON parameter file of user defined constants.
+
+    Returns
+    -------
+    dict of numpy.ndarray
+        Seasonal storage level at the beginning of every original period per
+        storage label.
+    """
+    storage_levels = dict()
+    if param['TES']['active']:
+        block = model.SeasonalStorageBlock
+        for label in block.STORAGES:
+            storage_levels[label] = np.array([
+                block.storage_level[label, d].value for d in block.PERIODS
+                ])
+        model.del_component(block)
+    return storage_levels
+
+
+def disaggregate_results(results, storage_levels, param, cluster_order,
+                         period_length, timeindex):
+    """
+    Disaggregate results of the typical periods to the original time series.
+
+    Parameters
+    ----------
+    results : dict of pandas.Series and pandas.DataFrame
+        Full results from solph.processing.results() call of the model of the
+        typical periods.
+
+    storage_levels : dict of numpy.ndarray
+        Seasonal storage level at the beginning of every original period per
+        storage label.
+
+    param : dict
+        JSON parameter file of user defined constants.
+
+    cluster_order : numpy.ndarray
+        Typical period of every original period.
+
+    period_length : int
+        Number of time steps of each period.
+
+    timeindex : pandas.DatetimeIndex
+        Time index of the original time series.
+
+    Returns
+    -------
+    dict of pandas.Series and pandas.DataFrame
+        Results of the original time series.
+    """
+    periods = len(timeindex)
+    steps = np.concatenate([
+        k * period_length
+        + np.arange(min(period_length, periods - d * period_length))
+        for d, k in enumerate(cluster_order)
+        ])
+
+    if param['TES']['active']:
+        loss = (
+            (1 - param['TES']['Q_rel_loss'])**timestep_length(timeindex)
+            )
+        period_step = np.arange(periods) % period_length + 1
+        period_nr = np.arange(periods) // period_length
+
+    disaggregated_results = dict()
+    for key, res in results.items():
+        sequences = res['sequences'].iloc[steps].copy()
+        sequences.index = timeindex
+        if key[1] is None and str(key[0]) in storage_levels:
+            level = storage_levels[str(key[0])]
+            sequences['storage_content'] += (
+                level[period_nr] * loss**period_step
+                )
+        disaggregated_results[key] = {
+            'scalars': res['scalars'],
+            'sequences': sequences
+            }
+    return disaggregated_results
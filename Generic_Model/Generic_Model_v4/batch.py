@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+Batch runs of Generic Model energy system.
+
+Scenarios are given as overrides of the parameter file and solved in a
+process pool. The results of every scenario are written to their own
+directory as soon as the scenario is completed, so that an interrupted
+batch resumes with the missing scenarios.
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from copy import deepcopy
+from itertools import product
+
+import pandas as pd
+
+from generic_model_v4 import main
+from result_extraction import POSTPROCESSING_SUBSET
+from result_files import RESULT_FORMATS, write_results
+from result_store import store_run
+
+
+def parameter_grid(grid):
+    """
+    Get overrides of all combinations of the parameter values of a grid.
+
+    Parameters
+    ----------
+    grid : dict of list
+        Values of the parameters by flattened key, e.g.
+        {'TES.Q': [1000, 2000], 'param.gas_price': [20, 30]}.
+
+    Returns
+    -------
+    list of dict
+        Overrides of every combination.
+    """
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in product(*grid.values())]
+
+
+def apply_overrides(param, overrides):
+    """
+    Get parameters with overridden values.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    overrides : dict
+        Values of the parameters by flattened key, e.g. {'TES.Q': 1000}.
+
+    Returns
+    -------
+    dict
+        JSON parameter file with the overridden values.
+    """
+    scenario_param = deepcopy(param)
+    for key, value in overrides.items():
+        *path, name = key.split('.')
+        entry = scenario_param
+        for comp in path:
+            entry = entry[comp]
+        if name not in entry:
+            raise KeyError(f"The parameter '{key}' does not exist.")
+        entry[name] = value
+    return scenario_param
+
+
+def scenario_name(overrides):
+    """Get name of a scenario from the hash of its overrides."""
+    overrides_json = json.dumps(overrides, sort_keys=True, default=str)
+    return 'scenario_' + hashlib.sha1(overrides_json.encode()).hexdigest()[:10]
+
+
+def run_scenario(param, data, overrides, scenario_dir, threads, save_always,
+                 result_format, store_dir, kwargs):
+    """
+    Solve one scenario and write its results.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    overrides : dict
+        Values of the parameters by flattened key.
+
+    scenario_dir : str
+        Directory the results of the scenario are written to.
+
+    threads : int
+        Number of threads of the solver.
+
+    save_always : bool
+        Write the results even if the solver did not finish.
+
+    result_format : str
+        Format of the result files, either 'csv' or 'parquet'.
+
+    store_dir : str
+        Optional directory of a result store the results are added to.
+
+    kwargs : dict
+        Further keyword arguments passed to main().
+
+    Returns
+    -------
+    dict
+        Termination condition and Gesamtbetrag of the scenario.
+    """
+    scenario_param = apply_overrides(param, overrides)
+    data_dhs, data_invest, _, data_cost_units, meta_results = main(
+        scenario_param, data, threads=threads, **kwargs
+        )
+
+    termination = meta_results['status']['termination_condition']
+    summary = {
+        'termination_condition': termination,
+        'Gesamtbetrag': data_invest['Gesamtbetrag'].iloc[0]
+        }
+    if termination not in ['optimal', 'feasible'] and not save_always:
+        return summary
+
+    os.makedirs(scenario_dir, exist_ok=True)
+    with open(os.path.join(scenario_dir, 'overrides.json'), 'w') as file:
+        json.dump(overrides, file, indent=4, default=str)
+    write_results(
+        scenario_dir,
+        {'data_dhs': data_dhs, 'data_invest': data_invest,
+         'data_cost_units': data_cost_units},
+        result_format=result_format
+        )
+    if store_dir is not None:
+        store_run(
+            store_dir, scenario_param, data, data_dhs, data_invest,
+            data_cost_units, meta_results, result_format=result_format
+            )
+    # Meta results are written last and mark the scenario as completed
+    with open(os.path.join(scenario_dir, 'meta_results.json'), 'w') as file:
+        json.dump(meta_results, file, indent=4, default=str)
+
+    return summary
+
+
+def run_batch(param, data, scenarios, result_dir, processes=None,
+              threads=None, retries=1, result_format='csv', store_dir=None,
+              **kwargs):
+    """
+    Solve scenarios in a process pool and write their results.
+
+    Scenarios with results in result_dir are skipped, so that an interrupted
+    batch is resumed by calling it again. Scenarios that failed or did not
+    finish are retried. If a time limit is given, it is doubled for every
+    retry.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    scenarios : list of dict
+        Overrides of the parameters of every scenario by flattened key, e.g.
+        from parameter_grid().
+
+    result_dir : str
+        Directory the results of the scenarios are written to.
+
+    processes : int
+        Number of worker processes. Defaults to the number of CPUs.
+
+    threads : int
+        Number of solver threads of each worker. Defaults to the number of
+        CPUs divided by the number of workers. The threads of numpy are not
+        limited, as it is only used for small operations outside of the
+        solver.
+
+    retries : int
+        Number of retries of failed or timed-out scenarios.
+
+    result_format : str
+        Format of the result files of the scenarios, either 'csv' or
+        'parquet'. Parquet files are smaller and result_files.read_results()
+        loads single columns or time ranges of them.
+
+    store_dir : str
+        Optional directory of a result store the completed scenarios are
+        added to, so that they are queried with result_store.query_runs().
+
+    **kwargs
+        Further keyword arguments passed to main(), e.g. solver, mipgap or
+        time_limit. Only the variables the postprocessing needs are
+        extracted from the solved models, unless 'result_subset' is given.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Summary of all scenarios with their overrides, termination
+        condition, Gesamtbetrag and number of attempts.
+    """
+    if result_format not in RESULT_FORMATS:
+        raise ValueError(
+            f"The result format '{result_format}' does not exist. Choose "
+            + "either 'csv' or 'parquet'."
+            )
+    cpus = os.cpu_count() or 1
+    if processes is None:
+        processes = cpus
+    if threads is None:
+        threads = max(1, cpus // processes)
+    kwargs.setdefault('tee', False)
+    kwargs.setdefault('result_subset', POSTPROCESSING_SUBSET)
+
+    os.makedirs(result_dir, exist_ok=True)
+    summary_path = os.path.join(result_dir, 'summary.csv')
+    summary = {scenario_name(overrides): dict() for overrides in scenarios}
+    if os.path.exists(summary_path):
+        previous = pd.read_csv(summary_path, sep=';', index_col=0)
+        for name, row in previous.iterrows():
+            if name in summary:
+                summary[name] = row.dropna().to_dict()
+
+    pending = dict()
+    for overrides in scenarios:
+        name = scenario_name(overrides)
+        summary[name].update(overrides)
+        if not os.path.exists(
+                os.path.join(result_dir, name, 'meta_results.json')):
+            pending[name] = overrides
+
+    for attempt in range(retries + 1):
+        if not pending:
+            break
+        attempt_kwargs = dict(kwargs)
+        if kwargs.get('time_limit') is not None:
+            attempt_kwargs['time_limit'] = kwargs['time_limit'] * 2**attempt
+        save_always = attempt == retries
+
+        failed = dict()
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = {
+                executor.submit(
+                    run_scenario, param, data, overrides,
+                    os.path.join(result_dir, name), threads, save_always,
+                    result_format, store_dir, attempt_kwargs
+                    ): name
+                for name, overrides in pending.items()
+                }
+            for future in as_completed(futures):
+                name = futures[future]
+                summary[name]['attempts'] = attempt + 1
+                try:
+                    result = future.result()
+                except Exception as error:
+                    result = {
+                        'termination_condition': 'error',
+                        'error': repr(error)
+                        }
+                summary[name].pop('error', None)
+                summary[name].update(result)
+                if result['termination_condition'] not in [
+                        'optimal', 'feasible']:
+                    failed[name] = pending[name]
+                pd.DataFrame.from_dict(summary, orient='index').to_csv(
+                    summary_path, sep=';'
+                    )
+        pending = failed
+
+    return pd.DataFrame.from_dict(summary, orient='index')
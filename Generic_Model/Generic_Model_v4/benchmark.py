@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+Scaling benchmark of Generic Model energy system.
+
+Synthetic time series of different lengths (one week up to several years)
+are generated from the profile of a simulation data file and combined with
+parameter variants switching single components on or off. The build, solve
+and postprocessing time, the peak memory and the model size of every run
+are appended to a result file together with the current commit, so that
+regressions between commits become visible.
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+import os
+import subprocess
+from copy import deepcopy
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from generic_model_v4 import main
+from help_funcs import topology_check, TopologyError
+
+
+# Lengths of the synthetic time series in hours, the last one is two years
+LENGTHS = [168, 720, 2190, 8784, 17544]
+
+COMPONENTS = [
+    'EHK', 'SLK', 'BHKW', 'GuD', 'BPT', 'HP', 'LT-HP', 'TES', 'ST-TES', 'Sol'
+    ]
+
+# Phases of the run report summed up to the benchmarked times
+BENCHMARK_PHASES = {
+    'build_time': ['topology_check', 'components', 'model_build'],
+    'solve_time': ['solve'],
+    'postprocess_time': ['results', 'postprocessing']
+    }
+
+# Columns of the result file
+RESULT_COLUMNS = [
+    'commit', 'date', 'hours', 'variant', 'solver', 'backend'
+    ] + list(BENCHMARK_PHASES) + [
+    'total_time', 'peak_memory', 'peak_rss', 'variables', 'constraints',
+    'binaries', 'objective', 'termination_condition', 'Gesamtbetrag', 'error'
+    ]
+
+# Time series which are scaled by a random factor per repetition
+NOISY_COLUMNS = ['heat_demand', 'el_spot_price']
+
+
+def synthetic_data(template, hours, seed=0, noise=0.05):
+    """
+    Get synthetic time series of arbitrary length from a template.
+
+    The template is repeated to the requested length. Heat demand and spot
+    market price get multiplicative noise, so that repetitions of the
+    template (e.g. the years of a multi-year series) are not identical.
+
+    Parameters
+    ----------
+    template : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    hours : int
+        Number of hourly time steps.
+
+    seed : int
+        Seed of the random noise.
+
+    noise : float
+        Standard deviation of the relative noise.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Time dependent parameters with an hourly time index.
+    """
+    rng = np.random.default_rng(seed)
+    positions = np.arange(hours) % len(template)
+    data = template.iloc[positions].copy()
+    data.index = pd.date_range(
+        template.index[0], periods=hours, freq='h', name=template.index.name
+        )
+    for col in NOISY_COLUMNS:
+        if col in data.columns:
+            data[col] *= 1 + noise * rng.standard_normal(hours)
+    if 'heat_demand' in data.columns:
+        data['heat_demand'] = data['heat_demand'].clip(lower=0)
+    return data
+
+
+def parameter_variants(param, components=COMPONENTS, storage_exclusivity=()):
+    """
+    Get parameter variants with single components switched on or off.
+
+    Components the low temperature heat pump depends on (or which depend on
+    it) are switched as well to keep a valid topology. The back pressure
+    turbine is only switched on if the parameter file has its unit
+    parameters ('bpt').
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    components : list of str
+        Components to switch.
+
+    storage_exclusivity : list of str
+        Formulations of the storage exclusivity (see storage_exclusivity.py)
+        added as variants of the given parameters.
+
+    Returns
+    -------
+    dict of dict
+        Parameter files by variant name, e.g. 'base', 'without_TES',
+        'with_BPT' or 'storage_exclusivity_sos1'.
+    """
+    variants = {'base': deepcopy(param)}
+    for formulation in storage_exclusivity:
+        variant = deepcopy(param)
+        variant['param']['storage_exclusivity'] = formulation
+        variants['storage_exclusivity_' + formulation] = variant
+    for comp in components:
+        active = not param[comp]['active']
+        if comp == 'BPT' and active and 'bpt' not in param:
+            continue
+        variant = deepcopy(param)
+        variant[comp]['active'] = active
+
+        low_temperature = ['TES', 'Sol']
+        if comp == 'LT-HP' and not active:
+            for lt_comp in low_temperature:
+                variant[lt_comp]['active'] = False
+        elif comp == 'LT-HP' and active:
+            if not any(variant[c]['active'] for c in low_temperature):
+                variant['TES']['active'] = True
+        elif comp in low_temperature and active:
+            variant['LT-HP']['active'] = True
+        elif comp in low_temperature and not active:
+            if not any(variant[c]['active'] for c in low_temperature):
+                variant['LT-HP']['active'] = False
+
+        try:
+            topology_check(variant)
+        except TopologyError:
+            continue
+        variants[('with_' if active else 'without_') + comp] = variant
+    return variants
+
+
+def current_commit():
+    """Get hash of the current commit (None outside of a git repository)."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+            ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark_run(param, data, **kwargs):
+    """
+    Solve the Generic Model once and get its benchmark figures.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    **kwargs
+        Further keyword arguments passed to main().
+
+    Returns
+    -------
+    dict
+        Times in s, peak memory in MB, model size, objective and
+        termination condition of the run.
+    """
+    _, data_invest, _, _, meta_results = main(
+        param, data, run_report=True, **kwargs
+        )
+    report = meta_results['run_report']
+    phases = report['phases']
+
+    figures = {
+        name: sum(phases[phase]['wall_time'] for phase in names
+                  if phase in phases)
+        for name, names in BENCHMARK_PHASES.items()
+        }
+    figures['total_time'] = report['total_wall_time']
+    figures['peak_memory'] = max(
+        phase['peak_memory'] for phase in phases.values()
+        )
+    rss = [phase['rss'] for phase in phases.values() if phase['rss']]
+    figures['peak_rss'] = max(rss) if rss else None
+    figures.update(report['model_size'].get('total', dict()))
+    figures['objective'] = meta_results.get('objective')
+    figures['termination_condition'] = (
+        meta_results['status']['termination_condition']
+        )
+    figures['Gesamtbetrag'] = data_invest['Gesamtbetrag'].iloc[0]
+    return figures
+
+
+def run_benchmark(param, template, lengths=LENGTHS, components=COMPONENTS,
+                  result_file='benchmark_results.csv', solver='highs',
+                  seed=0, storage_exclusivity=(), **kwargs):
+    """
+    Run the benchmark for all lengths and parameter variants.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    template : pandas.DataFrame
+        csv file of user defined time dependent parameters the synthetic
+        time series are generated from.
+
+    lengths : list of int
+        Lengths of the time series in hours.
+
+    components : list of str
+        Components switched in the parameter variants. An empty list only
+        benchmarks the given parameters.
+
+    result_file : str
+        csv file the benchmark results are appended to. No file is written
+        if an empty string is given.
+
+    solver : str
+        Name of the solver, an open source solver by default.
+
+    seed : int
+        Seed of the synthetic time series.
+
+    storage_exclusivity : list of str
+        Formulations of the storage exclusivity benchmarked as further
+        variants, e.g. ['storage', 'lp'].
+
+    **kwargs
+        Further keyword arguments passed to main(), e.g. backend, mipgap or
+        time_limit.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Benchmark results of all runs.
+    """
+    kwargs.setdefault('tee', False)
+    commit = current_commit()
+    date = datetime.now().isoformat(timespec='seconds')
+    variants = parameter_variants(
+        param, components=components, storage_exclusivity=storage_exclusivity
+        )
+
+    rows = list()
+    for hours in lengths:
+        data = synthetic_data(template, hours, seed=seed)
+        for name, variant in variants.items():
+            row = {
+                'commit': commit, 'date': date, 'hours': hours,
+                'variant': name, 'solver': solver,
+                'backend': kwargs.get('backend', 'solph')
+                }
+            try:
+                row.update(benchmark_run(variant, data, solver=solver,
+                                         **kwargs))
+            except Exception as error:
+                row['termination_condition'] = 'error'
+                row['error'] = repr(error)
+            rows.append(row)
+
+            if result_file:
+                pd.DataFrame([row], columns=RESULT_COLUMNS).to_csv(
+                    result_file, sep=';', index=False, mode='a',
+                    header=not os.path.exists(result_file)
+                    )
+
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+
+def compare_benchmarks(results, reference, current=None, tolerance=0.2):
+    """
+    Compare the benchmark results of two commits.
+
+    Parameters
+    ----------
+    results : pandas.DataFrame
+        Benchmark results, e.g. read from the result file.
+
+    reference : str
+        Commit to compare with.
+
+    current : str
+        Commit to compare, defaults to the commit of the latest run.
+
+    tolerance : float
+        Relative increase of a time or the peak memory marked as
+        regression.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Ratio of the current to the reference figures per length and
+        variant and whether one of them exceeds the tolerance.
+    """
+    if current is None:
+        current = results.sort_values('date')['commit'].iloc[-1]
+
+    figures = list(BENCHMARK_PHASES) + ['total_time', 'peak_memory']
+    keys = ['hours', 'variant', 'solver', 'backend']
+    # Latest run of every length and variant per commit
+    latest = results.sort_values('date').groupby(
+        ['commit'] + keys
+        ).last().reset_index()
+    comparison = pd.merge(
+        latest[latest['commit'] == current][keys + figures],
+        latest[latest['commit'] == reference][keys + figures],
+        on=keys, suffixes=('', '_reference')
+        ).set_index(keys)
+
+    ratios = pd.DataFrame(index=comparison.index)
+    for col in figures:
+        ratios[col] = comparison[col] / comparison[col + '_reference']
+    ratios['regression'] = (ratios[figures] > 1 + tolerance).any(axis=1)
+    return ratios
+
+
+if __name__ == '__main__':
+    import json
+    with open(os.path.join('input', 'parameter.json'), 'r') as file:
+        param = json.load(file)
+    template = pd.read_csv(
+        os.path.join('input', 'simulation_data.csv'), sep=';', index_col=0,
+        parse_dates=True
+        )
+    run_benchmark(param, template)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Fidelity levels of the CHPs of Generic Model energy system.
+
+The model of every CHP component (BHKW, GuD and BPT) is chosen with
+'fidelity' in its parameters:
+
+- 'milp' is the full GenericCHP with a binary operating status (default)
+- 'lp' is the GenericCHP with a continuous operating status. As all
+  constraints of the GenericCHP are homogeneous in the operating status and
+  the flows, this is the convex hull of the P-Q-fuel operating envelope and
+  the switched off CHP, so that the CHP is modelled without binaries.
+- 'fixed_ratio' is a transformer converting the fuel to power and heat with
+  the fixed ratio of the maximal load point with maximal heat extraction
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+import numpy as np
+from pyomo.environ import NonNegativeReals
+
+
+CHP_FIDELITY = ['milp', 'lp', 'fixed_ratio']
+
+# Labels of the units of the CHP components start with
+CHP_LABELS = {'BHKW': 'BHKW', 'GuD': 'GuD', 'BPT': 'bpt'}
+
+
+def chp_fidelity(param, comp):
+    """Get fidelity level of a CHP component."""
+    fidelity = param[comp].get('fidelity', 'milp')
+    if fidelity not in CHP_FIDELITY:
+        raise ValueError(
+            f"The fidelity '{fidelity}' of {comp} does not exist. Choose one "
+            + "of " + ", ".join(f"'{f}'" for f in CHP_FIDELITY) + "."
+            )
+    return fidelity
+
+
+def fixed_ratio_factors(chp, periods):
+    """
+    Get fuel flow and efficiencies of a CHP with fixed power to heat ratio.
+
+    The efficiencies are those of the maximal load point of the GenericCHP
+    with maximal heat extraction, where the losses are the flue gas losses
+    and the minimal condenser heat.
+
+    Parameters
+    ----------
+    chp : dict
+        GenericCHP parameters of the CHP (see components.chp_parameters).
+
+    periods : int
+        Number of time steps of the optimization.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        Fuel flow at the maximal load point, electrical and thermal
+        efficiency of every time step.
+    """
+    def series(value):
+        return np.broadcast_to(np.asarray(value, dtype=float), (periods,))
+
+    p_max = series(chp['P_max_woDH'])
+    beta = series(chp['Beta'])
+    fuel = p_max / series(chp['Eta_el_max_woDH'])
+    heat = np.maximum(
+        (fuel * (1 - series(chp['H_L_FG_share_max']))
+         - series(chp['Q_CW_min']) - p_max) / (1 - beta),
+        0
+        )
+    power = p_max - beta * heat
+    return fuel, power / fuel, heat / fuel
+
+
+def relax_chp_status(model, param):
+    """
+    Relax the operating status of the CHPs with fidelity 'lp'.
+
+    The status keeps its upper bound, which is the number of units of
+    aggregated units.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    param : dict
+        JSON parameter file of user defined constants.
+    """
+    prefixes = tuple(
+        CHP_LABELS[comp] for comp in CHP_LABELS
+        if param[comp]['active'] and chp_fidelity(param, comp) == 'lp'
+        )
+    if not prefixes or not hasattr(model, 'GenericCHPBlock'):
+        return
+
+    block = model.GenericCHPBlock
+    for n in block.GENERICCHPS:
+        if str(n).startswith(prefixes):
+            for t in model.TIMESTEPS:
+                upper = block.Y[n, t].ub
+                block.Y[n, t].domain = NonNegativeReals
+                block.Y[n, t].setub(upper)
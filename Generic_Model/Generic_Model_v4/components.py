@@ -7,7 +7,12 @@ Created on Wed Aug 11 11:04:43 2021
 
 from math import inf
 import oemof.solph as solph
-from help_funcs import liste, ComponentTypeError, SolarUsageError
+from help_funcs import (
+    liste, unit_parameters, ComponentTypeError, SolarUsageError
+    )
+from unit_aggregation import aggregated_amount, unit_labels
+from chp_fidelity import chp_fidelity, fixed_ratio_factors
+from investment import size_kwargs, solar_scale
 
 
 def gas_source(param, busses):
@@ -204,6 +209,8 @@ def solar_thermal_source(param, data, busses):
     Solar thermal source uses the following parameters:
     - 'usage' is parameter wether solar thermal is used in high temperature
       network or low temperature network in in MWh/m^2
+    - 'A' is the collector area in m^2
+    - 'invest' optionally optimizes the collector area (see investment.py)
     - 'op_cost_var' are the variable operational costs in €/MWh
 
     Topology
@@ -216,8 +223,7 @@ def solar_thermal_source(param, data, busses):
         label='Solarthermie',
         outputs={busses['sol_node']: solph.Flow(
             variable_costs=param['Sol']['op_cost_var'],
-            nominal_value=(max((data['solar_data_' + param['Sol']['usage']])
-                               * param['Sol']['A'])),
+            **size_kwargs(param, 'Sol', scale=solar_scale(param, data)),
             fix=(data['solar_data_' + param['Sol']['usage']]
                  / max(data['solar_data_' + param['Sol']['usage']])))}
         )
@@ -428,6 +434,10 @@ def electric_boiler(param, data, busses):
     - 'active' is a binary parameter wether is used or not
     - 'type' defines wether it is used constant or time dependent
     - 'amount' is the amount of this components installed
+    - 'aggregate' optionally models the units as one aggregated unit with
+      the number of running units as status (see unit_aggregation.py)
+    - 'invest' optionally optimizes the nominal value 'Q_N' (see
+      investment.py)
 
     - 'Q_N' is the constant nominal value in MWh
     - 'Q_min_rel' is a scaling factor for minimal heat output
@@ -445,36 +455,37 @@ def electric_boiler(param, data, busses):
     Output: High temperature heat network (wnw)
     """
     if param['EHK']['active']:
+        scale = aggregated_amount(param, 'EHK')
+        ehk = list()
         if param['EHK']['type'] == 'constant':
-            for i in range(1, param['EHK']['amount']+1):
-                ehk = solph.Transformer(
-                    label='Elektroheizkessel_' + str(i),
+            for label in unit_labels(param, 'EHK'):
+                ehk.append(solph.Transformer(
+                    label=label,
                     inputs={busses['enw']: solph.Flow()},
                     outputs={busses['wnw']: solph.Flow(
-                        nominal_value=param['EHK']['Q_N'],
+                        **size_kwargs(param, 'EHK', scale=scale),
                         max=1,
                         min=param['EHK']['Q_min_rel'],
                         variable_costs=(
                             param['EHK']['op_cost_var']
                             + param['param']['elec_consumer_charges_self']))},
-                    conversion_factors={busses['wnw']: param['EHK']['eta']})
-                return ehk
+                    conversion_factors={busses['wnw']: param['EHK']['eta']}))
         elif param['EHK']['type'] == 'time series':
-            for i in range(1, param['EHK']['amount']+1):
-                ehk = solph.Transformer(
-                    label='Elektroheizkessel_' + str(i),
+            for label in unit_labels(param, 'EHK'):
+                ehk.append(solph.Transformer(
+                    label=label,
                     inputs={busses['enw']: solph.Flow()},
                     outputs={busses['wnw']: solph.Flow(
                         nominal_value=1,
-                        max=data['Q_EHK'],
-                        min=data['Q_EHK'] * param['EHK']['Q_min_rel'],
+                        max=data['Q_EHK'] * scale,
+                        min=data['Q_EHK'] * param['EHK']['Q_min_rel'] * scale,
                         variable_costs=(
                             param['EHK']['op_cost_var']
                             + param['param']['elec_consumer_charges_self']))},
-                    conversion_factors={busses['wnw']: param['EHK']['eta']})
-                return ehk
+                    conversion_factors={busses['wnw']: param['EHK']['eta']}))
         else:
             raise ComponentTypeError(param['EHK']['type'], 'EHK')
+        return ehk
 
 
 def peak_load_boiler(param, data, busses):
@@ -498,6 +509,10 @@ def peak_load_boiler(param, data, busses):
     - 'active' is a binary parameter wether is used or not
     - 'type' defines wether it is used constant or time dependent
     - 'amount' is the amount of this components installed
+    - 'aggregate' optionally models the units as one aggregated unit with
+      the number of running units as status (see unit_aggregation.py)
+    - 'invest' optionally optimizes the nominal value 'Q_N' (see
+      investment.py)
 
     - 'Q_N' is the constant nominal value in MWh
     - 'Q_min_rel' is a scaling factor for minimal heat output
@@ -514,36 +529,37 @@ def peak_load_boiler(param, data, busses):
     Output: High temperature heat network (wnw)
     """
     if param['SLK']['active']:
+        scale = aggregated_amount(param, 'SLK')
+        slk = list()
         if param['SLK']['type'] == 'constant':
-            for i in range(1, param['SLK']['amount']+1):
-                slk = solph.Transformer(
-                    label='Spitzenlastkessel_' + str(i),
+            for label in unit_labels(param, 'SLK'):
+                slk.append(solph.Transformer(
+                    label=label,
                     inputs={busses['gnw']: solph.Flow()},
                     outputs={busses['wnw']: solph.Flow(
-                        nominal_value=param['SLK']['Q_N'],
+                        **size_kwargs(param, 'SLK', scale=scale),
                         max=param['SLK']['Q_max_rel'],
                         min=param['SLK']['Q_min_rel'],
                         variable_costs=(
                             param['SLK']['op_cost_var']
                             + param['param']['energy_tax']))},
-                    conversion_factors={busses['wnw']: param['SLK']['eta']})
-                return slk
+                    conversion_factors={busses['wnw']: param['SLK']['eta']}))
         elif param['SLK']['type'] == 'time series':
-            for i in range(1, param['SLK']['amount']+1):
-                slk = solph.Transformer(
-                    label='Spitzenlastkessel_' + str(i),
+            for label in unit_labels(param, 'SLK'):
+                slk.append(solph.Transformer(
+                    label=label,
                     inputs={busses['gnw']: solph.Flow()},
                     outputs={busses['wnw']: solph.Flow(
                         nominal_value=1,
-                        max=data['Q_SLK'],
+                        max=data['Q_SLK'] * scale,
                         min=0,
                         variable_costs=(
                             param['SLK']['op_cost_var']
                             + param['param']['energy_tax']))},
-                    conversion_factors={busses['wnw']: param['SLK']['eta']})
-                return slk
+                    conversion_factors={busses['wnw']: param['SLK']['eta']}))
         else:
             raise ComponentTypeError(param['SLK']['type'], 'SLK')
+        return slk
 
 
 def internal_combustion_engine(param, data, busses, periods):
@@ -570,6 +586,12 @@ def internal_combustion_engine(param, data, busses, periods):
     - 'active' is a binary parameter wether is used or not
     - 'type' defines wether it is used constant or time dependent
     - 'amount' is the amount of this components installed
+    - 'aggregate' optionally models the units as one aggregated unit with
+      the number of running units as status (see unit_aggregation.py)
+    - 'symmetry_breaking' optionally orders the separately modelled units
+      by their operating status and heat output (see unit_aggregation.py)
+    - 'fidelity' optionally is the model of the CHP, either 'milp', 'lp' or
+      'fixed_ratio' (see chp_fidelity.py)
 
     - 'op_cost_var' are the variable operational costs in €/MWh
     - 'chp_bonus' is the revenue for the electricity sold by chp
@@ -587,16 +609,20 @@ def internal_combustion_engine(param, data, busses, periods):
     Output: High temperature heat network (wnw), electricity network (enw)
     """
     if param['BHKW']['active']:
+        if chp_fidelity(param, 'BHKW') == 'fixed_ratio':
+            return fixed_ratio_chp(param, data, busses, 'BHKW')
+        scale = aggregated_amount(param, 'BHKW')
+        bhkw = list()
         if param['BHKW']['type'] == 'constant':
-            for i in range(1, param['BHKW']['amount']+1):
-                bhkw = solph.components.GenericCHP(
-                    label='BHKW_' + str(i),
+            for label in unit_labels(param, 'BHKW'):
+                bhkw.append(solph.components.GenericCHP(
+                    label=label,
                     fuel_input={busses['gnw']: solph.Flow(
                         H_L_FG_share_max=liste(
                             param['BHKW']['H_L_FG_share_max'], periods),
                         H_L_FG_share_min=liste(
                             param['BHKW']['H_L_FG_share_min'], periods),
-                        nominal_value=param['BHKW']['Q_in'])},
+                        nominal_value=param['BHKW']['Q_in'] * scale)},
                     electrical_output={busses['enw']: solph.Flow(
                         variable_costs=(
                             param['BHKW']['op_cost_var']
@@ -611,16 +637,15 @@ def internal_combustion_engine(param, data, busses, periods):
                     heat_output={busses['wnw']: solph.Flow(
                         Q_CW_min=liste(0, periods))},
                     Beta=liste(0, periods),
-                    back_pressure=False)
-                return bhkw
+                    back_pressure=False))
         elif param['BHKW']['type'] == 'time series':
-            for i in range(1, param['BHKW']['amount']+1):
-                bhkw = solph.components.GenericCHP(
-                    label='BHKW_' + str(i),
+            for label in unit_labels(param, 'BHKW'):
+                bhkw.append(solph.components.GenericCHP(
+                    label=label,
                     fuel_input={busses['gnw']: solph.Flow(
                         H_L_FG_share_max=data['ICE_H_L_FG_share_max'].tolist(),
                         H_L_FG_share_min=data['ICE_H_L_FG_share_min'].tolist(),
-                        nominal_value=data['ICE_Q_in'].mean())},
+                        nominal_value=data['ICE_Q_in'].mean() * scale)},
                     electrical_output={busses['enw']: solph.Flow(
                         variable_costs=(
                             param['BHKW']['op_cost_var']
@@ -633,10 +658,10 @@ def internal_combustion_engine(param, data, busses, periods):
                     heat_output={busses['wnw']: solph.Flow(
                         Q_CW_min=liste(0, periods))},
                     Beta=liste(0, periods),
-                    back_pressure=False)
-                return bhkw
+                    back_pressure=False))
         else:
             raise ComponentTypeError(param['BHKW']['type'], 'BHKW')
+        return bhkw
 
 
 def combined_cycle_extraction_turbine(param, data, busses, periods):
@@ -663,6 +688,12 @@ def combined_cycle_extraction_turbine(param, data, busses, periods):
     - 'active' is a binary parameter wether is used or not
     - 'type' defines wether it is used constant or time dependent
     - 'amount' is the amount of this components installed
+    - 'aggregate' optionally models the units as one aggregated unit with
+      the number of running units as status (see unit_aggregation.py)
+    - 'symmetry_breaking' optionally orders the separately modelled units
+      by their operating status and heat output (see unit_aggregation.py)
+    - 'fidelity' optionally is the model of the CHP, either 'milp', 'lp' or
+      'fixed_ratio' (see chp_fidelity.py)
     - 'op_cost_var' are the variable operational costs in €/MWh
     - 'chp_bonus' is the revenue for the electricity sold by chp
     - 'TEHG_bonus' is the revenue for participation in the Emmisions Trading
@@ -679,14 +710,18 @@ def combined_cycle_extraction_turbine(param, data, busses, periods):
     Output: High temperature heat network (wnw), electricity network (enw)
     """
     if param['GuD']['active']:
+        if chp_fidelity(param, 'GuD') == 'fixed_ratio':
+            return fixed_ratio_chp(param, data, busses, 'GuD')
+        scale = aggregated_amount(param, 'GuD')
+        gud = list()
         if param['GuD']['type'] == 'constant':
-            for i in range(1, param['GuD']['amount']+1):
-                gud = solph.components.GenericCHP(
-                    label='GuD_' + str(i),
+            for label in unit_labels(param, 'GuD'):
+                gud.append(solph.components.GenericCHP(
+                    label=label,
                     fuel_input={busses['gnw']: solph.Flow(
                         H_L_FG_share_max=liste(
                             param['GuD']['H_L_FG_share_max'], periods),
-                        nominal_value=param['GuD']['Q_in'])},
+                        nominal_value=param['GuD']['Q_in'] * scale)},
                     electrical_output={busses['enw']: solph.Flow(
                         variable_costs=(
                             param['GuD']['op_cost_var']
@@ -703,16 +738,15 @@ def combined_cycle_extraction_turbine(param, data, busses, periods):
                     heat_output={busses['wnw']: solph.Flow(
                         Q_CW_min=liste(param['GuD']['Q_CW_min'], periods))},
                     Beta=liste(param['GuD']['beta'], periods),
-                    back_pressure=False)
-                return gud
+                    back_pressure=False))
         elif param['GuD']['type'] == 'time series':
-            for i in range(1, param['GuD']['amount']+1):
-                gud = solph.components.GenericCHP(
-                    label='GuD_' + str(i),
+            for label in unit_labels(param, 'GuD'):
+                gud.append(solph.components.GenericCHP(
+                    label=label,
                     fuel_input={busses['gnw']: solph.Flow(
                         H_L_FG_share_max=(
                             data['CCET_H_L_FG_share_max'].tolist()),
-                        nominal_value=data['CCET_Q_in'].mean())},
+                        nominal_value=data['CCET_Q_in'].mean() * scale)},
                     electrical_output={busses['enw']: solph.Flow(
                         variable_costs=(
                             param['GuD']['op_cost_var']
@@ -725,10 +759,10 @@ def combined_cycle_extraction_turbine(param, data, busses, periods):
                     heat_output={busses['wnw']: solph.Flow(
                         Q_CW_min=data['CCET_Q_CW_min'].tolist())},
                     Beta=data['CCET_beta'].tolist(),
-                    back_pressure=False)
-                return gud
+                    back_pressure=False))
         else:
             raise ComponentTypeError(param['GuD']['type'], 'GuD')
+        return gud
 
 
 def back_pressure_turbine(param, data, busses, periods):
@@ -755,6 +789,8 @@ def back_pressure_turbine(param, data, busses, periods):
     - 'active' is a binary parameter wether is used or not
     - 'type' defines wether it is used constant or time dependent
     - 'amount' is the amount of this components installed
+    - 'fidelity' optionally is the model of the CHP, either 'milp', 'lp' or
+      'fixed_ratio' (see chp_fidelity.py)
     - 'op_cost_var' are the variable operational costs in €/MWh
     - 'chp_bonus' is the revenue for the electricity sold by chp
     - 'TEHG_bonus' is the revenue for participation in the Emmisions Trading
@@ -771,6 +807,8 @@ def back_pressure_turbine(param, data, busses, periods):
     Output: High temperature heat network (wnw), electricity network (enw)
     """
     if param['BPT']['active']:
+        if chp_fidelity(param, 'BPT') == 'fixed_ratio':
+            return fixed_ratio_chp(param, data, busses, 'BPT')[0]
         if param['BPT']['type'] == 'constant':
             for i in range(1, param['BPT']['amount']+1):
                 bpt = solph.components.GenericCHP(
@@ -820,6 +858,118 @@ def back_pressure_turbine(param, data, busses, periods):
             raise ComponentTypeError(param['bpt']['type'], 'bpt')
 
 
+def chp_parameters(param, data, comp):
+    """
+    Get labels of the units and GenericCHP parameters of a CHP component.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    comp : str
+        Name of the component, one of 'BHKW', 'GuD' or 'BPT'.
+
+    Returns
+    -------
+    tuple
+        Labels of the units of the CHP and dict of its parameters.
+    """
+    # The back pressure turbine uses its own key for the unit parameters
+    prm = param['bpt'] if comp == 'BPT' else param[comp]
+    labels = ['bpt1'] if comp == 'BPT' else unit_labels(param, comp)
+    prefix = {'BHKW': 'ICE', 'GuD': 'CCET', 'BPT': 'BPT'}[comp]
+
+    chp = {
+        'units': aggregated_amount(param, comp),
+        'back_pressure': comp == 'BPT',
+        'variable_costs': (
+            prm['op_cost_var'] - prm['chp_bonus'] - prm['TEHG_bonus']
+            ),
+        'H_L_FG_share_min': None,
+        'Q_CW_min': 0,
+        'Beta': 0
+        }
+
+    if param[comp]['type'] == 'constant':
+        for key in ['Q_in', 'P_max_woDH', 'P_min_woDH', 'Eta_el_max_woDH',
+                    'Eta_el_min_woDH', 'H_L_FG_share_max']:
+            chp[key] = prm[key]
+        if comp == 'BHKW':
+            chp['H_L_FG_share_min'] = prm['H_L_FG_share_min']
+        elif comp == 'GuD':
+            chp['Q_CW_min'] = prm['Q_CW_min']
+            chp['Beta'] = prm['beta']
+    elif param[comp]['type'] == 'time series':
+        eta = 'Eta_el_{}_woDH' if comp == 'BPT' else 'eta_el_{}'
+        chp['Q_in'] = data[prefix + '_Q_in'].mean()
+        for key in ['P_max_woDH', 'P_min_woDH', 'H_L_FG_share_max']:
+            chp[key] = data[prefix + '_' + key]
+        chp['Eta_el_max_woDH'] = data[prefix + '_' + eta.format('max')]
+        chp['Eta_el_min_woDH'] = data[prefix + '_' + eta.format('min')]
+        if comp == 'BHKW':
+            chp['H_L_FG_share_min'] = data['ICE_H_L_FG_share_min']
+        elif comp == 'GuD':
+            chp['Q_CW_min'] = data['CCET_Q_CW_min']
+            chp['Beta'] = data['CCET_beta']
+    else:
+        raise ComponentTypeError(param[comp]['type'], comp)
+
+    return labels, chp
+
+
+def fixed_ratio_chp(param, data, busses, comp):
+    r"""
+    Get CHP with fixed power to heat ratio for Generic Model energy system.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    busses : dict of solph.Bus
+        Busses of the energy system.
+
+    comp : str
+        Name of the component, one of 'BHKW', 'GuD' or 'BPT'.
+
+    Note
+    ----
+    The fuel is converted to power and heat with the efficiencies of the
+    maximal load point of the GenericCHP parameters (see
+    chp_fidelity.fixed_ratio_factors), there is neither a minimal load nor
+    an operating status.
+
+    Topology
+    --------
+    Input: Gas network (gnw)
+
+    Output: High temperature heat network (wnw), electricity network (enw)
+    """
+    labels, chp = chp_parameters(param, data, comp)
+    fuel, eta_el, eta_th = fixed_ratio_factors(chp, len(data))
+    chps = list()
+    for label in labels:
+        chps.append(solph.Transformer(
+            label=label,
+            inputs={busses['gnw']: solph.Flow(
+                nominal_value=fuel.max() * chp['units'],
+                max=fuel / fuel.max())},
+            outputs={
+                busses['enw']: solph.Flow(
+                    variable_costs=chp['variable_costs']),
+                busses['wnw']: solph.Flow()},
+            conversion_factors={
+                busses['enw']: eta_el, busses['wnw']: eta_th}))
+    return chps
+
+
 def ht_heat_pump(param, data, busses):
     r"""
     Get high temperature heat pump for Generic Model energy system.
@@ -841,6 +991,10 @@ def ht_heat_pump(param, data, busses):
     - 'active' is a binary parameter wether is used or not
     - 'type' defines wether it is used constant or time dependent
     - 'amount' is the amount of this components installed
+    - 'aggregate' optionally models the units as one aggregated unit with
+      the number of running units as status (see unit_aggregation.py)
+    - 'symmetry_breaking' optionally orders the separately modelled units
+      by their operating status and heat output (see unit_aggregation.py)
 
     - 'P_max' is the constant maximum output power in MW
     - 'P_min' is the constant minimum output power in MW
@@ -861,10 +1015,11 @@ def ht_heat_pump(param, data, busses):
     Output: High temperature heat network (wnw)
     """
     if param['HP']['active']:
+        ht_hp = list()
         if param['HP']['type'] == 'constant':
-            for i in range(1, param['HP']['amount']+1):
-                ht_hp = solph.components.OffsetTransformer(
-                    label='HP_' + str(i),
+            for label in unit_labels(param, 'HP'):
+                ht_hp.append(solph.components.OffsetTransformer(
+                    label=label,
                     inputs={busses['enw']: solph.Flow(
                         nominal_value=param['HP']['P_max'],
                         max=1,
@@ -874,12 +1029,11 @@ def ht_heat_pump(param, data, busses):
                         nonconvex=solph.NonConvex())},
                     outputs={busses['wnw']: solph.Flow(
                         variable_costs=param['HP']['op_cost_var'])},
-                    coefficients=[param['HP']['c_0'], param['HP']['c_1']])
-                return ht_hp
+                    coefficients=[param['HP']['c_0'], param['HP']['c_1']]))
         elif param['HP']['type'] == 'time series':
-            for i in range(1, param['HP']['amount']+1):
-                ht_hp = solph.components.OffsetTransformer(
-                    label='HP_' + str(i),
+            for label in unit_labels(param, 'HP'):
+                ht_hp.append(solph.components.OffsetTransformer(
+                    label=label,
                     inputs={busses['enw']: solph.Flow(
                         nominal_value=1,
                         max=data['P_max_hp'],
@@ -889,10 +1043,10 @@ def ht_heat_pump(param, data, busses):
                         nonconvex=solph.NonConvex())},
                     outputs={busses['wnw']: solph.Flow(
                         variable_costs=param['HP']['op_cost_var'])},
-                    coefficients=[data['c_0_hp'], data['c_1_hp']])
-                return ht_hp
+                    coefficients=[data['c_0_hp'], data['c_1_hp']]))
         else:
             raise ComponentTypeError(param['HP']['type'], 'HP')
+        return ht_hp
 
 
 def lt_heat_pump(param, data, busses):
@@ -916,6 +1070,8 @@ def lt_heat_pump(param, data, busses):
     - 'active' is a binary parameter wether is used or not
     - 'type' defines wether it is used constant or time dependent
     - 'amount' is the amount of this components installed
+    - 'aggregate' optionally models the units as one aggregated unit with
+      the number of running units as status (see unit_aggregation.py)
 
     - 'cop' is the constant coefficient of performance
 
@@ -932,10 +1088,11 @@ def lt_heat_pump(param, data, busses):
     Output: High temperature heat network (wnw)
     """
     if param['LT-HP']['active']:
+        lt_hp = list()
         if param['LT-HP']['type'] == 'constant':
-            for i in range(1, param['LT-HP']['amount']+1):
-                lt_hp = solph.Transformer(
-                    label="LT-HP_" + str(i),
+            for label in unit_labels(param, 'LT-HP'):
+                lt_hp.append(solph.Transformer(
+                    label=label,
                     inputs={
                         busses['lt_wnw']: solph.Flow(),
                         busses['enw']: solph.Flow(
@@ -948,12 +1105,11 @@ def lt_heat_pump(param, data, busses):
                     conversion_factors={
                         busses['enw']: 1 / param['LT-HP']['cop'],
                         busses['lt_wnw']: ((param['LT-HP']['cop']-1)
-                                           / param['LT-HP']['cop'])})
-                return lt_hp
+                                           / param['LT-HP']['cop'])}))
         elif param['LT-HP']['type'] == 'time series':
-            for i in range(1, param['LT-HP']['amount']+1):
-                lt_hp = solph.Transformer(
-                    label="LT-HP_" + str(i),
+            for label in unit_labels(param, 'LT-HP'):
+                lt_hp.append(solph.Transformer(
+                    label=label,
                     inputs={
                         busses['lt_wnw']: solph.Flow(),
                         busses['enw']: solph.Flow(
@@ -966,10 +1122,10 @@ def lt_heat_pump(param, data, busses):
                     conversion_factors={
                         busses['enw']: 1/data['cop_lthp'],
                         busses['lt_wnw']: (data['cop_lthp']-1)/data['cop_lthp']
-                        })
-                return lt_hp
+                        }))
         else:
             raise ComponentTypeError(param['LT-HP']['type'], 'LT-HP')
+        return lt_hp
 
 
 def seasonal_thermal_energy_storage_strand(param, busses):
@@ -998,7 +1154,7 @@ def seasonal_thermal_energy_storage_strand(param, busses):
         aux_trafo_2 = auxiliary_transformer(
             'LT_to_TES_node', busses['lt_wnw'], busses['wnw_node']
                 )
-    return (stes, aux_trafo_1, aux_trafo_2)
+    return (*stes, aux_trafo_1, aux_trafo_2)
 
 
 def seasonal_thermal_energy_storage(param, busses):
@@ -1018,6 +1174,9 @@ def seasonal_thermal_energy_storage(param, busses):
     Seasonal thermal energy storage uses the following parameters:
     - 'active' is a binary parameter wether is used or not
     - 'amount' is the amount of this components installed
+    - 'symmetry_breaking' optionally orders the units by their charged heat
+      (see unit_aggregation.py)
+    - 'invest' optionally optimizes the capacity 'Q' (see investment.py)
 
     - 'Q_N_in' is the constant nominal input value in MWh
     - 'Q_N_out' is the constant nominal output value in MWh
@@ -1032,22 +1191,28 @@ def seasonal_thermal_energy_storage(param, busses):
     - 'init_storage' is the start value of the state of charge
     - 'balanced' is the condition whether the state of charge at the end of
       the optimiziation period is the same as at the beginning
+    - 'final_storage' is the optional end value of the state of charge (see
+      rolling_horizon.py)
     - 'Q_rel_loss' is the constant loss rate to environment
     - 'inflow_conv' is the constant inflow conversion factor
     - 'outflow_conv' is the constant outflow conversion factor
 
     - 'op_cost_var' are the variable operational costs in €/MWh
 
+    The initial and final values may be given per unit as list.
+
     Topology
     --------
     Input: Thermal energy storage node (wnw_node) (tes_node)
 
     Output: Low temperature heat network (lt_wnw)
     """
+    stes = list()
     for i in range(1, param['TES']['amount']+1):
-        stes = solph.components.GenericStorage(
+        prm = unit_parameters(param['TES'], i)
+        stes.append(solph.components.GenericStorage(
             label='TES_' + str(i),
-            nominal_storage_capacity=param['TES']['Q'],
+            **size_kwargs(param, 'TES', key='nominal_storage_capacity'),
             inputs={busses['wnw_node']: solph.Flow(
                 storageflowlimit=True,
                 nominal_value=param['TES']['Q_N_in'],
@@ -1056,7 +1221,7 @@ def seasonal_thermal_energy_storage(param, busses):
                 variable_costs=param['TES']['op_cost_var'],
                 nonconvex=solph.NonConvex(
                     minimum_uptime=int(param['TES']['min_uptime']),
-                    initial_status=int(param['TES']['init_status'])))},
+                    initial_status=int(prm['init_status'])))},
             outputs={busses['lt_wnw']: solph.Flow(
                 storageflowlimit=True,
                 nominal_value=param['TES']['Q_N_out'],
@@ -1064,11 +1229,11 @@ def seasonal_thermal_energy_storage(param, busses):
                 min=param['TES']['Q_rel_out_min'],
                 nonconvex=solph.NonConvex(
                     minimum_uptime=int(param['TES']['min_uptime'])))},
-            initial_storage_level=param['TES']['init_storage'],
+            initial_storage_level=prm['init_storage'],
             balanced=param['TES']['balanced'],
             loss_rate=param['TES']['Q_rel_loss'],
             inflow_conversion_factor=param['TES']['inflow_conv'],
-            outflow_conversion_factor=param['TES']['outflow_conv'])
+            outflow_conversion_factor=param['TES']['outflow_conv']))
     return stes
 
 
@@ -1089,6 +1254,7 @@ def short_term_thermal_energy_storage(param, busses):
     Short term thermal energy storage uses the following parameters:
     - 'active' is a binary parameter wether is used or not
     - 'amount' is the amount of this components installed
+    - 'invest' optionally optimizes the capacity 'Q' (see investment.py)
 
     - 'Q_N_in' is the constant nominal input value in MWh
     - 'Q_N_out' is the constant nominal output value in MWh
@@ -1109,6 +1275,8 @@ def short_term_thermal_energy_storage(param, busses):
 
     - 'op_cost_var' are the variable operational costs in €/MWh
 
+    The initial values may be given per unit as list.
+
     Topology
     --------
     Input: High temperature heat network (wnw)
@@ -1116,10 +1284,13 @@ def short_term_thermal_energy_storage(param, busses):
     Output: High temperature heat network (wnw)
     """
     if param['ST-TES']['active']:
+        st_tes = list()
         for i in range(1, param['ST-TES']['amount']+1):
-            st_tes = solph.components.GenericStorage(
+            prm = unit_parameters(param['ST-TES'], i)
+            st_tes.append(solph.components.GenericStorage(
                 label='ST-TES_' + str(i),
-                nominal_storage_capacity=param['ST-TES']['Q'],
+                **size_kwargs(
+                    param, 'ST-TES', key='nominal_storage_capacity'),
                 inputs={busses['wnw']: solph.Flow(
                     storageflowlimit=True,
                     nominal_value=param['ST-TES']['Q_N_in'],
@@ -1127,15 +1298,15 @@ def short_term_thermal_energy_storage(param, busses):
                     min=param['ST-TES']['Q_rel_in_min'],
                     variable_costs=param['ST-TES']['op_cost_var'],
                     nonconvex=solph.NonConvex(
-                        initial_status=int(param['ST-TES']['init_status'])))},
+                        initial_status=int(prm['init_status'])))},
                 outputs={busses['wnw']: solph.Flow(
                     storageflowlimit=True,
                     nominal_value=param['ST-TES']['Q_N_out'],
                     max=param['ST-TES']['Q_rel_out_max'],
                     min=param['ST-TES']['Q_rel_out_min'],
                     nonconvex=solph.NonConvex())},
-                initial_storage_level=param['ST-TES']['init_storage'],
+                initial_storage_level=prm['init_storage'],
                 loss_rate=param['ST-TES']['Q_rel_loss'],
                 inflow_conversion_factor=param['ST-TES']['inflow_conv'],
-                outflow_conversion_factor=param['ST-TES']['outflow_conv'])
+                outflow_conversion_factor=param['ST-TES']['outflow_conv']))
     return st_tes
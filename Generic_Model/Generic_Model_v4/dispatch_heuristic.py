@@ -0,0 +1,1179 @@
+# -*- coding: utf-8 -*-
+"""
+Merit order dispatch heuristic of Generic Model energy system.
+
+The dispatch is simulated with numpy instead of being optimized:
+
+- The heat demand is covered hour by hour by the heat generators in the
+  order of their heat production costs (merit order). The costs are derived
+  from the electricity spot price, the gas and CO2 costs, the coefficients
+  of the heat pumps and the efficiencies of the CHPs. Electricity consumed
+  is valued with the grid purchase price and electricity of the CHPs with
+  the spot market revenue.
+- The CHPs run at their maximal load point and are switched on regardless
+  of the heat demand, if they are profitable even with the heat dumped.
+- The storages are charged in hours with cheap heat and discharged in
+  hours with expensive heat, which are the hours with the lowest and
+  highest marginal heat costs ('heuristic_quantile' of the global
+  parameters, default 0.3). Only one storage flow is active per hour. The
+  balanced storages are brought back to their initial storage content in
+  windows at the end of the optimization period ('heuristic_window' of the
+  global parameters, default 24 time steps plus four minimum uptimes).
+
+The dispatch is returned in the format of solph.processing.results, so that
+it is scored by the postprocessing, and satisfies the constraints of the
+model except for the heat balance violations reported in the meta results.
+It is a fast baseline for the screening of configurations and the MIP start
+of the optimization ('heuristic_start' of generic_model_v4.main).
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from help_funcs import (
+    topology_check, timestep_length, unit_parameters, ComponentTypeError,
+    SolarUsageError
+    )
+from components import chp_parameters
+from chp_fidelity import chp_fidelity, fixed_ratio_factors
+from unit_aggregation import aggregated_amount, unit_labels, model_variables
+from postprocessing import postprocessing
+
+
+# Flows below are considered inactive
+FLOW_TOLERANCE = 1e-6
+
+
+class DispatchSimulation():
+    """
+    Dispatch of the energy system simulated with numpy arrays.
+
+    Parameters
+    ----------
+    timeindex : pandas.DatetimeIndex
+        Time steps of the optimization.
+    """
+
+    def __init__(self, timeindex):
+        self.timeindex = timeindex
+        self.periods = len(timeindex)
+        self.hours = timestep_length(timeindex)
+        self.sequences = dict()
+        self.scalars = dict()
+        self.violations = dict()
+
+    def series(self, value):
+        """Get value as array of the length of the time index."""
+        return np.broadcast_to(
+            np.asarray(value, dtype=float), (self.periods,)
+            ).copy()
+
+    def add_result(self, key, name, values):
+        """Add sequence of a variable to the results of a node key."""
+        self.sequences.setdefault(key, dict())[name] = self.series(values)
+
+    def add_flow(self, source, target, flow, status=None):
+        """Add flow and optional status between two nodes."""
+        self.add_result((source, target), 'flow', flow)
+        if status is not None:
+            self.add_result((source, target), 'status', status)
+
+    def add_violation(self, name, values):
+        """Add energy of a violated balance in MWh."""
+        energy = float(np.sum(np.maximum(values, 0)) * self.hours)
+        if energy > FLOW_TOLERANCE:
+            self.violations[name] = self.violations.get(name, 0) + energy
+
+    def results(self):
+        """
+        Get results in the format of solph.processing.results.
+
+        Returns
+        -------
+        dict
+            Scalars and sequences of the variables by labels of the nodes.
+        """
+        results = dict()
+        for key, sequences in self.sequences.items():
+            sequences = pd.DataFrame(
+                dict(sorted(sequences.items())), index=self.timeindex
+                )
+            sequences.columns.name = 'variable_name'
+            scalars = pd.Series(self.scalars.get(key, dict()), dtype=float)
+            results[key] = {'scalars': scalars, 'sequences': sequences}
+        return results
+
+
+def prices(param, data):
+    """Get specific costs of gas, purchased and sold electricity."""
+    prm = param['param']
+    return {
+        'gas': prm['gas_price'] + prm['co2_price'] * prm['ef_gas'],
+        'buy': (
+            prm['elec_consumer_charges_grid']
+            - prm['elec_consumer_charges_self']
+            + data['el_spot_price'].to_numpy()
+            + prm['co2_price'] * data['ef_om'].to_numpy()
+            ),
+        'sell': data['el_spot_price'].to_numpy() + prm['vNNE'],
+        'self': prm['elec_consumer_charges_self']
+        }
+
+
+def generator(label, lower, upper, cost, write, nonconvex=False,
+              must_run=False):
+    """
+    Get heat generator of the merit order.
+
+    Parameters
+    ----------
+    label : str
+        Label of the unit.
+
+    lower, upper : numpy.ndarray
+        Minimal and maximal heat output, the minimal heat output of
+        nonconvex generators only applies if they are running.
+
+    cost : numpy.ndarray
+        Heat production costs in €/MWh.
+
+    write : callable
+        Function adding the flows of the generator to the simulation from
+        its heat output and operating status.
+
+    nonconvex : bool
+        Generator with operating status.
+
+    must_run : bool or numpy.ndarray
+        Generator running regardless of the heat demand.
+    """
+    return {
+        'label': label, 'lower': lower, 'upper': upper, 'cost': cost,
+        'write': write, 'nonconvex': nonconvex, 'must_run': must_run
+        }
+
+
+def boilers(sim, param, data, price):
+    """Get electric boilers and peak load boilers as heat generators."""
+    generators = list()
+    for comp, fuel_bus in [('EHK', 'Elektrizitätsnetzwerk'),
+                           ('SLK', 'Gasnetzwerk')]:
+        if not param[comp]['active']:
+            continue
+        prm = param[comp]
+        scale = aggregated_amount(param, comp)
+        if prm['type'] == 'constant':
+            upper = prm['Q_N'] * (prm['Q_max_rel'] if comp == 'SLK' else 1)
+            lower = prm['Q_N'] * prm['Q_min_rel']
+        elif prm['type'] == 'time series':
+            upper = data['Q_' + comp].to_numpy()
+            lower = upper * prm['Q_min_rel'] if comp == 'EHK' else 0
+        else:
+            raise ComponentTypeError(prm['type'], comp)
+        if comp == 'EHK':
+            cost = price['buy'] / prm['eta'] + prm['op_cost_var'] + (
+                price['self']
+                )
+        else:
+            cost = price['gas'] / prm['eta'] + prm['op_cost_var'] + (
+                param['param']['energy_tax']
+                )
+
+        for label in unit_labels(param, comp):
+            def write(sim, heat, on, label=label, bus=fuel_bus,
+                      eta=prm['eta']):
+                sim.add_flow(bus, label, heat / eta)
+                sim.add_flow(label, 'Wärmenetzwerk', heat)
+            generators.append(generator(
+                label, sim.series(lower) * scale, sim.series(upper) * scale,
+                sim.series(cost), write
+                ))
+    return generators
+
+
+def heat_pumps(sim, param, data, price):
+    """Get high temperature heat pumps as heat generators."""
+    if not param['HP']['active']:
+        return list()
+    hp = param['HP']
+    if hp['type'] == 'constant':
+        p_max, p_min = hp['P_max'], hp['P_min']
+        c_0, c_1 = hp['c_0'], hp['c_1']
+    elif hp['type'] == 'time series':
+        p_max, p_min = data['P_max_hp'], data['P_min_hp']
+        c_0, c_1 = data['c_0_hp'], data['c_1_hp']
+    else:
+        raise ComponentTypeError(hp['type'], 'HP')
+    p_max, p_min, c_0, c_1 = (
+        sim.series(value) for value in [p_max, p_min, c_0, c_1]
+        )
+    heat_max = c_1 * p_max + c_0
+    heat_min = np.maximum(c_1 * p_min + c_0, 0)
+    available = (p_max > 0) & (heat_max > 0) & (c_1 > 0)
+    cost = np.full(sim.periods, np.inf)
+    cost[available] = (
+        p_max[available] * (price['buy'][available] + price['self'])
+        / heat_max[available] + hp['op_cost_var']
+        )
+
+    units = aggregated_amount(param, 'HP')
+    generators = list()
+    for label in unit_labels(param, 'HP'):
+        def write(sim, heat, on, label=label):
+            status = on * units
+            power = np.divide(
+                heat - c_0 * status, c_1, out=np.zeros(sim.periods),
+                where=on
+                )
+            sim.add_flow('Elektrizitätsnetzwerk', label, power, status)
+            sim.add_flow(label, 'Wärmenetzwerk', heat)
+        generators.append(generator(
+            label, np.where(available, heat_min * units, 0),
+            np.where(available, heat_max * units, 0), cost, write,
+            nonconvex=True
+            ))
+    return generators
+
+
+def chp_operation(chp, periods):
+    """
+    Get operating point of a CHP at its maximal load point.
+
+    The load is the power without district heating, which is reduced if
+    the fuel flow at the maximal load point exceeds the nominal fuel flow.
+
+    Parameters
+    ----------
+    chp : dict
+        GenericCHP parameters of the CHP (see components.chp_parameters).
+
+    periods : int
+        Number of time steps of the optimization.
+
+    Returns
+    -------
+    dict of numpy.ndarray
+        Fuel flow, load, minimal and maximal heat output of a single unit.
+    """
+    def series(value):
+        return np.broadcast_to(np.asarray(value, dtype=float), (periods,))
+
+    p_max, p_min = series(chp['P_max_woDH']), series(chp['P_min_woDH'])
+    fuel_max = p_max / series(chp['Eta_el_max_woDH'])
+    fuel_min = p_min / series(chp['Eta_el_min_woDH'])
+    alpha_1 = (fuel_max - fuel_min) / (p_max - p_min)
+    alpha_0 = fuel_min - alpha_1 * p_min
+    load = np.clip((chp['Q_in'] - alpha_0) / alpha_1, p_min, p_max)
+    fuel = alpha_0 + alpha_1 * load
+
+    beta = series(chp['Beta'])
+    q_cw_min = series(chp['Q_CW_min'])
+    heat_max = np.maximum(
+        (fuel * (1 - series(chp['H_L_FG_share_max'])) - q_cw_min - load)
+        / (1 - beta), 0
+        )
+    if chp['back_pressure']:
+        heat_min = heat_max
+    elif chp['H_L_FG_share_min'] is not None:
+        heat_min = np.clip(
+            (fuel * (1 - series(chp['H_L_FG_share_min'])) - q_cw_min - load)
+            / (1 - beta), 0, heat_max
+            )
+    else:
+        heat_min = np.zeros(periods)
+    return {
+        'fuel': fuel, 'load': load, 'beta': beta, 'heat_min': heat_min,
+        'heat_max': heat_max
+        }
+
+
+def chps(sim, param, data, price):
+    """Get CHPs as heat generators."""
+    dump_cost = (
+        param['HT-EC']['op_cost_var'] if param['HT-EC']['active'] else None
+        )
+    generators = list()
+    for comp in ['BHKW', 'GuD', 'BPT']:
+        if not param[comp]['active']:
+            continue
+        labels, chp = chp_parameters(param, data, comp)
+        units = chp['units']
+        margin = sim.series(chp['variable_costs']) - price['sell']
+
+        if chp_fidelity(param, comp) == 'fixed_ratio':
+            fuel_max, eta_el, eta_th = fixed_ratio_factors(chp, sim.periods)
+            cost = (price['gas'] + eta_el * margin) / eta_th
+            must_run = (
+                cost + dump_cost < 0 if dump_cost is not None
+                else np.zeros(sim.periods, dtype=bool)
+                )
+            upper = eta_th * fuel_max * units
+            for label in labels:
+                def write(sim, heat, on, label=label, eta_el=eta_el,
+                          eta_th=eta_th):
+                    sim.add_flow('Gasnetzwerk', label, heat / eta_th)
+                    sim.add_flow(
+                        label, 'Elektrizitätsnetzwerk', heat / eta_th * eta_el
+                        )
+                    sim.add_flow(label, 'Wärmenetzwerk', heat)
+                generators.append(generator(
+                    label, np.where(must_run, upper, 0), upper, cost, write
+                    ))
+            continue
+
+        op = chp_operation(chp, sim.periods)
+
+        # Costs of the heat output with the fuel and the electricity output
+        # reduced by the heat extraction
+        def total_cost(heat):
+            return (
+                op['fuel'] * price['gas']
+                + (op['load'] - op['beta'] * heat) * margin
+                )
+        cost = np.full(sim.periods, np.inf)
+        usable = op['heat_max'] > 0
+        cost[usable] = (
+            total_cost(op['heat_max'])[usable] / op['heat_max'][usable]
+            )
+        must_run = np.zeros(sim.periods, dtype=bool)
+        if dump_cost is not None:
+            must_run = total_cost(op['heat_min']) + (
+                op['heat_min'] * dump_cost
+                ) < 0
+
+        for label in labels:
+            def write(sim, heat, on, label=label, chp=chp, op=op,
+                      units=units):
+                status = on * units
+                fuel = op['fuel'] * status
+                load = op['load'] * status
+                power = load - op['beta'] * heat
+                sim.add_flow('Gasnetzwerk', label, fuel)
+                sim.add_flow(label, 'Elektrizitätsnetzwerk', power)
+                sim.add_flow(label, 'Wärmenetzwerk', heat)
+                key = (label, None)
+                sim.add_result(key, 'H_F', fuel)
+                sim.add_result(
+                    key, 'H_L_FG_max', fuel * chp['H_L_FG_share_max']
+                    )
+                if chp['H_L_FG_share_min'] is not None:
+                    sim.add_result(
+                        key, 'H_L_FG_min', fuel * chp['H_L_FG_share_min']
+                        )
+                sim.add_result(key, 'P', power)
+                sim.add_result(key, 'P_woDH', load)
+                sim.add_result(key, 'Q', heat)
+                sim.add_result(key, 'Y', status)
+            generators.append(generator(
+                label, op['heat_min'] * units, op['heat_max'] * units, cost,
+                write, nonconvex=True, must_run=must_run
+                ))
+    return generators
+
+
+def lt_cop(sim, param, data):
+    """Get coefficient of performance of the low temperature heat pumps."""
+    if param['LT-HP']['type'] == 'constant':
+        return sim.series(param['LT-HP']['cop'])
+    if param['LT-HP']['type'] == 'time series':
+        return sim.series(data['cop_lthp'])
+    raise ComponentTypeError(param['LT-HP']['type'], 'LT-HP')
+
+
+def lt_heat_pump(sim, param, data, price, lt_heat, lt_must):
+    """
+    Get low temperature heat pumps as heat generators.
+
+    Parameters
+    ----------
+    sim : DispatchSimulation
+        Simulated dispatch of the Generic Model.
+
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    price : dict
+        Specific costs of gas and electricity (see prices).
+
+    lt_heat, lt_must : numpy.ndarray
+        Available low temperature heat and the part of it which has to be
+        used by the heat pumps.
+    """
+    if not param['LT-HP']['active']:
+        return list()
+    cop = lt_cop(sim, param, data)
+    cost = (price['buy'] + price['self']) / cop + param['HP']['op_cost_var']
+
+    labels = unit_labels(param, 'LT-HP')
+    generators = list()
+    for label in labels:
+        def write(sim, heat, on, label=label):
+            sim.add_flow('LT-Wärmenetzwerk', label, heat * (cop - 1) / cop)
+            sim.add_flow('Elektrizitätsnetzwerk', label, heat / cop)
+            sim.add_flow(label, 'Wärmenetzwerk', heat)
+        generators.append(generator(
+            label, lt_must * cop / (cop - 1) / len(labels),
+            lt_heat * cop / (cop - 1) / len(labels), cost, write
+            ))
+    return generators
+
+
+def merit_order(generators, residual):
+    """
+    Dispatch the heat generators in the order of their heat costs.
+
+    The generators without operating status run at least at their minimal
+    heat output and the must-run generators at least at their minimal heat
+    output when running. The others are started in the merit order, as long
+    as heat demand is left. Generators whose minimal heat output exceeds the
+    heat demand left are only started if the heat demand cannot be covered
+    otherwise.
+
+    Parameters
+    ----------
+    generators : list of dict
+        Heat generators (see generator).
+
+    residual : numpy.ndarray
+        Heat demand to be covered by the generators.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        Heat output and operating status of the generators, heat demand
+        left (negative for surplus heat) and marginal heat costs.
+    """
+    periods = len(residual)
+    cols = np.arange(periods)
+    if not generators:
+        return (
+            np.zeros((0, periods)), np.zeros((0, periods), dtype=bool),
+            residual, np.full(periods, -np.inf)
+            )
+    lower, upper, cost = (
+        np.array([np.broadcast_to(gen[key], (periods,)) for gen in generators])
+        for key in ['lower', 'upper', 'cost']
+        )
+    on = np.array([
+        np.broadcast_to(
+            np.logical_or(not gen['nonconvex'], gen['must_run']), (periods,)
+            )
+        for gen in generators
+        ])
+    heat = np.where(on, lower, 0)
+    forced = heat.copy()
+    residual = residual - heat.sum(axis=0)
+
+    order = np.argsort(cost, axis=0, kind='stable')
+    for overshoot in [False, True]:
+        for rank in range(len(generators)):
+            gen = order[rank]
+            running = on[gen, cols]
+            start = (
+                ~running & (residual > FLOW_TOLERANCE)
+                & (upper[gen, cols] > 0) & np.isfinite(cost[gen, cols])
+                & (overshoot | (lower[gen, cols] <= residual))
+                )
+            add = np.where(
+                running,
+                np.clip(residual, 0, upper[gen, cols] - heat[gen, cols]), 0
+                )
+            add = np.where(
+                start,
+                np.clip(residual, lower[gen, cols], upper[gen, cols]), add
+                )
+            heat[gen, cols] += add
+            on[gen, cols] |= start
+            residual = residual - add
+
+    dispatched = heat > forced + FLOW_TOLERANCE
+    marginal = np.where(dispatched, cost, -np.inf).max(axis=0)
+    return heat, on, residual, marginal
+
+
+class StorageState():
+    """
+    Parameters and simulated operation of a storage.
+
+    Parameters
+    ----------
+    label : str
+        Label of the storage.
+
+    prm : dict
+        Parameters of the storage unit.
+
+    periods : int
+        Number of time steps of the optimization.
+
+    hours : float
+        Length of the time steps in hours.
+
+    minimum_uptime : int
+        Optional minimum uptime of the charging and discharging flow.
+
+    balanced : bool
+        Storage content at the end equals the initial storage content, or
+        the final storage level if it is given.
+    """
+
+    def __init__(self, label, prm, periods, hours, minimum_uptime=None,
+                 balanced=True):
+        self.label = label
+        self.periods = periods
+        self.capacity = prm['Q']
+        self.rate = {
+            'in': (prm['Q_N_in'] * prm['Q_rel_in_min'],
+                   prm['Q_N_in'] * prm['Q_rel_in_max']),
+            'out': (prm['Q_N_out'] * prm['Q_rel_out_min'],
+                    prm['Q_N_out'] * prm['Q_rel_out_max'])
+            }
+        # Change of the storage content per flow in a time step
+        self.gain = {
+            'in': prm['inflow_conv'] * hours,
+            'out': -hours / prm['outflow_conv']
+            }
+        self.retention = (1 - prm['Q_rel_loss']) ** hours
+        self.balanced = balanced
+        self.initial = (
+            prm['init_storage'] * self.capacity
+            if prm['init_storage'] is not None else 0
+            )
+        # Storage content the balanced storage is brought to at the end
+        self.final = self.initial
+        if prm.get('final_storage') is not None:
+            self.balanced = True
+            self.final = prm['final_storage'] * self.capacity
+        self.flows = {
+            direction: np.zeros(periods) for direction in ['in', 'out']
+            }
+
+        # The minimum uptime fixes the statuses of the first and last time
+        # steps to the initial status as in solph
+        self.uptime = 1
+        self.tail = 0
+        self.fixed = {'in': set(), 'out': set()}
+        self.forced = set()
+        # Room kept for the charging of the last time steps
+        self.reserve = 0
+        if minimum_uptime:
+            self.uptime = self.tail = int(minimum_uptime)
+            steps = set(range(self.uptime)) | set(
+                range(periods - self.uptime, periods)
+                )
+            self.fixed = {'in': steps, 'out': steps}
+            if int(prm['init_status']):
+                self.forced = steps
+                self.flows['in'][periods - self.uptime:] = self.rate['in'][0]
+                self.reserve = (
+                    self.uptime * self.rate['in'][0] * self.gain['in']
+                    )
+
+    def content(self, start=0, initial=None):
+        """Get storage content at the end of the time steps from start."""
+        level = self.initial if initial is None else initial
+        content = np.zeros(self.periods - start)
+        for i, t in enumerate(range(start, self.periods)):
+            level = (
+                level * self.retention
+                + self.flows['in'][t] * self.gain['in']
+                + self.flows['out'][t] * self.gain['out']
+                )
+            content[i] = level
+        return content
+
+
+def storages(sim, param):
+    """Get states of the storages of the parameters."""
+    states = list()
+    if param['TES']['active']:
+        for i in range(1, param['TES']['amount']+1):
+            states.append(StorageState(
+                'TES_' + str(i), unit_parameters(param['TES'], i),
+                sim.periods, sim.hours,
+                minimum_uptime=int(param['TES']['min_uptime']),
+                balanced=param['TES']['balanced']
+                ))
+    if param['ST-TES']['active']:
+        # The short term storage is balanced as the solph GenericStorage
+        for i in range(1, param['ST-TES']['amount']+1):
+            states.append(StorageState(
+                'ST-TES_' + str(i), unit_parameters(param['ST-TES'], i),
+                sim.periods, sim.hours
+                ))
+    return states
+
+
+def run_rate(storage, initial, direction, run, idle, target):
+    """
+    Get constant flow of a run reaching the target storage content.
+
+    Parameters
+    ----------
+    storage : StorageState
+        State of the storage.
+
+    initial : float
+        Storage content before the run.
+
+    direction : str
+        Flow of the run, either 'in' or 'out'.
+
+    run, idle : int
+        Number of time steps of the run and of the idle time steps after it.
+
+    target : float
+        Storage content after the idle time steps.
+
+    Returns
+    -------
+    float
+        Flow of the run, NaN if it is not within the bounds of the flow.
+    """
+    retention = storage.retention
+    gain = (
+        storage.gain[direction] * np.sum(retention ** np.arange(run))
+        * retention ** idle
+        )
+    rest = initial * retention ** (run + idle)
+    rate = (target - rest) / gain
+    lower, upper = storage.rate[direction]
+    if lower - FLOW_TOLERANCE <= rate <= upper + FLOW_TOLERANCE:
+        return float(np.clip(rate, lower, upper))
+    return np.nan
+
+
+def balance_storage(storage, start, stop):
+    """
+    Bring a balanced storage to its final storage content.
+
+    The storage is charged or discharged with a constant flow within the
+    time steps from start to stop. If the flow of a single run would be
+    below the minimal flow, the storage is discharged or charged with the
+    minimal flow for the minimum uptime first.
+
+    Parameters
+    ----------
+    storage : StorageState
+        State of the storage.
+
+    start, stop : int
+        Time steps the storage is balanced in.
+
+    Returns
+    -------
+    bool
+        Whether the storage is balanced.
+    """
+    level = storage.content()[start - 1] if start else storage.initial
+    if abs(storage.content()[-1] - storage.final) <= FLOW_TOLERANCE:
+        return True
+
+    # Storage content at stop reaching the final content at the end with
+    # the flows after stop
+    idle = storage.periods - stop
+    tail = storage.content(start=stop, initial=0)[-1] if idle else 0
+    target = (storage.final - tail) / storage.retention ** idle
+    window = stop - start
+    final = storage.content(start=start, initial=level)[-1]
+    direction = 'in' if final < storage.final else 'out'
+    other = 'out' if direction == 'in' else 'in'
+
+    plans = [[(direction, run)] for run in range(storage.uptime, window + 1)]
+    plans += [
+        [(other, storage.uptime), (direction, run)]
+        for run in range(storage.uptime, window - storage.uptime + 1)
+        ]
+    for plan in plans:
+        step = start
+        content = level
+        flows = list()
+        for flow, run in plan[:-1]:
+            rate = storage.rate[flow][0]
+            flows.append((flow, step, step + run, rate))
+            for _ in range(run):
+                content = (
+                    content * storage.retention + rate * storage.gain[flow]
+                    )
+            step += run
+        flow, run = plan[-1]
+        rate = run_rate(storage, content, flow, run, stop - step - run, target)
+        if np.isnan(rate):
+            continue
+        flows.append((flow, step, step + run, rate))
+
+        for flow, first, last, rate in flows:
+            storage.flows[flow][first:last] = rate
+        contents = storage.content()
+        if (contents.min() >= -FLOW_TOLERANCE
+                and contents.max() <= storage.capacity + FLOW_TOLERANCE):
+            return True
+        for flow, first, last, rate in flows:
+            storage.flows[flow][first:last] = 0
+    return False
+
+
+def storage_dispatch(states, potentials, window=24):
+    """
+    Simulate the storages with a simple charging and discharging policy.
+
+    A storage is charged with the heat which is cheap in a time step and
+    discharged instead of expensive heat, within its flow limits and as long
+    as it can be brought back to its initial storage content. Runs last at
+    least the minimum uptime and only one storage flow is active per time
+    step. The balanced storages are balanced one after another in windows
+    at the end of the optimization period.
+
+    Parameters
+    ----------
+    states : list of StorageState
+        States of the storages.
+
+    potentials : dict of numpy.ndarray
+        Heat to be charged and discharged per storage label and flow.
+
+    window : int
+        Time steps of the balancing window of a storage without minimum
+        uptime.
+
+    Returns
+    -------
+    dict
+        Deviation of the storage content at the end from the final storage
+        content of the balanced storages which could not be balanced.
+    """
+    if not states:
+        return dict()
+    periods = states[0].periods
+
+    windows = dict()
+    stop = periods
+    for storage in states:
+        if storage.balanced:
+            stop = min(stop, periods - storage.tail)
+            start = max(stop - window - 4 * storage.uptime, 0)
+            windows[storage.label] = (start, stop)
+            stop = start
+    policy_stop = stop
+
+    # Deviation from the final content the balancing window can reach
+    reach = dict()
+    for storage in states:
+        if storage.label in windows:
+            start, stop = windows[storage.label]
+            steps = max(stop - start - storage.uptime - 1, 0)
+            reach[storage.label] = {
+                direction: steps * storage.rate[direction][1]
+                * abs(storage.gain[direction])
+                for direction in ['in', 'out']
+                }
+
+    contents = {storage.label: storage.initial for storage in states}
+    active = None
+    run = 0
+    for t in range(policy_stop):
+        for storage in states:
+            contents[storage.label] *= storage.retention
+
+        # The last time steps of storages with charging fixed by the initial
+        # status are kept
+        tail = [
+            storage for storage in states
+            if storage.forced and t >= periods - storage.tail
+            ]
+        if tail:
+            for storage in tail:
+                contents[storage.label] += (
+                    storage.flows['in'][t] * storage.gain['in']
+                    )
+            active = None
+            run = 0
+            continue
+
+        candidates = list()
+        for storage in states:
+            for direction in ['in', 'out']:
+                lower, upper = storage.rate[direction]
+                wanted = potentials[storage.label][direction][t]
+                ongoing = (
+                    active == (storage, direction) and run < storage.uptime
+                    )
+                if direction == 'in' and t < storage.uptime and (
+                        t in storage.forced):
+                    candidates = [
+                        (storage, direction, min(max(wanted, lower), upper))
+                        ]
+                    break
+                if t in storage.fixed[direction]:
+                    continue
+                if ongoing:
+                    wanted = max(wanted, lower)
+                elif (wanted < lower
+                        or t + storage.uptime > min(
+                            policy_stop, periods - storage.tail)):
+                    continue
+                candidates.append((storage, direction, min(wanted, upper)))
+            else:
+                continue
+            break
+
+        # Runs within the minimum uptime are continued
+        ongoing = [
+            cand for cand in candidates
+            if active == cand[:2] and run < cand[0].uptime
+            ]
+        if ongoing:
+            candidates = ongoing
+
+        for storage, direction, rate in sorted(
+                candidates, key=lambda cand: -cand[2]):
+            label = storage.label
+            lower = storage.rate[direction][0]
+            gain = storage.gain[direction]
+            remaining = (
+                max(storage.uptime - run, 1)
+                if active == (storage, direction) else storage.uptime
+                )
+            # Flow keeping room for the minimal flow of the remaining run
+            if gain > 0:
+                limit = (
+                    storage.capacity - storage.reserve - contents[label]
+                    ) / gain
+            else:
+                limit = (
+                    contents[label] * storage.retention ** remaining / -gain
+                    )
+            rate = min(rate, limit - (remaining - 1) * lower)
+            if label in reach:
+                deviation = contents[label] - storage.final
+                if gain > 0:
+                    rate = min(rate, (reach[label]['out'] - deviation) / gain)
+                else:
+                    rate = min(rate, (reach[label]['in'] + deviation) / -gain)
+            if rate < lower - FLOW_TOLERANCE:
+                continue
+            rate = max(rate, lower)
+            storage.flows[direction][t] = rate
+            contents[label] += rate * gain
+            run = run + 1 if active == (storage, direction) else 1
+            active = (storage, direction)
+            break
+        else:
+            active = None
+            run = 0
+
+    deviations = dict()
+    for storage in states:
+        if storage.label in windows:
+            if not balance_storage(storage, *windows[storage.label]):
+                deviations[storage.label] = float(
+                    storage.content()[-1] - storage.final
+                    )
+    return deviations
+
+
+def simulate_dispatch(param, data):
+    """
+    Simulate the dispatch of the Generic Model with the merit order.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    Returns
+    -------
+    tuple
+        Results in the format of solph.processing.results and meta results
+        with the violated balances in MWh and the run time.
+    """
+    start_time = time.perf_counter()
+    topology_check(param)
+    timeindex = pd.date_range(
+        data.index[0], periods=len(data),
+        freq=pd.Timedelta(hours=timestep_length(data.index))
+        )
+    sim = DispatchSimulation(timeindex)
+    price = prices(param, data)
+    prm = param['param']
+
+    # %% Fixed heat
+    demand = sim.series(data['heat_demand']) * prm['rel_demand']
+    fixed_heat = np.zeros(sim.periods)
+    if param['MR']['active']:
+        if param['MR']['type'] == 'constant':
+            must_run = sim.series(float(param['MR']['Q_N']))
+        elif param['MR']['type'] == 'time series':
+            must_run = sim.series(data['Q_MR'])
+        else:
+            raise ComponentTypeError(param['MR']['type'], 'MR')
+        sim.add_flow('Mustrun', 'Wärmenetzwerk', must_run)
+        fixed_heat += must_run
+
+    solar = np.zeros(sim.periods)
+    usage = None
+    if param['Sol']['active']:
+        usage = param['Sol']['usage']
+        if usage not in ['LT', 'HT']:
+            raise SolarUsageError(usage)
+        solar = sim.series(data['solar_data_' + usage]) * param['Sol']['A']
+        sim.add_flow('Solarthermie', 'Sol Knoten', solar)
+    solar_lt = solar if usage == 'LT' else np.zeros(sim.periods)
+    solar_ht = solar if usage == 'HT' else np.zeros(sim.periods)
+    dumpable = param['Sol']['active'] and param['Sol-EC']['active']
+
+    # %% Dispatch without storages
+    units = (
+        boilers(sim, param, data, price) + heat_pumps(sim, param, data, price)
+        + chps(sim, param, data, price)
+        )
+    lt_must = np.zeros(sim.periods) if dumpable else solar_lt
+    lt_units = lt_heat_pump(sim, param, data, price, solar_lt, lt_must)
+    residual = demand - fixed_heat - solar_ht
+    heat, on, left, marginal = merit_order(units + lt_units, residual)
+
+    # %% Storage policy
+    states = storages(sim, param)
+    if states:
+        quantile = prm.get('heuristic_quantile', 0.3)
+        finite = marginal[np.isfinite(marginal)]
+        cheap, expensive = (
+            np.quantile(finite, [quantile, 1 - quantile]) if len(finite)
+            else (-np.inf, np.inf)
+            )
+        upper, cost = (
+            np.array([
+                np.broadcast_to(gen[key], (sim.periods,)) for gen in units
+                ]).reshape(len(units), sim.periods)
+            for key in ['upper', 'cost']
+            )
+        unit_heat, unit_on = heat[:len(units)], on[:len(units)]
+
+        # Surplus heat and spare capacity of cheap running units are
+        # charged, expensive heat is replaced by the discharged heat
+        spare = np.where(
+            unit_on & (cost <= cheap), upper - unit_heat, 0
+            ).sum(axis=0)
+        ht_charge = np.maximum(-left, 0) + np.where(
+            marginal <= cheap, spare, 0
+            )
+        ht_discharge = np.where(
+            marginal >= expensive,
+            np.where(cost >= expensive, unit_heat, 0).sum(axis=0), 0
+            )
+
+        # The seasonal storage is discharged to the low temperature heat
+        # pumps and charged with the unused low temperature solar heat
+        lt_discharge = np.zeros(sim.periods)
+        lt_used = np.zeros(sim.periods)
+        if lt_units:
+            cop = lt_cop(sim, param, data)
+            lt_cost = np.broadcast_to(lt_units[0]['cost'], (sim.periods,))
+            lt_discharge = np.where(
+                lt_cost < marginal, ht_discharge * (cop - 1) / cop, 0
+                )
+            lt_used = heat[len(units):].sum(axis=0) * (cop - 1) / cop
+        lt_surplus = np.maximum(solar_lt - lt_used, 0)
+
+        potentials = {
+            storage.label: (
+                {'in': ht_charge + lt_surplus, 'out': lt_discharge}
+                if storage.label.startswith('TES_')
+                else {'in': ht_charge, 'out': ht_discharge}
+                )
+            for storage in states
+            }
+        deviations = storage_dispatch(
+            states, potentials, window=prm.get('heuristic_window', 24)
+            )
+        for label, deviation in deviations.items():
+            sim.violations['storage_balance_' + label] = deviation
+
+    def storage_flows(prefix, direction):
+        return sum(
+            (storage.flows[direction] for storage in states
+             if storage.label.startswith(prefix)), np.zeros(sim.periods)
+            )
+    tes_in, tes_out = (storage_flows('TES_', d) for d in ['in', 'out'])
+    st_in, st_out = (storage_flows('ST-TES_', d) for d in ['in', 'out'])
+
+    # %% Dispatch with storages
+    # The seasonal storage is charged with low temperature solar heat first
+    lt_to_tes = np.minimum(tes_in, solar_lt)
+    ht_to_tes = tes_in - lt_to_tes
+    lt_heat = solar_lt - lt_to_tes + tes_out
+    lt_must = tes_out if dumpable else lt_heat
+    lt_units = lt_heat_pump(sim, param, data, price, lt_heat, lt_must)
+    residual = demand - fixed_heat - solar_ht + ht_to_tes + st_in - st_out
+    heat, on, left, _ = merit_order(units + lt_units, residual)
+    for gen, gen_heat, gen_on in zip(units + lt_units, heat, on):
+        gen['write'](sim, gen_heat, gen_on)
+
+    # %% Heat balances
+    sim.add_violation('heat_deficit', left)
+    surplus = np.maximum(-left, 0)
+    solar_dump = np.zeros(sim.periods)
+    if dumpable:
+        solar_dump = np.minimum(surplus, solar_ht)
+        surplus -= solar_dump
+    if param['HT-EC']['active']:
+        sim.add_flow('Wärmenetzwerk', 'HT-EC', surplus)
+    else:
+        sim.add_violation('heat_surplus', surplus)
+
+    lt_left = lt_heat - sum(
+        (sim.sequences[('LT-Wärmenetzwerk', gen['label'])]['flow']
+         for gen in lt_units), np.zeros(sim.periods)
+        )
+    if dumpable:
+        lt_dump = np.clip(lt_left, 0, solar_lt - lt_to_tes)
+        solar_dump += lt_dump
+        lt_left -= lt_dump
+    sim.add_violation('lt_heat_surplus', lt_left)
+
+    if param['Sol']['active']:
+        aux_label = 'Sol_to_' + usage
+        bus = 'LT-Wärmenetzwerk' if usage == 'LT' else 'Wärmenetzwerk'
+        sim.add_flow('Sol Knoten', aux_label, solar - solar_dump)
+        sim.add_flow(aux_label, bus, solar - solar_dump)
+        if param['Sol-EC']['active']:
+            sim.add_flow('Sol Knoten', 'Sol-EC', solar_dump)
+
+    for storage in states:
+        if storage.label.startswith('TES_'):
+            input_bus, output_bus = 'TES Knoten', 'LT-Wärmenetzwerk'
+        else:
+            input_bus, output_bus = 'Wärmenetzwerk', 'Wärmenetzwerk'
+        for direction, key in [('in', (input_bus, storage.label)),
+                               ('out', (storage.label, output_bus))]:
+            flow = storage.flows[direction]
+            sim.add_flow(*key, flow, flow > FLOW_TOLERANCE)
+        sim.add_result(
+            (storage.label, None), 'storage_content', storage.content()
+            )
+        sim.scalars[(storage.label, None)] = {'init_content': storage.initial}
+    if param['TES']['active']:
+        sim.add_flow('Wärmenetzwerk', 'HT_to_TES_node', ht_to_tes)
+        sim.add_flow('HT_to_TES_node', 'TES Knoten', ht_to_tes)
+        sim.add_flow('LT-Wärmenetzwerk', 'LT_to_TES_node', lt_to_tes)
+        sim.add_flow('LT_to_TES_node', 'TES Knoten', lt_to_tes)
+
+    sim.add_flow('Wärmenetzwerk', 'Wärmebedarf', demand)
+
+    # %% Electricity and gas balances
+    electricity = np.zeros(sim.periods)
+    gas = np.zeros(sim.periods)
+    for (source, target), sequences in list(sim.sequences.items()):
+        if 'flow' not in sequences:
+            continue
+        if target == 'Elektrizitätsnetzwerk':
+            electricity += sequences['flow']
+        elif source == 'Elektrizitätsnetzwerk':
+            electricity -= sequences['flow']
+        elif source == 'Gasnetzwerk':
+            gas += sequences['flow']
+    sim.add_flow('Gasquelle', 'Gasnetzwerk', gas)
+    sim.add_flow(
+        'Stromquelle', 'Elektrizitätsnetzwerk', np.maximum(-electricity, 0)
+        )
+    sim.add_flow(
+        'Elektrizitätsnetzwerk', 'Spotmarkt', np.maximum(electricity, 0)
+        )
+
+    meta_results = {
+        'violations': sim.violations,
+        'feasible': not sim.violations,
+        'runtime': time.perf_counter() - start_time
+        }
+    return sim.results(), meta_results
+
+
+def simulate(param, data):
+    """
+    Simulate the dispatch of the Generic Model and score it.
+
+    The simulated dispatch is scored by the postprocessing of the
+    optimization results.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    Returns
+    -------
+    tuple
+        Results of the postprocessing and meta results as
+        generic_model_v4.main.
+    """
+    results, meta_results = simulate_dispatch(param, data)
+    data_dhs, data_invest, data_emission, data_cost_units = postprocessing(
+        results, param, data
+        )
+    return (
+        data_dhs, data_invest, data_emission, data_cost_units, meta_results
+        )
+
+
+def set_mip_start(model, results):
+    """
+    Set the variables of the solph model to the simulated dispatch.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    results : dict of pandas.Series and pandas.DataFrame
+        Simulated dispatch from simulate_dispatch.
+    """
+    nodes = {str(n) for n in model.es.nodes}
+    for key, res in results.items():
+        if not all(label is None or label in nodes for label in key):
+            continue
+        for name, values in res['sequences'].items():
+            for var, value in zip(model_variables(model, key, name), values):
+                if not var.fixed:
+                    var.value = float(value)
+
+
+def sparse_mip_start(model, results):
+    """
+    Get values of the columns of the sparse model of the simulated dispatch.
+
+    Parameters
+    ----------
+    model : sparse_model.SparseModel
+        Optimization model of the Generic Model.
+
+    results : dict of pandas.Series and pandas.DataFrame
+        Simulated dispatch from simulate_dispatch.
+
+    Returns
+    -------
+    numpy.ndarray
+        Values of the columns, NaN for columns without value.
+    """
+    values = np.full(model.n_cols, np.nan)
+    for variables, part in [(model.sequences, 'sequences'),
+                            (model.scalars, 'scalars')]:
+        for key, names in variables.items():
+            if key not in results:
+                continue
+            res = results[key][part]
+            for name, (cols, factor) in names.items():
+                if name in res and np.all(np.asarray(factor) != 0):
+                    values[cols] = np.asarray(res[name]) / factor
+    return values
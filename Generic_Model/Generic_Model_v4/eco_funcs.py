@@ -6,12 +6,22 @@ Created on Mon Feb  1 11:43:39 2021
 @author: Jonas Freißmann
 """
 
+import os
+from functools import lru_cache
+
 import pandas as pd
 import numpy as np
 from scipy.optimize import curve_fit
+from help_funcs import timestep_length
 # import matplotlib.pyplot as plt
 
 
+E_FUEL = 0.2012    # in t/MWh aus "Emissionsbewertung Daten"
+
+# Columns of the emission factors of the electricity mixes
+EMISSION_MIXES = {'overall mix': 'EF om', 'displacement mix': 'EF dm'}
+
+
 def npv(invest, cashflow, i=0.05, n=20):
     """Konstantin 2013, Markus [29].
 
@@ -67,36 +77,106 @@ def LCOH(invest, cost, Q, revenue=0, i=0.05, n=20):
     return LCOH
 
 
-def emission_calc(data_emission):
-    """Calculate the emissions compared with overall and displacement mix."""
-    co2 = pd.read_csv('input\\emissions2016.csv', sep=";")
-    co2['Date'] = pd.to_datetime(co2['Date'], format='%d.%m.%Y %H:%M')
-    co2.set_index('Date', inplace=True)
+@lru_cache(maxsize=None)
+def load_emission_factors(path):
+    """Load emission factors of the electricity mixes once per file.
 
-    Em_om = list()
-    Em_dm = list()
+    path:       absolute path of the csv file with the columns 'EF om' and
+                'EF dm' in t/MWh
+    factors:    read-only array of the emission factors with the dimensions
+                (mix, time step) in order of EMISSION_MIXES
+    """
+    co2 = pd.read_csv(path, sep=";", usecols=list(EMISSION_MIXES.values()))
+    factors = co2[list(EMISSION_MIXES.values())].to_numpy(dtype=float).T
+    factors.setflags(write=False)
+    return factors
 
-    e_fuel = 0.2012    # in t/MWh aus "Emissionsbewertung Daten"
 
-    for idx_em, idx_co2 in zip(data_emission.index, co2.index):
-        Em_om.append(
-            data_emission.loc[idx_em, 'H_source'] * e_fuel
-            + data_emission.loc[idx_em, 'P_source'] * co2.loc[idx_co2, 'EF om']
-            - (data_emission.loc[idx_em, 'P_spot_market']
-               * co2.loc[idx_co2, 'EF om'])
-            )
+def step_factors(factors, steps, hours=1):
+    """Get mean hourly emission factors of time steps of several hours.
 
-        Em_dm.append(
-            data_emission.loc[idx_em, 'H_source'] * e_fuel
-            + data_emission.loc[idx_em, 'P_source'] * co2.loc[idx_co2, 'EF dm']
-            - (data_emission.loc[idx_em, 'P_spot_market']
-               * co2.loc[idx_co2, 'EF dm'])
+    factors:    hourly emission factors with the dimensions (mix, hour)
+    steps:      number of time steps starting at the first hour
+    hours:      length of the time steps in hours
+    """
+    if hours < 1 or hours != int(hours):
+        raise ValueError(
+            f"The time steps of {hours} hours are not a multiple of the "
+            + "hourly emission factors."
             )
-
-    dfEm = pd.DataFrame({'date': data_emission.index,
-                         'overall mix': Em_om,
-                         'displacement mix': Em_dm})
-    dfEm.set_index('date', inplace=True)
+    hours = int(hours)
+    available = min(steps * hours, factors.shape[-1])
+    if available <= (steps - 1) * hours:
+        raise ValueError(
+            f"There are {factors.shape[-1]} hourly emission factors for "
+            + f"{steps} time steps of {hours} hours."
+            )
+    if hours == 1:
+        return factors[:, :steps]
+    starts = np.arange(steps) * hours
+    counts = np.diff(np.append(starts, available))
+    return (
+        np.add.reduceat(factors[:, :available], starts, axis=-1) / counts
+        )
+
+
+def emissions(H_source, P_source, P_spot_market, factors, hours=1,
+              e_fuel=E_FUEL):
+    """Calculate the emissions of a batch of scenarios for all mixes.
+
+    The time series are arrays with the dimensions (scenario, time step),
+    e.g. the flows 'H_source', 'P_source' and 'P_spot_market' of a
+    result_cube.ResultCube, or of a single scenario with the dimension
+    (time step). The time steps start at the first hour of the emission
+    factors. Time steps of several hours, e.g. of a coarser 'resolution'
+    of generic_model_v4.main, get the mean factors of their hours.
+
+    H_source:       gas consumption in MW
+    P_source:       electricity purchased from the grid in MW
+    P_spot_market:  electricity sold at the spot market in MW
+    factors:        hourly emission factors of the electricity mixes in
+                    t/MWh with the dimensions (mix, hour)
+    hours:          length of the time steps in hours, e.g.
+                    help_funcs.timestep_length of their time index
+    e_fuel:         emission factor of the gas in t/MWh
+    emissions:      emissions in t with the dimensions (mix, scenario,
+                    time step)
+    """
+    H_source = np.asarray(H_source, dtype=float)
+    balance = (
+        np.asarray(P_source, dtype=float)
+        - np.asarray(P_spot_market, dtype=float)
+        )
+    steps = balance.shape[-1]
+    # Factors of each mix are broadcast over the scenarios
+    factors = step_factors(factors, steps, hours=hours).reshape(
+        (len(factors),) + (1,) * (balance.ndim - 1) + (steps,)
+        )
+    return (H_source * e_fuel + balance * factors) * hours
+
+
+def emission_calc(data_emission,
+                  path=os.path.join('input', 'emissions2016.csv')):
+    """Calculate the emissions compared with overall and displacement mix."""
+    index = data_emission.index
+    if index.freq is None and len(index) > 1:
+        # The frequency of time indices read from files is inferred
+        index = pd.DatetimeIndex(index, freq='infer')
+        if index.freq is None:
+            raise ValueError(
+                "The time steps of the emission data are not regular."
+                )
+    factors = load_emission_factors(os.path.abspath(path))
+    mixes = emissions(
+        data_emission['H_source'], data_emission['P_source'],
+        data_emission['P_spot_market'], factors,
+        hours=timestep_length(index)
+        )
+
+    dfEm = pd.DataFrame(
+        dict(zip(EMISSION_MIXES, mixes)), index=data_emission.index
+        )
+    dfEm.index.name = 'date'
 
     return dfEm
 
@@ -15,10 +15,12 @@ Komponenten:
 Wärmebedarf Flensburgs aus dem Jahr 2016
 
 """
+from copy import deepcopy
+
 import pandas as pd
 
 import oemof.solph as solph
-from help_funcs import topology_check
+from help_funcs import topology_check, timestep_length
 from components import (
     gas_source, electricity_source, solar_thermal_strand, must_run_source
     )
@@ -35,10 +37,41 @@ from components import (
     seasonal_thermal_energy_storage_strand,
     short_term_thermal_energy_storage
     )
+from rolling_horizon import (
+    horizon_windows, carry_over_storage, final_storage_levels,
+    add_final_storage_levels, stitch_results, combine_meta_results
+    )
+from aggregation import (
+    aggregate_periods, period_weighting, add_seasonal_storage_linking,
+    remove_seasonal_storage_linking, disaggregate_results
+    )
+from resampling import resample_data, resample_param
+from solver import solve
+from sparse_model import solve_sparse_model
+from presolve import presolve_model
+from investment import (
+    invest_components, check_investment, add_investment_costs,
+    invested_sizes
+    )
+from chp_fidelity import relax_chp_status
+from profiling import RunReport, measure
+from solve_progress import SolveProgress, checkpoint_file, load_checkpoint
+from storage_exclusivity import (
+    SOS_SOLVERS, storage_exclusivity, add_storage_exclusivity,
+    check_storage_exclusivity
+    )
+from unit_aggregation import set_unit_counts, add_symmetry_breaking
+from warm_start import load_warm_start, save_warm_start
+from dispatch_heuristic import simulate_dispatch, set_mip_start
 from postprocessing import postprocessing
+from result_extraction import extract_results, select_results, release_model
 
 
-def main(param, data, mipgap='0.1', save_model=''):
+def main(param, data, mipgap=None, save_model='', rolling_horizon=None,
+         aggregation=None, resolution=1, solver='gurobi',
+         solver_profile='default', warm_start_cache='', backend='solph',
+         run_report=False, checkpoint_dir='', heuristic_start=False,
+         result_subset=None, **solver_settings):
     """
     Execute main script.
 
@@ -52,15 +85,173 @@ def main(param, data, mipgap='0.1', save_model=''):
 
     mipgap : str
         termination criterion for gap between current and optimal solution.
+        Overwrites the mipgap of the solver profile.
+
+    rolling_horizon : dict
+        Optional 'window' and 'overlap' in time steps to solve the
+        optimization period window by window instead of at once, e.g.
+        {'window': 336, 'overlap': 48} for two weeks with two days overlap.
+
+    aggregation : dict
+        Optional 'n_periods' and 'period_length' in time steps to solve only
+        typical periods of the time series, e.g. {'n_periods': 12,
+        'period_length': 24} for twelve typical days.
+
+    resolution : int
+        Length of the time steps of the optimization in hours. The time
+        dependent parameters are resampled to this resolution, so that the
+        time steps of rolling_horizon and aggregation refer to it as well.
+
+    solver : str
+        Name of the solver, one of 'gurobi', 'cbc', 'glpk' or 'highs'.
+
+    solver_profile : str
+        Name of the tuning profile in solver.SOLVER_PROFILES.
+
+    warm_start_cache : str
+        Optional directory of the warm start cache. The binary variables of
+        the most similar cached scenario are used as MIP start and the
+        solution is added to the cache.
+
+    backend : str
+        Model backend, either 'solph' for the oemof.solph model or 'sparse'
+        for the sparse matrix model of sparse_model.py, which is solved with
+        HiGHS regardless of the chosen solver and supports neither
+        aggregation nor warm start cache.
+
+    run_report : bool or str
+        Measure wall time and peak memory of each phase of the run and the
+        size of the model per component. The run report is added to the
+        meta results as 'run_report' and written to the file, if a file name
+        is given. The incumbent and bound over time of every solve are added
+        to the run report as 'solve_progress'.
+
+    checkpoint_dir : str
+        Optional directory of incumbent checkpoints. Every new incumbent is
+        written to the checkpoint of the scenario, so that a killed or
+        timed-out run keeps its best solution. An existing checkpoint of the
+        scenario is used as MIP start, so that calling main again resumes
+        the run.
+
+    heuristic_start : bool
+        Use the merit order dispatch of dispatch_heuristic.py as MIP start.
+        Binary variables of the warm start cache and checkpoints overwrite
+        it. The meta results of the simulated dispatch are added to the meta
+        results as 'heuristic'. Not supported with aggregation.
+
+    result_subset : dict
+        Optional labels of the nodes by the name of the variables to extract
+        from the solved model, see result_extraction.extract_results. It
+        needs to contain the variables of
+        result_extraction.POSTPROCESSING_SUBSET, which is the least memory
+        consuming choice. All variables are extracted by default.
+
+    **solver_settings
+        Further generic solver settings overwriting the ones of the solver
+        profile, e.g. 'threads' or 'time_limit'.
+    """
+    if backend not in ['solph', 'sparse']:
+        raise ValueError(
+            f"The backend '{backend}' does not exist. Choose either 'solph' "
+            + "or 'sparse'."
+            )
+    if backend == 'sparse' and (aggregation or warm_start_cache):
+        raise ValueError(
+            "The sparse backend supports neither aggregation nor warm start "
+            + "cache."
+            )
+    if heuristic_start and aggregation:
+        raise ValueError(
+            "The heuristic start is not supported with aggregation."
+            )
+
+    if storage_exclusivity(param) == 'sos1' and (
+            backend == 'sparse' or solver not in SOS_SOLVERS):
+        raise ValueError(
+            "The storage exclusivity 'sos1' is only supported by the solph "
+            + "backend with the solvers " + ", ".join(SOS_SOLVERS) + "."
+            )
+
+    if invest_components(param):
+        check_investment(param)
+        if backend == 'sparse' or rolling_horizon or aggregation:
+            raise ValueError(
+                "The sizes of the components can only be optimized with the "
+                + "full model of the solph backend."
+                )
+
+    param = resample_param(param, resolution)
+    data = resample_data(data, resolution)
+
+    solver_settings.update({'solver': solver, 'profile': solver_profile})
+    if mipgap is not None:
+        solver_settings['mipgap'] = float(mipgap)
+
+    report = RunReport() if run_report else None
+
+    if rolling_horizon:
+        results, meta_results = solve_rolling_horizon(
+            param, data, save_model=save_model,
+            warm_start_cache=warm_start_cache, backend=backend,
+            report=report, checkpoint_dir=checkpoint_dir,
+            heuristic_start=heuristic_start, result_subset=result_subset,
+            **rolling_horizon, **solver_settings
+            )
+    elif aggregation:
+        results, meta_results = solve_aggregated(
+            param, data, save_model=save_model,
+            warm_start_cache=warm_start_cache, report=report,
+            checkpoint_dir=checkpoint_dir, result_subset=result_subset,
+            **aggregation, **solver_settings
+            )
+    else:
+        results, meta_results = solve_model(
+            param, data, save_model=save_model,
+            warm_start_cache=warm_start_cache, backend=backend,
+            report=report, checkpoint_dir=checkpoint_dir,
+            heuristic_start=heuristic_start, result_subset=result_subset,
+            **solver_settings
+            )
+
+    if invest_components(param):
+        meta_results['investment'] = invested_sizes(results, param)
+
+    with measure(report, 'postprocessing'):
+        data_dhs, data_invest, data_emission, data_cost_units = (
+            postprocessing(results, param, data)
+            )
+
+    if report is not None:
+        meta_results['run_report'] = report.finish(
+            run_report if isinstance(run_report, str) else ''
+            )
+
+    return (
+        data_dhs, data_invest, data_emission, data_cost_units, meta_results
+        )
+
+
+def create_energysystem(param, data):
+    """
+    Create energy system of the Generic Model.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
     """
     # %% Initialize energy system
     periods = len(data)
-    date_time_index = pd.date_range(data.index[0], periods=periods, freq='h')
+    date_time_index = pd.date_range(
+        data.index[0], periods=periods,
+        freq=pd.Timedelta(hours=timestep_length(data.index))
+        )
 
     energysystem = solph.EnergySystem(timeindex=date_time_index)
 
-    topology_check(param)
-
     # %% Busses
     gnw = solph.Bus(label='Gasnetzwerk')
     enw = solph.Bus(label='Elektrizitätsnetzwerk')
@@ -103,19 +294,19 @@ def main(param, data, mipgap='0.1', save_model=''):
     # %% Transformer
     if param['EHK']['active']:
         energysystem.add(
-            electric_boiler(param, data, busses)
+            *electric_boiler(param, data, busses)
             )
     if param['SLK']['active']:
         energysystem.add(
-            peak_load_boiler(param, data, busses)
+            *peak_load_boiler(param, data, busses)
             )
     if param['BHKW']['active']:
         energysystem.add(
-            internal_combustion_engine(param, data, busses, periods)
+            *internal_combustion_engine(param, data, busses, periods)
             )
     if param['GuD']['active']:
         energysystem.add(
-            combined_cycle_extraction_turbine(param, data, busses, periods)
+            *combined_cycle_extraction_turbine(param, data, busses, periods)
             )
     if param['BPT']['active']:
         energysystem.add(
@@ -123,11 +314,11 @@ def main(param, data, mipgap='0.1', save_model=''):
             )
     if param['HP']['active']:
         energysystem.add(
-            ht_heat_pump(param, data, busses)
+            *ht_heat_pump(param, data, busses)
             )
     if param['LT-HP']['active']:
         energysystem.add(
-            lt_heat_pump(param, data, busses)
+            *lt_heat_pump(param, data, busses)
             )
 
     # %% Speicher
@@ -137,38 +328,438 @@ def main(param, data, mipgap='0.1', save_model=''):
             )
     if param['ST-TES']['active']:
         energysystem.add(
-            short_term_thermal_energy_storage(param, busses)
+            *short_term_thermal_energy_storage(param, busses)
             )
 
-    # return energysystem
+    return energysystem
 
-    # %% Solve
-    model = solph.Model(energysystem)
-    solph.constraints.limit_active_flow_count_by_keyword(
-        model, 'storageflowlimit', lower_limit=0, upper_limit=1)
+
+def build_model(param, data, report=None, **kwargs):
+    """
+    Build the optimization model of the Generic Model.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    report : profiling.RunReport
+        Optional run report the phases and the model size are measured in.
+
+    **kwargs
+        Further keyword arguments passed to solph.Model.
+    """
+    with measure(report, 'topology_check'):
+        topology_check(param)
+
+    with measure(report, 'components'):
+        energysystem = create_energysystem(param, data)
+
+    with measure(report, 'model_build'):
+        model = solph.Model(energysystem, **kwargs)
+        add_storage_exclusivity(model, param)
+        set_unit_counts(model, param)
+        relax_chp_status(model, param)
+        add_symmetry_breaking(model, param)
+        presolve_model(model, param, data)
+        add_final_storage_levels(model, param)
+        add_investment_costs(model, param, data)
+
+    if report is not None:
+        report.count_model(model)
+
+    return model
+
+
+def optimize(model, save_model='', report=None, progress=None,
+             **solver_settings):
+    """
+    Solve the optimization model of the Generic Model.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    save_model : str
+        Optional file name to write the model to in lp format.
+
+    report : profiling.RunReport
+        Optional run report the phases and the solve progress are measured
+        in.
+
+    progress : solve_progress.SolveProgress
+        Optional record of the incumbent and bound over time.
+
+    **solver_settings
+        Solver, tuning profile and generic solver settings passed to
+        solver.solve.
+
+    Returns
+    -------
+    dict
+        Status of the solver run.
+    """
     if save_model:
-        model.write(
-            f'{save_model}.lp', io_options={'symbolic_solver_labels': True}
+        with measure(report, 'lp_write'):
+            model.write(
+                f'{save_model}.lp',
+                io_options={'symbolic_solver_labels': True}
+                )
+    with measure(report, 'solve'):
+        status = solve(model, progress=progress, **solver_settings)
+    if report is not None and progress is not None:
+        report.add_progress(progress.entries)
+    return status
+
+
+def start_progress(model, param, data, checkpoint_dir='', report=None):
+    """
+    Get record of the solve progress and load the checkpoint of the model.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters of the model.
+
+    checkpoint_dir : str
+        Optional directory of incumbent checkpoints.
+
+    report : profiling.RunReport
+        Optional run report the solve progress is added to.
+
+    Returns
+    -------
+    tuple
+        Solve progress (None without run report and checkpoint directory)
+        and whether a checkpoint was loaded as MIP start.
+    """
+    if report is None and not checkpoint_dir:
+        return None, False
+    progress = SolveProgress()
+    if not checkpoint_dir:
+        return progress, False
+    progress.checkpoint_file = checkpoint_file(checkpoint_dir, param, data)
+    return progress, load_checkpoint(model, progress.checkpoint_file)
+
+
+def get_results(model, report=None, result_subset=None):
+    """
+    Get results of the solved optimization model of the Generic Model.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Solved optimization model of the Generic Model.
+
+    report : profiling.RunReport
+        Optional run report the phases are measured in.
+
+    result_subset : dict
+        Optional labels of the nodes by the name of the variables to extract,
+        see result_extraction.extract_results. All variables are extracted by
+        default.
+    """
+    energysystem = model.es
+
+    with measure(report, 'results'):
+        # Ergebnisse in results
+        results = extract_results(model, subset=result_subset)
+
+        # Main- und Metaergebnisse
+        energysystem.results['main'] = results
+        energysystem.results['meta'] = solph.processing.meta_results(model)
+
+    return results, energysystem.results['meta']
+
+
+def solve_model(param, data, save_model='', warm_start_cache='',
+                backend='solph', report=None, checkpoint_dir='',
+                heuristic_start=False, result_subset=None, **solver_settings):
+    """
+    Build and solve the optimization model of the Generic Model.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    save_model : str
+        Optional file name to write the model to in lp format.
+
+    warm_start_cache : str
+        Optional directory of the warm start cache.
+
+    backend : str
+        Model backend, either 'solph' or 'sparse'.
+
+    report : profiling.RunReport
+        Optional run report the phases and the model size are measured in.
+
+    checkpoint_dir : str
+        Optional directory of incumbent checkpoints.
+
+    heuristic_start : bool
+        Use the merit order dispatch as MIP start.
+
+    result_subset : dict
+        Optional labels of the nodes by the name of the variables to extract,
+        see result_extraction.extract_results.
+
+    **solver_settings
+        Solver, tuning profile and generic solver settings passed to
+        solver.solve.
+    """
+    if backend == 'sparse':
+        solver_settings.pop('solver', None)
+        results, meta_results = solve_sparse_model(
+            param, data, save_model=save_model, report=report,
+            checkpoint_dir=checkpoint_dir, heuristic_start=heuristic_start,
+            **solver_settings
+            )
+        results = select_results(results, subset=result_subset)
+        check_storage_exclusivity(results, meta_results, param)
+        return results, meta_results
+
+    model = build_model(param, data, report=report)
+
+    # %% Warmstart
+    warmstart = False
+    heuristic_meta = None
+    if heuristic_start:
+        with measure(report, 'heuristic'):
+            heuristic_results, heuristic_meta = simulate_dispatch(param, data)
+            set_mip_start(model, heuristic_results)
+        warmstart = True
+    if warm_start_cache:
+        warmstart = (
+            load_warm_start(model, warm_start_cache, param, data) or warmstart
             )
-    model.solve(solver='gurobi', solve_kwargs={'tee': True},
-                cmdline_options={"mipgap": mipgap})
+    progress, resumed = start_progress(
+        model, param, data, checkpoint_dir=checkpoint_dir, report=report
+        )
+
+    # %% Solve
+    status = optimize(
+        model, save_model=save_model, report=report, progress=progress,
+        warmstart=warmstart or resumed, **solver_settings
+        )
+    if warm_start_cache:
+        save_warm_start(model, warm_start_cache, param, data)
 
     # %% Ergebnisse Energiesystem
+    results, meta_results = get_results(
+        model, report=report, result_subset=result_subset
+        )
+    meta_results['status'] = status
+    release_model(model)
+    if heuristic_meta is not None:
+        meta_results['heuristic'] = heuristic_meta
+    check_storage_exclusivity(results, meta_results, param)
+
+    return results, meta_results
+
+
+def solve_rolling_horizon(param, data, window, overlap, save_model='',
+                          warm_start_cache='', backend='solph', report=None,
+                          checkpoint_dir='', heuristic_start=False,
+                          result_subset=None, **solver_settings):
+    """
+    Solve the optimization model of the Generic Model window by window.
+
+    The storage content at the end of the kept part of each window is the
+    initial storage level of the next window for every storage unit. The
+    seasonal storage is not balanced within a window, as the balance refers
+    to the full optimization period. Instead, a balanced seasonal storage
+    ends the last window with its storage level at the start of the first
+    window. A free initial storage level is balanced within the first window,
+    so that the heat of the initial storage content is not used for free.
+    The last window has to be long enough to refill the storage. The
+    objective of the meta results is the sum of the objectives
+    of the windows including their overlaps (see combine_meta_results).
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    window : int
+        Number of time steps of each window.
+
+    overlap : int
+        Number of time steps each window overlaps with the next one.
+
+    save_model : str
+        Optional file name to write the model of each window to in lp format.
+
+    warm_start_cache : str
+        Optional directory of the warm start cache.
+
+    backend : str
+        Model backend, either 'solph' or 'sparse'.
 
-    # Ergebnisse in results
-    results = solph.processing.results(model)
+    report : profiling.RunReport
+        Optional run report the phases and the model size are measured in.
 
-    # Main- und Metaergebnisse
-    energysystem.results['main'] = solph.processing.results(model)
-    energysystem.results['meta'] = solph.processing.meta_results(model)
+    checkpoint_dir : str
+        Optional directory of incumbent checkpoints, which has a checkpoint
+        for every window.
+
+    heuristic_start : bool
+        Use the merit order dispatch of each window as MIP start.
+
+    result_subset : dict
+        Optional labels of the nodes by the name of the variables to extract,
+        see result_extraction.extract_results.
+
+    **solver_settings
+        Solver, tuning profile and generic solver settings passed to
+        solver.solve.
+    """
+    windows = horizon_windows(len(data), window, overlap)
+    balanced = (
+        param['TES']['active'] and param['TES']['balanced']
+        and len(windows) > 1
+        )
+    window_param = deepcopy(param)
+    final_levels = None
+    window_results = list()
+    window_meta_results = list()
+    for nr, (start, stop, keep) in enumerate(windows):
+        if balanced:
+            window_param['TES']['balanced'] = (
+                nr == 0 and param['TES']['init_storage'] is None
+                )
+        if nr == len(windows) - 1 and balanced:
+            window_param['TES']['final_storage'] = final_levels
+        results, meta_results = solve_model(
+            window_param, data.iloc[start:stop],
+            save_model=f'{save_model}_{nr}' if save_model else '',
+            warm_start_cache=warm_start_cache, backend=backend,
+            report=report, checkpoint_dir=checkpoint_dir,
+            heuristic_start=heuristic_start, result_subset=result_subset,
+            **solver_settings
+            )
+        if nr == 0 and balanced:
+            final_levels = final_storage_levels(param, results)
+        window_results.append((results, keep))
+        window_meta_results.append(meta_results)
+        window_param = carry_over_storage(window_param, results, keep)
+
+    return (
+        stitch_results(window_results),
+        combine_meta_results(window_meta_results)
+        )
+
+
+def solve_aggregated(param, data, n_periods, period_length=24, save_model='',
+                     warm_start_cache='', report=None, checkpoint_dir='',
+                     result_subset=None, **solver_settings):
+    """
+    Solve the optimization model of the Generic Model for typical periods.
+
+    The time series are clustered to typical periods, which are weighted in
+    the objective by the number of periods they represent. The seasonal
+    storage is linked across the periods and the results are disaggregated
+    to the original time series.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    n_periods : int
+        Number of typical periods.
+
+    period_length : int
+        Number of time steps of each period.
+
+    save_model : str
+        Optional file name to write the model to in lp format.
+
+    warm_start_cache : str
+        Optional directory of the warm start cache.
+
+    report : profiling.RunReport
+        Optional run report the phases and the model size are measured in.
+
+    checkpoint_dir : str
+        Optional directory of incumbent checkpoints.
+
+    result_subset : dict
+        Optional labels of the nodes by the name of the variables to extract,
+        see result_extraction.extract_results.
+
+    **solver_settings
+        Solver, tuning profile and generic solver settings passed to
+        solver.solve.
+    """
+    periods = len(data)
+    typical_data, cluster_order = aggregate_periods(
+        data, n_periods, period_length=period_length
+        )
+
+    model = build_model(
+        param, typical_data, report=report,
+        objective_weighting=(
+            period_weighting(cluster_order, period_length, periods)
+            * timestep_length(data.index)
+            )
+        )
+    if param['TES']['active']:
+        add_seasonal_storage_linking(
+            model, param, cluster_order, period_length, periods
+            )
+
+    warmstart = False
+    if warm_start_cache:
+        warmstart = load_warm_start(
+            model, warm_start_cache, param, typical_data
+            )
+    progress, resumed = start_progress(
+        model, param, typical_data, checkpoint_dir=checkpoint_dir,
+        report=report
+        )
+
+    status = optimize(
+        model, save_model=save_model, report=report, progress=progress,
+        warmstart=warmstart or resumed, **solver_settings
+        )
+    if warm_start_cache:
+        save_warm_start(model, warm_start_cache, param, typical_data)
 
-    data_dhs, data_invest, data_emission, data_cost_units = postprocessing(
-        results, param, data
+    storage_levels = remove_seasonal_storage_linking(model, param)
+    results, meta_results = get_results(
+        model, report=report, result_subset=result_subset
         )
+    meta_results['status'] = status
+    release_model(model)
+    check_storage_exclusivity(results, meta_results, param)
 
     return (
-        data_dhs, data_invest, data_emission, data_cost_units,
-        energysystem.results['meta']
+        disaggregate_results(
+            results, storage_levels, param, cluster_order, period_length,
+            data.index
+            ),
+        meta_results
         )
 
 
@@ -7,12 +7,63 @@ Created on Fri Aug  6 13:26:11 2021
 
 import os
 
+import pandas as pd
+
 
 def liste(parameter, periods):
     """Get timeseries list of parameter for solph components."""
     return [parameter for p in range(0, periods)]
 
 
+def timestep_length(timeindex):
+    """Get length of the time steps of a time index in hours."""
+    if timeindex.freq is None:
+        return 1
+    return pd.Timedelta(timeindex.freq).total_seconds() / 3600
+
+
+def flatten_param(param, sep='.'):
+    """Get flat dictionary of the parameters, e.g. {'TES.Q': 2000}."""
+    flat_param = dict()
+    for key, value in param.items():
+        if isinstance(value, dict):
+            for subkey, subvalue in flatten_param(value, sep=sep).items():
+                flat_param[key + sep + subkey] = subvalue
+        else:
+            flat_param[key] = value
+    return flat_param
+
+
+def unit_parameters(prm, nr, keys=('init_storage', 'init_status',
+                                    'final_storage')):
+    """
+    Get parameters of a unit of a component.
+
+    The keys may be given per unit as list, e.g. the storage levels carried
+    over between the windows of the rolling horizon.
+
+    Parameters
+    ----------
+    prm : dict
+        Parameters of the component, e.g. param['TES'].
+
+    nr : int
+        Number of the unit starting at one.
+
+    keys : tuple of str
+        Keys which may be given per unit.
+
+    Returns
+    -------
+    dict
+        Parameters of the component with the values of the unit.
+    """
+    return {
+        key: value[nr-1] if key in keys and isinstance(value, list) else value
+        for key, value in prm.items()
+        }
+
+
 def topology_check(param):
     """
     Check chosen topology for validity.
@@ -42,11 +93,13 @@ def result_labelling(labeldict, dataframe, export_missing_labels=False):
     """Rename flows to user readable names."""
     missing_labels = str()
     for col in dataframe.columns:
-        if col in labeldict:
-            dataframe.rename(columns={col: labeldict[col]}, inplace=True)
-        else:
+        if col not in labeldict:
             print(col, ' not in labeldict')
             missing_labels += 'labeldict[' + str(col) + '] = \n'
+    dataframe.columns = pd.Index(
+        [labeldict.get(col, col) for col in dataframe.columns],
+        tupleize_cols=False
+        )
     if export_missing_labels:
         if os.path.exists('missing_labels.txt'):
             with open('missing_labels.txt', 'a', encoding='utf-8') as file:
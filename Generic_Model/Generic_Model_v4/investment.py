@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Investment optimization of the component sizes of Generic Model energy
+system.
+
+If 'invest' is set in the parameters of a component, its size is optimized
+between 'invest_min' (default 0) and 'invest_max' within the dispatch
+optimization instead of being given, so that a single solve replaces the
+loops over a grid of sizes:
+
+- 'Sol': collector area 'A' in m^2
+- 'EHK' and 'SLK': nominal heat output 'Q_N' in MW
+- 'TES' and 'ST-TES': storage capacity 'Q' in MWh
+
+The investment costs are annuitised with 'interest_rate' (default 0.05)
+and 'lifetime' (default 20 years) of the global parameters and weighted by
+the share of the year the optimization covers. The fixed operational costs
+are added per size. The specific investment costs 'inv_spez' of the boilers
+are linear. The investment costs of the solar thermal (eco_funcs.invest_sol)
+and of the storages (eco_funcs.invest_stes) are nonlinear and linearised
+piecewise with 'invest_segments' (default 4) segments of equal size.
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+from copy import deepcopy
+
+import numpy as np
+import oemof.solph as solph
+from pyomo.environ import (
+    Block, Constraint, NonNegativeReals, Piecewise, Var
+    )
+
+from eco_funcs import invest_sol, invest_stes
+
+
+# Components with optimized size and the parameter of their size
+SIZE_PARAMETERS = {
+    'Sol': 'A', 'EHK': 'Q_N', 'SLK': 'Q_N', 'TES': 'Q', 'ST-TES': 'Q'
+    }
+
+# Result key of the flow the size of the components is added to, which is
+# the invested flow or the input flow of the invested storage
+SIZE_KEYS = {
+    'Sol': ('Solarthermie', 'Sol Knoten'),
+    'EHK': ('Elektroheizkessel_1', 'Wärmenetzwerk'),
+    'SLK': ('Spitzenlastkessel_1', 'Wärmenetzwerk'),
+    'TES': ('TES Knoten', 'TES_1'),
+    'ST-TES': ('Wärmenetzwerk', 'ST-TES_1')
+    }
+
+STORAGES = ['TES', 'ST-TES']
+
+# Components with nonlinear investment costs
+NONLINEAR_COSTS = ['Sol', 'TES', 'ST-TES']
+
+HOURS_PER_YEAR = 8760
+
+
+def invest_components(param):
+    """Get the active components with optimized size."""
+    return [
+        comp for comp in SIZE_PARAMETERS
+        if param[comp]['active'] and param[comp].get('invest', False)
+        ]
+
+
+def check_investment(param):
+    """
+    Check whether the sizes of the components can be optimized.
+
+    The size of a component is only optimized for a single unit. The boilers
+    need the constant type, as the time series type gives the nominal value
+    per time step.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+    """
+    for comp in invest_components(param):
+        if comp in ['EHK', 'SLK'] and param[comp]['type'] != 'constant':
+            raise ValueError(
+                f"The size of {comp} can only be optimized for the type "
+                + "'constant'."
+                )
+        if param[comp].get('amount', 1) != 1:
+            raise ValueError(
+                f"The size of {comp} can only be optimized for a single unit."
+                )
+
+
+def size_bounds(param, comp):
+    """Get minimal and maximal size of a component with optimized size."""
+    return param[comp].get('invest_min', 0), param[comp]['invest_max']
+
+
+def size_kwargs(param, comp, key='nominal_value', scale=1):
+    """
+    Get the keyword arguments of the size of a component.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    comp : str
+        Name of the component, one of SIZE_PARAMETERS.
+
+    key : str
+        Keyword of the given size, e.g. 'nominal_storage_capacity'.
+
+    scale : float
+        Factor from the size parameter to the nominal value.
+
+    Returns
+    -------
+    dict
+        Given nominal value or solph.Investment with the size bounds. The
+        investment costs are added by add_investment_costs.
+    """
+    if comp not in invest_components(param):
+        return {key: param[comp][SIZE_PARAMETERS[comp]] * scale}
+    minimum, maximum = size_bounds(param, comp)
+    return {'investment': solph.Investment(
+        ep_costs=0, minimum=minimum * scale, maximum=maximum * scale
+        )}
+
+
+def solar_scale(param, data):
+    """Get the nominal solar thermal heat flow per collector area."""
+    return data['solar_data_' + param['Sol']['usage']].max()
+
+
+def annuity_factor(param):
+    """Get the annuity factor of the investment costs."""
+    q = 1 + param['param'].get('interest_rate', 0.05)
+    n = param['param'].get('lifetime', 20)
+    return q**n * (q - 1) / (q**n - 1)
+
+
+def investment_costs(comp, size):
+    """Get the investment costs of a component by its size."""
+    if size <= 0:
+        return 0
+    if comp == 'Sol':
+        return invest_sol(size, col_type='flat')
+    return invest_stes(size)
+
+
+def add_investment_costs(model, param, data):
+    """
+    Add the annuitised costs of the optimized sizes to the objective.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+    """
+    comps = invest_components(param)
+    if not comps:
+        return
+
+    # The size and the investment costs are indexed by a flow of the
+    # components, so that they are part of its results. The results of the
+    # solph model skip the auxiliary variables of indexed piecewise
+    # constraints only.
+    nodes = {str(n): n for n in model.es.nodes}
+    index = dict()
+    invest = dict()
+    for comp in comps:
+        source, target = (nodes[label] for label in SIZE_KEYS[comp])
+        index[comp] = (source, target)
+        if comp in STORAGES:
+            invest[comp] = model.GenericInvestmentStorageBlock.invest[target]
+        else:
+            invest[comp] = model.InvestmentFlow.invest[source, target]
+    comp_of = {idx: comp for comp, idx in index.items()}
+    nonlinear = [index[comp] for comp in comps if comp in NONLINEAR_COSTS]
+    segments = param['param'].get('invest_segments', 4)
+
+    block = Block()
+    model.add_component('InvestmentCostBlock', block)
+    block.size = Var(
+        list(comp_of), within=NonNegativeReals,
+        bounds=lambda block, i, o: size_bounds(param, comp_of[i, o])
+        )
+    block.size_link = Constraint(
+        comps, rule=lambda block, comp: (
+            block.size[index[comp]] * (
+                solar_scale(param, data) if comp == 'Sol' else 1
+                ) == invest[comp]
+            )
+        )
+    block.costs = Var(nonlinear, within=NonNegativeReals)
+    block.piecewise = Piecewise(
+        nonlinear, block.costs, block.size,
+        pw_pts={
+            idx: list(np.linspace(
+                *size_bounds(param, comp_of[idx]), segments + 1
+                ))
+            for idx in nonlinear
+            },
+        f_rule=lambda block, i, o, size: investment_costs(
+            comp_of[i, o], size
+            ),
+        pw_constr_type='EQ', pw_repn='INC'
+        )
+
+    years = sum(
+        model.objective_weighting[t] for t in model.TIMESTEPS
+        ) / HOURS_PER_YEAR
+    annuity = annuity_factor(param)
+    costs = 0
+    for comp in comps:
+        size = block.size[index[comp]]
+        if comp in NONLINEAR_COSTS:
+            invest_costs = block.costs[index[comp]]
+        else:
+            invest_costs = param[comp]['inv_spez'] * size
+        costs += (
+            annuity * invest_costs + param[comp].get('op_cost_fix', 0) * size
+            ) * years
+
+    model.objective.expr = model.objective.expr + costs
+
+
+def invested_sizes(results, param):
+    """
+    Get the optimized sizes of the components.
+
+    Parameters
+    ----------
+    results : dict of pandas.Series and pandas.DataFrame
+        Full results from solph.processing.results() call.
+
+    param : dict
+        JSON parameter file of user defined constants.
+
+    Returns
+    -------
+    dict
+        Optimized size parameter of the components.
+    """
+    comps = invest_components(param)
+    sizes = dict()
+    for key, res in results.items():
+        labels = tuple(str(node) for node in key)
+        for comp in comps:
+            if labels == SIZE_KEYS[comp]:
+                sizes[comp] = float(res['scalars']['size'])
+    return sizes
+
+
+def invested_param(results, param):
+    """Get parameters with the optimized sizes of the components."""
+    sizes = invested_sizes(results, param)
+    if not sizes:
+        return param
+    param = deepcopy(param)
+    for comp, size in sizes.items():
+        param[comp][SIZE_PARAMETERS[comp]] = size
+    return param
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Static presolve of Generic Model energy system.
+
+Before the model is solved, the flows and operating statuses that the time
+series force to zero are fixed and the upper bounds of the flows are
+tightened to their maximum per time step:
+
+- the flows of the solar thermal node at night
+- the charging of the seasonal storage from the low temperature heat
+  network, if no solar thermal heat is fed in and the storage exclusivity
+  'flow_count' or 'sos1' allows only one storage flow per time step
+- the heat pump in hours without available power ('P_max_hp' is zero)
+- the fuel, electrical and heat flow of the CHPs by the fuel flow at their
+  maximal load point of every hour instead of the global nominal value
+
+The solar thermal and must-run sources are fixed flows already. The presolve
+is skipped if 'presolve' is set to false in the global parameters.
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+import numpy as np
+
+from components import chp_parameters
+from storage_exclusivity import storage_exclusivity
+from unit_aggregation import aggregated_amount, model_variables, unit_labels
+
+
+def presolve_active(param):
+    """Check whether the presolve is used for the parameters."""
+    return param['param'].get('presolve', True)
+
+
+def flow_bounds(param, data):
+    """
+    Get upper bounds of the flows and statuses given by the time series.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    Returns
+    -------
+    dict of numpy.ndarray
+        Upper bound of every time step by result key and name of the
+        variables, zero where they are fixed to zero.
+    """
+    periods = len(data)
+    bounds = dict()
+
+    def series(value):
+        return np.broadcast_to(np.asarray(value, dtype=float), (periods,))
+
+    def bound(key, name, upper):
+        bounds[(key, name)] = np.minimum(
+            bounds.get((key, name), np.inf), series(upper)
+            )
+
+    # Solar thermal heat is the only inflow of the solar thermal node and,
+    # if only one storage flow is active per time step, the only surplus of
+    # the low temperature heat network to charge the storage. With the
+    # other formulations, discharged heat may be charged again.
+    lt_surplus = np.zeros(periods, dtype=bool)
+    if param['Sol']['active']:
+        usage = param['Sol']['usage']
+        sun = data['solar_data_' + usage].to_numpy() > 0
+        upper = np.where(sun, np.inf, 0)
+        aux_label = 'Sol_to_' + usage
+        bus = 'LT-Wärmenetzwerk' if usage == 'LT' else 'Wärmenetzwerk'
+        bound(('Sol Knoten', aux_label), 'flow', upper)
+        bound((aux_label, bus), 'flow', upper)
+        if param['Sol-EC']['active']:
+            bound(('Sol Knoten', 'Sol-EC'), 'flow', upper)
+        if usage == 'LT':
+            lt_surplus = sun
+    single_storage_flow = storage_exclusivity(param) in ['flow_count', 'sos1']
+    if param['TES']['active'] and single_storage_flow:
+        upper = np.where(lt_surplus, np.inf, 0)
+        bound(('LT-Wärmenetzwerk', 'LT_to_TES_node'), 'flow', upper)
+        bound(('LT_to_TES_node', 'TES Knoten'), 'flow', upper)
+
+    if param['HP']['active']:
+        hp = param['HP']
+        if hp['type'] == 'time series':
+            p_max, p_min = data['P_max_hp'], data['P_min_hp']
+            c_0, c_1 = data['c_0_hp'], data['c_1_hp']
+        else:
+            p_max, p_min = hp['P_max'], hp['P_min']
+            c_0, c_1 = hp['c_0'], hp['c_1']
+        p_max, p_min, c_0, c_1 = (
+            series(value) for value in [p_max, p_min, c_0, c_1]
+            )
+        available = p_max > 0
+        heat_max = np.maximum.reduce(
+            [np.zeros(periods), c_1 * p_max + c_0, c_1 * p_min + c_0]
+            )
+        units = aggregated_amount(param, 'HP')
+        for label in unit_labels(param, 'HP'):
+            bound(
+                ('Elektrizitätsnetzwerk', label), 'flow',
+                np.where(available, np.inf, 0)
+                )
+            bound(
+                ('Elektrizitätsnetzwerk', label), 'status',
+                np.where(available, np.inf, 0)
+                )
+            bound(
+                (label, 'Wärmenetzwerk'), 'flow',
+                np.where(available, heat_max * units, 0)
+                )
+
+    # The fuel flow is bounded by the maximal load point and the electrical
+    # and heat flow are bounded by the fuel flow
+    for comp in ['BHKW', 'GuD', 'BPT']:
+        if param[comp]['active']:
+            labels, chp = chp_parameters(param, data, comp)
+            fuel_max = (
+                series(chp['P_max_woDH']) / series(chp['Eta_el_max_woDH'])
+                * chp['units']
+                )
+            for label in labels:
+                bound(('Gasnetzwerk', label), 'flow', fuel_max)
+                bound((label, 'Elektrizitätsnetzwerk'), 'flow', fuel_max)
+                bound((label, 'Wärmenetzwerk'), 'flow', fuel_max)
+
+    return bounds
+
+
+def presolve_model(model, param, data):
+    """
+    Fix and tighten the variables of the model by the time series.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+    """
+    if not presolve_active(param):
+        return
+    for (key, name), upper in flow_bounds(param, data).items():
+        for var, upper_t in zip(model_variables(model, key, name), upper):
+            if upper_t <= 0:
+                var.fix(0)
+            elif not var.fixed and (var.ub is None or upper_t < var.ub):
+                var.setub(upper_t)
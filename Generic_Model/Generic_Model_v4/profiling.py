@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Run report of Generic Model energy system.
+
+The wall time and peak memory of each phase of a run (topology check,
+component construction, model build, lp write, solve, results and
+postprocessing), the size of the optimization model per component and the
+incumbent and bound progress of the solves are collected in a run report,
+which is returned as JSON compatible dict.
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+import json
+import os
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+from pyomo.environ import Constraint, Var
+
+
+def rss():
+    """Get resident set size of the process in MB (None without psutil)."""
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process(os.getpid()).memory_info().rss / 1024**2
+
+
+class RunReport():
+    """
+    Wall time, peak memory and model size of a run of the Generic Model.
+
+    Phases measured more than once, e.g. for every window of the rolling
+    horizon, are summed up for the wall time and maximized for the memory.
+    """
+
+    def __init__(self):
+        self.phases = dict()
+        self.model_size = dict()
+        self.solve_progress = list()
+        self.solves = 0
+        self.start = time.perf_counter()
+        self.tracing = not tracemalloc.is_tracing()
+        if self.tracing:
+            tracemalloc.start()
+
+    @contextmanager
+    def phase(self, name):
+        """Measure wall time and peak memory of a phase."""
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - start
+            peak_memory = tracemalloc.get_traced_memory()[1] / 1024**2
+            current_rss = rss()
+
+            entry = self.phases.setdefault(
+                name,
+                {'wall_time': 0, 'peak_memory': 0, 'rss': None, 'calls': 0}
+                )
+            entry['wall_time'] += wall_time
+            entry['peak_memory'] = max(entry['peak_memory'], peak_memory)
+            if current_rss is not None:
+                entry['rss'] = max(entry['rss'] or 0, current_rss)
+            entry['calls'] += 1
+
+    def count_model(self, model):
+        """Count variables, constraints and binaries of the model."""
+        if hasattr(model, 'model_size'):
+            self.model_size = model.model_size()
+        else:
+            self.model_size = model_size(model)
+
+    def add_progress(self, entries):
+        """Add incumbent and bound over time of a solve of the run."""
+        for entry in entries:
+            self.solve_progress.append(dict(entry, solve=self.solves))
+        self.solves += 1
+
+    def finish(self, file_name=''):
+        """
+        Stop the measurement and get the run report.
+
+        Parameters
+        ----------
+        file_name : str
+            Optional file name to write the run report to as JSON.
+
+        Returns
+        -------
+        dict
+            Phases with wall time in s, peak memory of python objects and
+            resident set size in MB, the model size and the incumbent and
+            bound over time of every solve.
+        """
+        if self.tracing:
+            tracemalloc.stop()
+            self.tracing = False
+        report = {
+            'total_wall_time': time.perf_counter() - self.start,
+            'phases': self.phases,
+            'model_size': self.model_size,
+            'solve_progress': self.solve_progress
+            }
+        if file_name:
+            with open(file_name, 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=4, ensure_ascii=False)
+        return report
+
+
+def measure(report, name):
+    """Get context of a phase of the run report, if one is collected."""
+    if report is None:
+        return nullcontext()
+    return report.phase(name)
+
+
+def component_label(index, default):
+    """
+    Get label of the component a variable or constraint belongs to.
+
+    The first node of the index, which is not a bus, is the component, e.g.
+    the storage of its charging flow. Indices without nodes belong to the
+    pyomo component.
+    """
+    index = index if isinstance(index, tuple) else (index,)
+    nodes = [node for node in index if hasattr(node, 'label')]
+    for node in nodes:
+        if type(node).__name__ != 'Bus':
+            return str(node.label)
+    if nodes:
+        return str(nodes[0].label)
+    return default
+
+
+def model_size(model):
+    """
+    Count variables, constraints and binaries of the model per component.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    Returns
+    -------
+    dict
+        Total numbers and numbers per component label.
+    """
+    components = defaultdict(
+        lambda: {'variables': 0, 'constraints': 0, 'binaries': 0}
+        )
+    for var in model.component_objects(Var, descend_into=True):
+        for index, var_data in var.items():
+            label = component_label(index, var.name)
+            components[label]['variables'] += 1
+            if var_data.is_binary():
+                components[label]['binaries'] += 1
+    for con in model.component_objects(
+            Constraint, active=True, descend_into=True):
+        for index in con:
+            components[component_label(index, con.name)]['constraints'] += 1
+
+    total = {'variables': 0, 'constraints': 0, 'binaries': 0}
+    for size in components.values():
+        for key in total:
+            total[key] += size[key]
+
+    return {
+        'total': total,
+        'components': dict(sorted(components.items()))
+        }
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Resampling of Generic Model input data to a coarser time resolution.
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+from copy import deepcopy
+from math import ceil
+
+# Upper bounds are resampled to the minimum and lower bounds to the maximum
+# of the time steps, so that the resampled bound holds in every hour. All
+# other time series are averaged, which keeps the energy of power time series
+# like 'heat_demand' or 'solar_data_*' consistent with the longer time steps.
+RESAMPLING_METHODS = {
+    'P_max_hp': 'min',
+    'P_min_hp': 'max',
+    'Q_EHK': 'min',
+    'Q_SLK': 'min'
+    }
+
+
+def resample_data(data, resolution):
+    """
+    Resample time dependent parameters to a coarser time resolution.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    resolution : int
+        Length of the resampled time steps in hours.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Time dependent parameters with a time step length of resolution.
+    """
+    if resolution == 1:
+        return data
+
+    methods = {
+        col: RESAMPLING_METHODS.get(col, 'mean') for col in data.columns
+        }
+    resampled_data = data.resample(f'{resolution}h', origin='start').agg(
+        methods
+        )
+
+    if 'P_min_hp' in resampled_data and 'P_max_hp' in resampled_data:
+        resampled_data['P_min_hp'] = resampled_data[
+            ['P_min_hp', 'P_max_hp']
+            ].min(axis=1)
+
+    return resampled_data
+
+
+def resample_param(param, resolution):
+    """
+    Adapt user defined constants given in hours to a coarser time resolution.
+
+    The loss rates of the storages are not adapted, as solph applies them
+    per hour of the time step length.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    resolution : int
+        Length of the resampled time steps in hours.
+
+    Returns
+    -------
+    dict
+        JSON parameter file of user defined constants for the time step
+        length of resolution.
+    """
+    resampled_param = deepcopy(param)
+    resampled_param['TES']['min_uptime'] = ceil(
+        param['TES']['min_uptime'] / resolution
+        )
+    return resampled_param
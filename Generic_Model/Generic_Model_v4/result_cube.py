@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Memory-mapped result cube of Generic Model energy system runs.
+
+The time series of data_dhs of the runs of a result store are stacked into
+one array file with the dimensions (scenario, time step, flow), so that
+analyses across many runs read only the pages of the selected scenarios,
+time steps and flows. The flows are the labels of generate_labeldict of the
+parameters of the runs, flows missing in a run are NaN.
+
+In the file, the time series of each flow of a scenario are contiguous,
+e.g. the heat demand of a scenario in January is a single block of 3 kB.
+An index file maps the scenario hashes and the flows to their positions.
+The share of the heat pump in the heat demand of all scenarios in January
+is e.g.
+
+    cube = ResultCube(cube_dir)
+    january = cube.select(
+        flows=['Q_ab_HP_1', 'Q_demand'], start='2016-01-01',
+        stop='2016-01-31 23:00'
+        )
+    share = january[..., 0].sum(axis=1) / january[..., 1].sum(axis=1)
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+import json
+import mmap
+import os
+
+import numpy as np
+import pandas as pd
+from help_funcs import generate_labeldict
+from result_store import load_data_dhs, load_run, query_runs
+
+
+CUBE_FILE = 'cube.dat'
+INDEX_FILE = 'index.json'
+
+
+def cube_flows(params):
+    """Get labels of the flows of all parameters in order of the labeldict."""
+    flows = dict()
+    for param in params:
+        flows.update(dict.fromkeys(generate_labeldict(param).values()))
+    return list(flows)
+
+
+def write_cube(cube_dir, store_dir, scenarios=None, dtype='float32'):
+    """
+    Write the time series of the runs of a result store to a cube.
+
+    Runs already part of the cube are skipped, so that a cube is extended
+    by calling it again. The flows of an existing cube are kept.
+
+    Parameters
+    ----------
+    cube_dir : str
+        Directory of the cube.
+
+    store_dir : str
+        Directory of the result store.
+
+    scenarios : list of str
+        Optional hashes of the scenarios of the runs. All stored runs are
+        written by default.
+
+    dtype : str
+        Data type of the values of a new cube.
+    """
+    os.makedirs(cube_dir, exist_ok=True)
+    index_path = os.path.join(cube_dir, INDEX_FILE)
+    if scenarios is None:
+        scenarios = list(query_runs(store_dir).index)
+
+    if os.path.exists(index_path):
+        with open(index_path, 'r') as file:
+            index = json.load(file)
+    else:
+        index = {
+            'scenarios': list(),
+            'flows': cube_flows(
+                load_run(store_dir, scenario)[0] for scenario in scenarios
+                ),
+            'timeindex': None,
+            'dtype': dtype
+            }
+    timeindex = None
+    block_size = 0
+    if index['timeindex'] is not None:
+        timeindex = pd.DatetimeIndex(index['timeindex'])
+        block_size = (
+            np.dtype(index['dtype']).itemsize * len(index['flows'])
+            * len(timeindex)
+            )
+
+    new_scenarios = [
+        scenario for scenario in dict.fromkeys(scenarios)
+        if scenario not in set(index['scenarios'])
+        ]
+    with open(os.path.join(cube_dir, CUBE_FILE), 'ab') as file:
+        # Blocks of an interrupted write are discarded
+        file.truncate(block_size * len(index['scenarios']))
+        for scenario in new_scenarios:
+            data_dhs = load_data_dhs(store_dir, scenario)
+            data_dhs = data_dhs.loc[:, ~data_dhs.columns.duplicated()]
+            if timeindex is None:
+                timeindex = data_dhs.index
+                index['timeindex'] = [str(step) for step in timeindex]
+            elif not data_dhs.index.equals(timeindex):
+                raise ValueError(
+                    f"The time steps of the run '{scenario}' differ from "
+                    + "the time steps of the cube."
+                    )
+            block = data_dhs.reindex(columns=index['flows']).to_numpy(
+                dtype=index['dtype']
+                )
+            file.write(np.ascontiguousarray(block.T).tobytes())
+            index['scenarios'].append(scenario)
+
+    with open(index_path, 'w') as file:
+        json.dump(index, file)
+
+
+def positions(labels, items, name):
+    """Get positions of the labels in the items of an axis of the cube."""
+    lookup = {item: i for i, item in enumerate(items)}
+    missing = [label for label in labels if label not in lookup]
+    if missing:
+        raise KeyError(f"The {name} {missing} are not part of the cube.")
+    return np.array([lookup[label] for label in labels], dtype=int)
+
+
+class ResultCube:
+    """
+    Time series of many runs as memory-mapped array.
+
+    Parameters
+    ----------
+    cube_dir : str
+        Directory of the cube written by write_cube().
+
+    random_access : bool
+        Disable reading ahead, so that selections of single flows or time
+        ranges read only their pages. Reading ahead is faster for scans of
+        whole scenarios.
+
+    Attributes
+    ----------
+    scenarios : list of str
+        Hashes of the scenarios of the runs.
+
+    flows : list of str
+        Labels of the flows.
+
+    index : pandas.DatetimeIndex
+        Time steps.
+
+    values : numpy.ndarray
+        Read-only memory-mapped values with the dimensions (scenario,
+        time step, flow).
+    """
+
+    def __init__(self, cube_dir, random_access=True):
+        with open(os.path.join(cube_dir, INDEX_FILE), 'r') as file:
+            index = json.load(file)
+        self.scenarios = index['scenarios']
+        self.flows = index['flows']
+        self.index = pd.DatetimeIndex(index['timeindex'] or [])
+
+        shape = (len(self.scenarios), len(self.flows), len(self.index))
+        if self.scenarios:
+            with open(os.path.join(cube_dir, CUBE_FILE), 'rb') as file:
+                self._mmap = mmap.mmap(
+                    file.fileno(), 0, access=mmap.ACCESS_READ
+                    )
+            # Selections are scattered over the file, reading ahead would
+            # load whole scenarios instead of the pages of the selection
+            if random_access and hasattr(mmap, 'MADV_RANDOM'):
+                self._mmap.madvise(mmap.MADV_RANDOM)
+            self._values = np.frombuffer(
+                self._mmap, dtype=index['dtype'], count=int(np.prod(shape))
+                ).reshape(shape)
+        else:
+            self._values = np.empty(shape, dtype=index['dtype'])
+        self.values = self._values.transpose(0, 2, 1)
+
+    def select(self, scenarios=None, flows=None, start=None, stop=None):
+        """
+        Read values of scenarios, flows and a time range.
+
+        Parameters
+        ----------
+        scenarios : list of str
+            Optional hashes of the scenarios. All scenarios by default.
+
+        flows : list of str
+            Optional labels of the flows. All flows by default.
+
+        start : str or pandas.Timestamp
+            Optional first time step.
+
+        stop : str or pandas.Timestamp
+            Optional last time step.
+
+        Returns
+        -------
+        numpy.ndarray
+            Values with the dimensions (scenario, time step, flow).
+        """
+        steps = self.index.slice_indexer(start, stop)
+        if scenarios is None:
+            scenario_pos = np.arange(len(self.scenarios))
+        else:
+            scenario_pos = positions(scenarios, self.scenarios, 'scenarios')
+        if flows is None:
+            flow_pos = np.arange(len(self.flows))
+        else:
+            flow_pos = positions(flows, self.flows, 'flows')
+        # Only the time range of each selected flow and scenario is read
+        values = self._values[scenario_pos[:, None], flow_pos[None, :], steps]
+        return values.transpose(0, 2, 1)
+
+    def frame(self, flow, scenarios=None, start=None, stop=None):
+        """
+        Read the time series of a flow of scenarios as DataFrame.
+
+        Parameters
+        ----------
+        flow : str
+            Label of the flow.
+
+        scenarios : list of str
+            Optional hashes of the scenarios. All scenarios by default.
+
+        start : str or pandas.Timestamp
+            Optional first time step.
+
+        stop : str or pandas.Timestamp
+            Optional last time step.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Time series with a column per scenario.
+        """
+        values = self.select(
+            scenarios=scenarios, flows=[flow], start=start, stop=stop
+            )
+        return pd.DataFrame(
+            values[..., 0].T.astype(float),
+            index=self.index[self.index.slice_indexer(start, stop)],
+            columns=self.scenarios if scenarios is None else scenarios
+            )
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Lean extraction of the results of Generic Model energy system.
+
+The values of the variables are copied out of the solved model in a single
+pass, without the intermediate DataFrame of all variables of
+solph.processing.results. The results have the same format. Optionally only
+a subset of the variables is extracted, e.g.
+
+    {'flow': ['Wärmenetzwerk', 'Elektrizitätsnetzwerk'],
+     'storage_content': None}
+
+for the flows of the heat and electricity network and the content of all
+storages. The model can be released right after the extraction.
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+import gc
+from collections import defaultdict
+from itertools import groupby
+
+import numpy as np
+import pandas as pd
+from oemof.solph.processing import get_timestep, get_tuple, remove_timestep
+from pyomo.core.base.piecewise import IndexedPiecewise
+from pyomo.environ import Var
+
+
+# Variables the postprocessing of the Generic Model needs, i.e. the flows
+# with their status, the storage content, the optimized sizes and the status
+# of the CHPs to split aggregated units
+POSTPROCESSING_SUBSET = {
+    'flow': None, 'status': None, 'storage_content': None, 'size': None,
+    'Y': None
+    }
+
+
+def in_subset(subset, name, key):
+    """
+    Check whether a variable of a result key is part of a subset.
+
+    Parameters
+    ----------
+    subset : dict
+        Labels of the nodes by the name of the variables, None for all nodes.
+        None for all variables.
+
+    name : str
+        Name of the variable.
+
+    key : tuple
+        Nodes or labels of the result key.
+
+    Returns
+    -------
+    bool
+        Whether the variable is part of the subset.
+    """
+    if subset is None:
+        return True
+    if name not in subset:
+        return False
+    labels = subset[name]
+    return labels is None or any(str(node) in labels for node in key)
+
+
+def extract_results(model, subset=None):
+    """
+    Get results of the solved optimization model.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Solved optimization model of the Generic Model.
+
+    subset : dict
+        Optional labels of the nodes by the name of the variables to
+        extract, None for all nodes. All variables are extracted by default.
+
+    Returns
+    -------
+    dict of pandas.Series and pandas.DataFrame
+        Results in the format of solph.processing.results.
+    """
+    timeindex = model.es.timeindex
+    periods = len(timeindex)
+
+    values = defaultdict(dict)
+    for var in model.component_objects(Var, descend_into=True):
+        # The auxiliary variables of indexed piecewise constraints are
+        # skipped like in solph.processing.results
+        if isinstance(var.parent_block().parent_component(), IndexedPiecewise):
+            continue
+        names = str(var).split('.')
+        prefix = None
+        for index, var_data in var.items():
+            value = var_data.value
+            if value is None:
+                continue
+            # Consecutive time steps of a flow or node share the result key
+            if prefix is not None and index[:-1] == prefix:
+                if sequence is not None:
+                    sequence[index[-1]] = value
+                continue
+
+            oemof_tuple = get_tuple((names[0], names[-1], index))
+            key = remove_timestep(oemof_tuple)
+            prefix = (
+                key if oemof_tuple is index and len(key) < len(index)
+                else None
+                )
+            if len(key) == 1:
+                key = (key[0], None)
+            if not in_subset(subset, names[-1], key):
+                sequence = None
+                continue
+            sequence = values[key].get(names[-1])
+            if sequence is None:
+                sequence = np.full(periods, np.nan)
+                values[key][names[-1]] = sequence
+            sequence[get_timestep(oemof_tuple)] = value
+
+    results = dict()
+    for key, variables in values.items():
+        frame = pd.DataFrame(
+            {name: variables[name] for name in sorted(variables)},
+            index=timeindex
+            )
+        frame.columns.name = 'variable_name'
+        # Variables without values at some time steps are scalars
+        condition = frame.isnull().any()
+        scalars = frame.loc[:, condition].dropna()
+        if scalars.empty:
+            scalars = pd.Series(
+                dtype=float, name=timeindex[0], index=scalars.columns
+                )
+        else:
+            scalars = scalars.iloc[0]
+        results[key] = {
+            'scalars': scalars, 'sequences': frame.loc[:, ~condition]
+            }
+
+    # Dual variables of the bus balances
+    if getattr(model, 'dual', None) is not None:
+        grouped = groupby(
+            sorted(model.Bus.balance.iterkeys()), lambda p: p[0]
+            )
+        for bus, timesteps in grouped:
+            if not in_subset(subset, 'duals', (bus,)):
+                continue
+            duals = [
+                model.dual[model.Bus.balance[bus, t]] for _, t in timesteps
+                ]
+            if (bus, None) not in results:
+                results[bus, None] = {
+                    'sequences': pd.DataFrame(
+                        {'duals': duals}, index=timeindex
+                        ),
+                    'scalars': pd.Series(dtype=float)
+                    }
+            else:
+                results[bus, None]['sequences']['duals'] = duals
+
+    return results
+
+
+def select_results(results, subset=None):
+    """
+    Get a subset of the variables of the results.
+
+    Parameters
+    ----------
+    results : dict of pandas.Series and pandas.DataFrame
+        Full results from solph.processing.results() call.
+
+    subset : dict
+        Optional labels of the nodes by the name of the variables to keep,
+        None for all nodes. All variables are kept by default.
+
+    Returns
+    -------
+    dict of pandas.Series and pandas.DataFrame
+        Results with the variables of the subset.
+    """
+    if subset is None:
+        return results
+    selected = dict()
+    for key, res in results.items():
+        sequences = [
+            name for name in res['sequences'].columns
+            if in_subset(subset, name, key)
+            ]
+        scalars = [
+            name for name in res['scalars'].index
+            if in_subset(subset, name, key)
+            ]
+        if sequences or scalars:
+            selected[key] = {
+                'scalars': res['scalars'][scalars],
+                'sequences': res['sequences'][sequences]
+                }
+    return selected
+
+
+def release_model(model):
+    """
+    Release the memory of a solved optimization model.
+
+    The components of the model are removed, so that the model can not be
+    used anymore. The energy system of the model is kept.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Solved optimization model of the Generic Model.
+    """
+    model.clear()
+    gc.collect()
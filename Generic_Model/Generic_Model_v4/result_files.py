@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar result files of Generic Model energy system.
+
+The results of main(), e.g. data_dhs, are written as compressed Parquet
+files instead of semicolon separated csv files, so that readers load single
+columns without parsing the whole file:
+
+- Float columns are stored as float32, if it represents all values of the
+  column within FLOAT32_TOLERANCE.
+- Mostly zero columns, e.g. the emergency cooling Q_HT_EC and Q_Sol_EC, are
+  stored sparsely with their zeros as missing values.
+- Duplicate column names get the suffixes of pandas.read_csv, e.g.
+  'Q_HT_node.1', as they are not allowed in Parquet files.
+
+The values are float64 again after reading and time ranges are filtered
+while reading. Parquet files need the optional dependency pyarrow.
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# Maximal absolute deviation of the float32 values of a column
+FLOAT32_TOLERANCE = 1e-4
+
+# Maximal share of nonzero values of sparsely stored columns
+SPARSE_SHARE = 0.1
+
+# Number of rows of the row groups, so that a year of hourly results is a
+# single row group. Monthly row groups of 744 rows would let readers skip the
+# months outside of a requested time range, but made data_dhs of a year 34 %
+# larger and its full read 2.7 times slower without faster reads of a month.
+ROW_GROUP_SIZE = 8784
+
+# Name of the column of the index and key of the metadata in the files
+INDEX_COLUMN = 'index'
+METADATA_KEY = b'generic_model'
+
+RESULT_FORMATS = ['csv', 'parquet']
+
+
+def unique_columns(columns):
+    """Get column names with the suffixes of pandas.read_csv for duplicates."""
+    names = list()
+    counts = dict()
+    for col in map(str, columns):
+        name = col
+        while name in counts:
+            counts[col] += 1
+            name = col + '.' + str(counts[col])
+        counts.setdefault(name, 0)
+        names.append(name)
+    return names
+
+
+def write_result(frame, file, compression='zstd'):
+    """
+    Write a result DataFrame to a Parquet file.
+
+    Parameters
+    ----------
+    frame : pandas.DataFrame
+        Result of main(), e.g. data_dhs or data_invest.
+
+    file : str
+        Path of the Parquet file.
+
+    compression : str
+        Compression codec of the Parquet file.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    frame = frame.copy()
+    frame.columns = unique_columns(frame.columns)
+    frame.index.name = INDEX_COLUMN
+
+    float32 = list()
+    sparse = list()
+    for col in frame.columns:
+        if not pd.api.types.is_float_dtype(frame[col]):
+            continue
+        values = frame[col].to_numpy()
+        with np.errstate(over='ignore', invalid='ignore'):
+            deviation = np.abs(values.astype(np.float32) - values)
+        if np.nanmax(deviation, initial=0) <= FLOAT32_TOLERANCE:
+            frame[col] = values.astype(np.float32)
+            float32.append(col)
+        # Missing values are zeros of sparse columns after reading
+        sparse_share = np.count_nonzero(values) / max(len(values), 1)
+        if sparse_share <= SPARSE_SHARE and not np.isnan(values).any():
+            frame[col] = frame[col].where(frame[col] != 0)
+            sparse.append(col)
+
+    table = pa.Table.from_pandas(frame, preserve_index=True)
+    table = table.replace_schema_metadata({
+        **table.schema.metadata,
+        METADATA_KEY: json.dumps({'float32': float32, 'sparse': sparse})
+        })
+    pq.write_table(
+        table, file, compression=compression, row_group_size=ROW_GROUP_SIZE
+        )
+
+
+def read_result(file, columns=None, start=None, stop=None):
+    """
+    Read a result DataFrame of a Parquet or csv file.
+
+    Parameters
+    ----------
+    file : str
+        Path of the Parquet file or semicolon separated csv file.
+
+    columns : list of str
+        Optional columns to read. All columns are read by default.
+
+    start : str or pandas.Timestamp
+        Optional first time step to read.
+
+    stop : str or pandas.Timestamp
+        Optional last time step to read.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Result with float64 values.
+    """
+    if os.path.splitext(file)[1] == '.csv':
+        frame = pd.read_csv(file, sep=';', index_col=0, parse_dates=True)
+        if columns is not None:
+            frame = frame[columns]
+        return frame.loc[start:stop]
+
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    filters = list()
+    if start is not None:
+        filters.append((INDEX_COLUMN, '>=', pd.Timestamp(start)))
+    if stop is not None:
+        filters.append((INDEX_COLUMN, '<=', pd.Timestamp(stop)))
+    table = pq.read_table(
+        file, columns=None if columns is None else [*columns, INDEX_COLUMN],
+        filters=filters or None
+        )
+    metadata = json.loads(table.schema.metadata[METADATA_KEY])
+
+    # Columns are restored before the conversion to pandas, which is faster
+    # than on the DataFrame
+    for i, name in enumerate(table.column_names):
+        column = table.column(i)
+        if name in metadata['sparse']:
+            column = pc.fill_null(column, 0)
+        if name in metadata['float32']:
+            column = column.cast(pa.float64())
+        if column is not table.column(i):
+            table = table.set_column(i, name, column)
+
+    frame = table.to_pandas()
+    frame.index.name = None
+    return frame
+
+
+def result_file(directory, name, result_format='parquet'):
+    """Get the path of a result file by its name, e.g. 'data_dhs'."""
+    return os.path.join(directory, name + '.' + result_format)
+
+
+def write_results(directory, results, result_format='parquet'):
+    """
+    Write the results of main() to a directory.
+
+    Parameters
+    ----------
+    directory : str
+        Existing directory of the result files.
+
+    results : dict of pandas.DataFrame
+        Results by their name, e.g. {'data_dhs': data_dhs}.
+
+    result_format : str
+        Format of the result files, either 'csv' or 'parquet'.
+    """
+    if result_format not in RESULT_FORMATS:
+        raise ValueError(
+            f"The result format '{result_format}' does not exist. Choose "
+            + "either 'csv' or 'parquet'."
+            )
+    for name, frame in results.items():
+        file = result_file(directory, name, result_format)
+        if result_format == 'parquet':
+            write_result(frame, file)
+        else:
+            frame.to_csv(file, sep=';')
+
+
+def read_results(directory, name, columns=None, start=None, stop=None):
+    """
+    Read a result of main() of a directory in any of the result formats.
+
+    Parameters
+    ----------
+    directory : str
+        Directory of the result files.
+
+    name : str
+        Name of the result, e.g. 'data_dhs'.
+
+    columns : list of str
+        Optional columns to read. All columns are read by default.
+
+    start : str or pandas.Timestamp
+        Optional first time step to read.
+
+    stop : str or pandas.Timestamp
+        Optional last time step to read.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Result with float64 values.
+    """
+    for result_format in RESULT_FORMATS[::-1]:
+        file = result_file(directory, name, result_format)
+        if os.path.exists(file):
+            return read_result(
+                file, columns=columns, start=start, stop=stop
+                )
+    raise FileNotFoundError(
+        f"There is no result '{name}' in the directory '{directory}'."
+        )
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Single pass extraction of the results of Generic Model energy system.
+
+The sequences of all results are gathered in one float matrix with a column
+per variable of each flow, so that the postprocessing reduces the matrix
+instead of filtering the results node by node. The columns are indexed by
+the labels of the flow and the name of the variable, i.e.
+(source, target, variable). Variables of a single node, e.g. the storage
+content, have the target 'None' like in the labeldict.
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+import numpy as np
+import pandas as pd
+
+
+class ResultMatrix:
+    """
+    Sequences of the optimization results as a single float matrix.
+
+    Parameters
+    ----------
+    results : dict of pandas.Series and pandas.DataFrame
+        Full results from solph.processing.results() call, keyed by the
+        nodes or by their labels.
+
+    Attributes
+    ----------
+    index : pandas.DatetimeIndex
+        Time steps of the rows of the matrix.
+
+    values : numpy.ndarray
+        Sequences with a row per time step and a column per variable.
+
+    columns : dict
+        Column of the values by (source, target, variable).
+
+    totals : numpy.ndarray
+        Sum of each column over all time steps.
+    """
+
+    def __init__(self, results):
+        frames = list()
+        self.columns = dict()
+        for key, res in results.items():
+            sequences = res['sequences']
+            if sequences.empty:
+                continue
+            source, target = (str(node) for node in key)
+            for variable in sequences.columns:
+                self.columns[source, target, variable] = len(self.columns)
+            frames.append(sequences)
+
+        self.index = frames[0].index if frames else pd.DatetimeIndex([])
+        for frame in frames[1:]:
+            if not frame.index.equals(self.index):
+                self.index = self.index.union(frame.index)
+
+        if frames:
+            self.values = np.column_stack([
+                (frame if frame.index.equals(self.index)
+                 else frame.reindex(self.index)).to_numpy(dtype=float)
+                for frame in frames
+                ])
+        else:
+            self.values = np.empty((len(self.index), 0))
+        self.totals = np.nansum(self.values, axis=0)
+
+    def flow(self, source, target, variable='flow'):
+        """Get the sequence of a variable of a flow."""
+        return self.values[:, self.columns[source, target, variable]]
+
+    def total(self, source, target, variable='flow'):
+        """Get the sum of a variable of a flow over all time steps."""
+        return self.totals[self.columns[source, target, variable]]
+
+    def select(self, source='', target='', variable='flow'):
+        """
+        Get the columns of a variable of all flows matching the labels.
+
+        Parameters
+        ----------
+        source : str
+            Beginning of the label of the source, e.g. 'BHKW' for all units.
+
+        target : str
+            Beginning of the label of the target.
+
+        variable : str
+            Name of the variable.
+
+        Returns
+        -------
+        numpy.ndarray
+            Columns of the matching flows.
+        """
+        return np.array([
+            col for (src, tgt, var), col in self.columns.items()
+            if src.startswith(source) and tgt.startswith(target)
+            and var == variable
+            ], dtype=int)
+
+    def node(self, label):
+        """
+        Get the columns of all flows of a node.
+
+        The columns are ordered like the sequences of solph.views.node.
+
+        Parameters
+        ----------
+        label : str
+            Label of the node.
+
+        Returns
+        -------
+        list of tuple
+            (source, target, variable) of the columns.
+        """
+        return sorted(
+            flow for flow in self.columns if label in flow[:2]
+            )
+
+    def frame(self, flows):
+        """
+        Get the sequences of flows as DataFrame.
+
+        Parameters
+        ----------
+        flows : list of tuple
+            (source, target, variable) of the columns, which may repeat.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Sequences with a column per flow named ((source, target),
+            variable) like the keys of help_funcs.generate_labeldict.
+        """
+        return pd.DataFrame(
+            self.values[:, [self.columns[flow] for flow in flows]],
+            index=self.index,
+            columns=pd.Index(
+                [((src, tgt), var) for src, tgt, var in flows],
+                tupleize_cols=False
+                )
+            )
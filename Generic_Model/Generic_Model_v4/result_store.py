@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+Result store of Generic Model energy system runs.
+
+The runs are stored in a SQLite database in the store directory, keyed by
+the hash of their parameters and time dependent parameters. The scalar
+results are flattened to keys like the overrides of the batch runs:
+
+- the parameters, e.g. 'TES.Q'
+- data_invest, e.g. 'data_invest.Gesamtbetrag'
+- data_cost_units, e.g. 'data_cost_units.invest.BHKW'
+- meta_results, e.g. 'meta_results.status.termination_condition'
+
+The keys are indexed, so that runs are queried without loading their time
+series, e.g. all runs with a TES larger than 100000 sorted by Gesamtbetrag:
+
+    query_runs(
+        store_dir, where=[('TES.Q', '>', 100000)],
+        order_by='data_invest.Gesamtbetrag'
+        )
+
+The time series of data_dhs are linked result files in a directory of each
+run, see result_files.
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+from help_funcs import flatten_param
+from result_files import read_result, write_results
+from warm_start import scenario_fingerprint
+
+
+DATABASE = 'results.sqlite'
+
+OPERATORS = ['=', '!=', '<', '<=', '>', '>=']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    scenario TEXT PRIMARY KEY,
+    stored TEXT,
+    data_dhs TEXT,
+    param TEXT,
+    data_invest TEXT,
+    data_cost_units TEXT,
+    meta_results TEXT
+    );
+CREATE TABLE IF NOT EXISTS scalars (
+    scenario TEXT,
+    key TEXT,
+    value,
+    PRIMARY KEY (scenario, key)
+    ) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS scalars_key_value ON scalars (key, value);
+"""
+
+
+def connect(store_dir):
+    """Get connection to the database of a store directory."""
+    os.makedirs(store_dir, exist_ok=True)
+    # Runs of a batch are stored concurrently by its worker processes
+    connection = sqlite3.connect(
+        os.path.join(store_dir, DATABASE), timeout=60
+        )
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def scalar_value(value):
+    """Get value of a scalar result as SQLite type."""
+    if hasattr(value, 'item'):
+        value = value.item()
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return json.dumps(value, default=str)
+
+
+def run_scalars(param, data_invest, data_cost_units, meta_results):
+    """
+    Get flattened scalar results of a run.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data_invest : pandas.DataFrame
+        Economic results of the run with a single row.
+
+    data_cost_units : pandas.DataFrame
+        Invest and operational cost of the units.
+
+    meta_results : dict
+        Meta results of the run.
+
+    Returns
+    -------
+    dict
+        Values by flattened key, e.g. {'TES.Q': 2000}.
+    """
+    results = {
+        'data_invest': data_invest.iloc[0].to_dict(),
+        'data_cost_units': data_cost_units.to_dict(orient='index'),
+        'meta_results': meta_results
+        }
+    scalars = {**flatten_param(param), **flatten_param(results)}
+    return {
+        key: scalar_value(value) for key, value in scalars.items()
+        if not (isinstance(value, float) and value != value)
+        }
+
+
+def store_run(store_dir, param, data, data_dhs, data_invest, data_cost_units,
+              meta_results, result_format='parquet'):
+    """
+    Store the results of a run.
+
+    A run of the same parameters and time dependent parameters is replaced.
+
+    Parameters
+    ----------
+    store_dir : str
+        Directory of the result store.
+
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    data_dhs, data_invest, data_cost_units : pandas.DataFrame
+        Results of main().
+
+    meta_results : dict
+        Meta results of main().
+
+    result_format : str
+        Format of the result file of data_dhs, either 'csv' or 'parquet'.
+
+    Returns
+    -------
+    str
+        Hash of the scenario of the run.
+    """
+    scenario = scenario_fingerprint(param, data)
+    run_dir = os.path.join(store_dir, scenario)
+    os.makedirs(run_dir, exist_ok=True)
+    write_results(
+        run_dir, {'data_dhs': data_dhs}, result_format=result_format
+        )
+
+    scalars = run_scalars(param, data_invest, data_cost_units, meta_results)
+    connection = connect(store_dir)
+    with connection:
+        connection.execute(
+            'DELETE FROM scalars WHERE scenario = ?', (scenario,)
+            )
+        connection.execute(
+            'INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (scenario, datetime.now().isoformat(timespec='seconds'),
+             'data_dhs.' + result_format,
+             json.dumps(param, default=str),
+             json.dumps(data_invest.iloc[0].to_dict(), default=str),
+             json.dumps(data_cost_units.to_dict(orient='index'), default=str),
+             json.dumps(meta_results, default=str))
+            )
+        connection.executemany(
+            'INSERT INTO scalars VALUES (?, ?, ?)',
+            [(scenario, key, value) for key, value in scalars.items()]
+            )
+    connection.close()
+    return scenario
+
+
+def query_runs(store_dir, where=None, order_by=None, ascending=True,
+               columns=None, limit=None):
+    """
+    Query the scalar results of the stored runs.
+
+    Parameters
+    ----------
+    store_dir : str
+        Directory of the result store.
+
+    where : list of tuple
+        Conditions (key, operator, value) all runs have to fulfill, e.g.
+        [('TES.Q', '>', 100000)]. The operators are '=', '!=', '<', '<=',
+        '>' and '>='.
+
+    order_by : str
+        Optional key to sort the runs by.
+
+    ascending : bool
+        Sort the runs in ascending order.
+
+    columns : list of str
+        Further keys of the scalar results to get.
+
+    limit : int
+        Optional maximal number of runs.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Runs by scenario hash with the keys of the conditions, the sort key
+        and the further keys as columns.
+    """
+    where = list() if where is None else where
+    keys = [key for key, _, _ in where]
+    keys += [key for key in [order_by, *(columns or [])] if key is not None]
+    keys = list(dict.fromkeys(keys))
+    alias = {key: f's{i}' for i, key in enumerate(keys)}
+
+    joins = list()
+    params = list()
+    for key in keys:
+        joins.append(
+            f'LEFT JOIN scalars AS {alias[key]} ON {alias[key]}.scenario '
+            + f'= runs.scenario AND {alias[key]}.key = ?'
+            )
+        params.append(key)
+    conditions = list()
+    for key, operator, value in where:
+        if operator not in OPERATORS:
+            raise ValueError(
+                f"The operator '{operator}' of the condition on '{key}' "
+                + f"does not exist. Choose one of {OPERATORS}."
+                )
+        conditions.append(f'{alias[key]}.value {operator} ?')
+        params.append(scalar_value(value))
+
+    select = ', '.join(
+        ['runs.scenario'] + [f'{alias[key]}.value' for key in keys]
+        )
+    query = f'SELECT {select} FROM runs ' + ' '.join(joins)
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    if order_by is not None:
+        direction = 'ASC' if ascending else 'DESC'
+        query += f' ORDER BY {alias[order_by]}.value {direction}'
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(int(limit))
+
+    connection = connect(store_dir)
+    rows = connection.execute(query, params).fetchall()
+    connection.close()
+    return pd.DataFrame(
+        [row[1:] for row in rows], columns=keys,
+        index=pd.Index([row[0] for row in rows], name='scenario')
+        )
+
+
+def stored_run(store_dir, scenario):
+    """Get the row of a stored run by its columns."""
+    connection = connect(store_dir)
+    connection.row_factory = sqlite3.Row
+    run = connection.execute(
+        'SELECT * FROM runs WHERE scenario = ?', (scenario,)
+        ).fetchone()
+    connection.close()
+    if run is None:
+        raise KeyError(f"The run '{scenario}' is not stored.")
+    return run
+
+
+def load_run(store_dir, scenario):
+    """
+    Load the scalar results of a stored run.
+
+    Parameters
+    ----------
+    store_dir : str
+        Directory of the result store.
+
+    scenario : str
+        Hash of the scenario of the run.
+
+    Returns
+    -------
+    param : dict
+        JSON parameter file of the run.
+
+    data_invest, data_cost_units : pandas.DataFrame
+        Results of main().
+
+    meta_results : dict
+        Meta results of main().
+    """
+    run = stored_run(store_dir, scenario)
+    return (
+        json.loads(run['param']),
+        pd.DataFrame([json.loads(run['data_invest'])]),
+        pd.DataFrame.from_dict(
+            json.loads(run['data_cost_units']), orient='index'
+            ),
+        json.loads(run['meta_results'])
+        )
+
+
+def load_data_dhs(store_dir, scenario, columns=None, start=None, stop=None):
+    """
+    Load the time series of a stored run.
+
+    Parameters
+    ----------
+    store_dir : str
+        Directory of the result store.
+
+    scenario : str
+        Hash of the scenario of the run.
+
+    columns : list of str
+        Optional columns to load. All columns are loaded by default.
+
+    start : str or pandas.Timestamp
+        Optional first time step to load.
+
+    stop : str or pandas.Timestamp
+        Optional last time step to load.
+
+    Returns
+    -------
+    pandas.DataFrame
+        data_dhs of the run.
+    """
+    run = stored_run(store_dir, scenario)
+    return read_result(
+        os.path.join(store_dir, scenario, run['data_dhs']), columns=columns,
+        start=start, stop=stop
+        )
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+Rolling horizon functions for Generic Model energy system.
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+from copy import deepcopy
+
+import pandas as pd
+from help_funcs import unit_parameters
+
+
+def horizon_windows(periods, window, overlap):
+    """
+    Split the optimization period into overlapping windows.
+
+    Parameters
+    ----------
+    periods : int
+        Number of time steps of the full optimization period.
+
+    window : int
+        Number of time steps of each window.
+
+    overlap : int
+        Number of time steps each window overlaps with the next one.
+
+    Returns
+    -------
+    list of tuple
+        Start and stop index of every window and the number of time steps
+        of the window that are kept in the stitched results.
+    """
+    if window <= 0:
+        raise ValueError(
+            f"The window length has to be positive, but is {window}."
+            )
+    if not 0 <= overlap < window:
+        raise ValueError(
+            f"The overlap of {overlap} time steps has to be smaller than the"
+            + f" window length of {window} time steps."
+            )
+
+    windows = list()
+    start = 0
+    while start < periods:
+        stop = min(start + window, periods)
+        if stop == periods:
+            keep = stop - start
+        else:
+            keep = window - overlap
+        windows.append((start, stop, keep))
+        start += keep
+    return windows
+
+
+def storage_labels(param):
+    """Get labels of all active thermal energy storages per component."""
+    labels = dict()
+    for comp in ['TES', 'ST-TES']:
+        if param[comp]['active']:
+            labels[comp] = [
+                comp + '_' + str(i)
+                for i in range(1, param[comp]['amount']+1)
+                ]
+    return labels
+
+
+def carry_over_storage(param, results, keep):
+    """
+    Get parameters of the next window from the results of the current one.
+
+    The storage content and the status of the charging flow of every storage
+    unit at the last kept time step become its initial storage level and
+    initial status in the next window.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants of the current window.
+
+    results : dict of pandas.Series and pandas.DataFrame
+        Full results from solph.processing.results() call of the current
+        window.
+
+    keep : int
+        Number of time steps of the current window kept in the results.
+
+    Returns
+    -------
+    dict
+        JSON parameter file of user defined constants of the next window
+        with the initial storage levels and statuses per unit.
+    """
+    next_param = deepcopy(param)
+    for comp, labels in storage_labels(param).items():
+        levels = dict()
+        status = dict()
+        for (node_from, node_to), res in results.items():
+            if str(node_from) in labels and node_to is None:
+                content = res['sequences']['storage_content']
+                levels[str(node_from)] = (
+                    content.iloc[keep-1] / param[comp]['Q']
+                    )
+            elif str(node_to) in labels:
+                status[str(node_to)] = int(round(
+                    res['sequences']['status'].iloc[keep-1]
+                    ))
+        next_param[comp]['init_storage'] = [levels[lbl] for lbl in labels]
+        next_param[comp]['init_status'] = [status[lbl] for lbl in labels]
+    return next_param
+
+
+def final_storage_levels(param, results):
+    """
+    Get storage levels a balanced seasonal storage has to end with.
+
+    These are the initial storage levels of the full optimization period,
+    which are taken from the results of the first window if they are free.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    results : dict of pandas.Series and pandas.DataFrame
+        Full results from solph.processing.results() call of the first
+        window.
+
+    Returns
+    -------
+    list of float
+        Final storage level of every unit of the seasonal storage.
+    """
+    storage_results = {
+        str(node_from): res for (node_from, node_to), res in results.items()
+        if node_to is None
+        }
+    levels = list()
+    for nr, label in enumerate(storage_labels(param)['TES'], start=1):
+        level = unit_parameters(param['TES'], nr)['init_storage']
+        if level is None:
+            level = (
+                storage_results[label]['scalars']['init_content']
+                / param['TES']['Q']
+                )
+        levels.append(level)
+    return levels
+
+
+def add_final_storage_levels(model, param):
+    """
+    Fix the storage content of the seasonal storage at the end of the period.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    param : dict
+        JSON parameter file of user defined constants with the optional
+        final storage levels 'final_storage' of the seasonal storage.
+    """
+    if not param['TES']['active'] or not hasattr(
+            model, 'GenericStorageBlock'):
+        return
+    storage_block = model.GenericStorageBlock
+    last = model.TIMESTEPS.last()
+    for n in storage_block.STORAGES:
+        label = str(n.label)
+        if not label.startswith('TES_'):
+            continue
+        prm = unit_parameters(param['TES'], int(label.split('_')[1]))
+        if prm.get('final_storage') is not None:
+            storage_block.storage_content[n, last].fix(
+                prm['final_storage'] * n.nominal_storage_capacity
+                )
+
+
+def stitch_results(window_results):
+    """
+    Stitch the results of all windows to results of the full period.
+
+    Parameters
+    ----------
+    window_results : list of tuple
+        Full results from solph.processing.results() call of every window
+        and the number of time steps kept of each window.
+
+    Returns
+    -------
+    dict of pandas.Series and pandas.DataFrame
+        Results of the full optimization period keyed by the nodes of the
+        first window.
+    """
+    labelled_results = [
+        ({tuple(str(node) for node in key): res
+          for key, res in results.items()}, keep)
+        for results, keep in window_results
+        ]
+
+    stitched_results = dict()
+    for key, res in window_results[0][0].items():
+        label_key = tuple(str(node) for node in key)
+        sequences = [
+            results[label_key]['sequences'].iloc[:keep]
+            for results, keep in labelled_results
+            ]
+        stitched_results[key] = {
+            'scalars': res['scalars'],
+            'sequences': pd.concat(sequences)
+            }
+    return stitched_results
+
+
+def combine_meta_results(window_meta_results):
+    """
+    Combine meta results of all windows to one dictionary.
+
+    The objective is the sum of the objectives of the windows, which
+    includes the overlapping time steps of the windows that are not kept.
+    It is therefore not comparable to the objective of a solve of the full
+    optimization period. The economic results of the postprocessing are
+    computed from the stitched results and are comparable.
+    """
+    meta_results = deepcopy(window_meta_results[-1])
+    meta_results['objective'] = sum(
+        meta['objective'] for meta in window_meta_results
+        )
+    meta_results['windows'] = window_meta_results
+    return meta_results
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Screening of parameter sets for Generic Model energy system.
+
+Every parameter set is solved as linear relaxation of the optimization
+model first. Only the best parameter sets by the relaxed Gesamtbetrag are
+solved as mixed integer problem afterwards.
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+import pandas as pd
+
+from generic_model_v4 import main, build_model, optimize, get_results
+from resampling import resample_data, resample_param
+from postprocessing import postprocessing
+from result_extraction import POSTPROCESSING_SUBSET, release_model
+
+
+def relax_model(model):
+    """
+    Relax the optimization model to a linear problem.
+
+    The binary variables of the NonConvex flows and the GenericCHPs are
+    relaxed to continuous variables and the storage exclusivity is removed.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+    """
+    model.relax_problem()
+    if hasattr(model, 'storageflowlimit_constraint'):
+        model.storageflowlimit_constraint.deactivate()
+    if hasattr(model, 'StorageExclusivityBlock'):
+        model.StorageExclusivityBlock.deactivate()
+    return model
+
+
+def solve_relaxed(param, data, resolution=1, **solver_settings):
+    """
+    Solve the linear relaxation of the Generic Model.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    resolution : int
+        Length of the time steps of the optimization in hours.
+
+    **solver_settings
+        Solver, tuning profile and generic solver settings passed to
+        solver.solve.
+
+    Returns
+    -------
+    tuple
+        data_dhs, data_invest, data_emission, data_cost_units and
+        meta_results as returned by main().
+    """
+    param = resample_param(param, resolution)
+    data = resample_data(data, resolution)
+
+    model = relax_model(build_model(param, data))
+    status = optimize(model, **solver_settings)
+    results, meta_results = get_results(
+        model, result_subset=POSTPROCESSING_SUBSET
+        )
+    meta_results['status'] = status
+    release_model(model)
+
+    return (*postprocessing(results, param, data), meta_results)
+
+
+def screen_scenarios(params, data, top_k, resolution=1, solver='gurobi',
+                     solver_profile='default', **kwargs):
+    """
+    Rank parameter sets by their relaxed Gesamtbetrag and solve the best.
+
+    Parameters
+    ----------
+    params : dict of dict
+        JSON parameter files of user defined constants by scenario name.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    top_k : int
+        Number of best scenarios solved as mixed integer problem.
+
+    resolution : int
+        Length of the time steps of the optimization in hours.
+
+    solver : str
+        Name of the solver, one of 'gurobi', 'cbc', 'glpk' or 'highs'.
+
+    solver_profile : str
+        Name of the tuning profile in solver.SOLVER_PROFILES.
+
+    **kwargs
+        Further keyword arguments passed to main() for the best scenarios.
+
+    Returns
+    -------
+    ranking : pandas.DataFrame
+        Relaxed Gesamtbetrag of all scenarios in descending order and the
+        Gesamtbetrag of the best scenarios solved as mixed integer problem.
+
+    scenario_results : dict of tuple
+        Results of main() of the best scenarios by scenario name.
+    """
+    relaxed = dict()
+    for name, param in params.items():
+        data_invest = solve_relaxed(
+            param, data, resolution=resolution, solver=solver,
+            profile=solver_profile
+            )[1]
+        relaxed[name] = data_invest['Gesamtbetrag'].iloc[0]
+
+    ranking = pd.DataFrame({'Gesamtbetrag_relaxed': pd.Series(relaxed)})
+    ranking.sort_values('Gesamtbetrag_relaxed', ascending=False, inplace=True)
+    ranking['Gesamtbetrag'] = float('nan')
+
+    scenario_results = dict()
+    for name in ranking.index[:top_k]:
+        scenario_results[name] = main(
+            params[name], data, resolution=resolution, solver=solver,
+            solver_profile=solver_profile, **kwargs
+            )
+        ranking.loc[name, 'Gesamtbetrag'] = (
+            scenario_results[name][1]['Gesamtbetrag'].iloc[0]
+            )
+
+    return ranking, scenario_results
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+Solve progress and incumbent checkpoints of Generic Model energy system.
+
+The incumbent and the bound of a solver run are recorded over time, either
+by a callback of the solver or from its log. Every new incumbent is written
+to a checkpoint file of the scenario, so that the best solution of a killed
+or timed-out run is kept and can be used as MIP start of the next run.
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+import os
+import re
+
+import numpy as np
+from pyomo.environ import Var
+
+from warm_start import scenario_fingerprint
+
+
+# Objective values above are the solvers' placeholder for no solution
+NO_SOLUTION = 1e50
+
+NUMBER = r'[-+]?(?:\d+\.?\d*(?:[eE][-+]?\d+)?|inf)'
+
+# Patterns of the incumbent and bound in the solver logs
+LOG_PATTERNS = {
+    'gurobi': re.compile(
+        rf'\s(-|{NUMBER})\s+(-|{NUMBER})\s+(?:-|[\d.]+%)\s+(?:-|[\d.]+)'
+        + r'\s+(\d+)s\s*$'
+        ),
+    'cbc_incumbent': re.compile(
+        rf'Cbc00(?:04|12)I Integer solution of ({NUMBER}).*'
+        + r'\(([\d.]+) seconds\)'
+        ),
+    'cbc_bound': re.compile(
+        rf'Cbc0010I .* ({NUMBER}) best solution, best possible ({NUMBER}) '
+        + r'\(([\d.]+) seconds\)'
+        )
+    }
+
+
+def finite(value):
+    """Get value as float, None if there is no finite value."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not np.isfinite(value) or abs(value) >= NO_SOLUTION:
+        return None
+    return value
+
+
+class SolveProgress():
+    """
+    Incumbent and bound of a solver run over time.
+
+    Parameters
+    ----------
+    checkpoint_file : str
+        Optional npz file every new incumbent is written to.
+    """
+
+    def __init__(self, checkpoint_file=''):
+        self.checkpoint_file = checkpoint_file
+        self.entries = list()
+
+    def add(self, time, incumbent, bound):
+        """Add incumbent and bound at a time of the run, if one changed."""
+        entry = {
+            'time': float(time),
+            'incumbent': finite(incumbent),
+            'bound': finite(bound)
+            }
+        if self.entries and (
+                self.entries[-1]['incumbent'] == entry['incumbent']
+                and self.entries[-1]['bound'] == entry['bound']):
+            return
+        self.entries.append(entry)
+
+    def new_incumbent(self, time, objective, bound, values, names=None):
+        """
+        Add a new incumbent and write it to the checkpoint file.
+
+        Parameters
+        ----------
+        time : float
+            Running time of the solver in s.
+
+        objective : float
+            Objective value of the incumbent.
+
+        bound : float
+            Objective bound at the time of the incumbent.
+
+        values : numpy.ndarray
+            Values of the variables of the incumbent.
+
+        names : numpy.ndarray
+            Names of the variables, None for the columns of the sparse
+            model.
+        """
+        self.add(time, objective, bound)
+        if self.checkpoint_file:
+            save_checkpoint(
+                self.checkpoint_file, values, objective, names=names
+                )
+
+
+def checkpoint_file(checkpoint_dir, param, data, backend='solph'):
+    """Get checkpoint file of a scenario in the checkpoint directory."""
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    return os.path.join(
+        checkpoint_dir, f'{scenario_fingerprint(param, data)}_{backend}.npz'
+        )
+
+
+def save_checkpoint(file_name, values, objective, names=None):
+    """
+    Write values of the variables of a solution to a checkpoint file.
+
+    The file is replaced at once, so that a killed run leaves either the
+    previous or the new checkpoint.
+
+    Parameters
+    ----------
+    file_name : str
+        npz file of the checkpoint.
+
+    values : numpy.ndarray
+        Values of the variables.
+
+    objective : float
+        Objective value of the solution.
+
+    names : numpy.ndarray
+        Names of the variables, None for the columns of the sparse model.
+    """
+    arrays = {
+        'values': np.asarray(values, dtype=np.float64),
+        'objective': np.float64(objective)
+        }
+    if names is not None:
+        arrays['names'] = np.asarray(names, dtype=str)
+
+    temp_file = file_name + '.tmp'
+    with open(temp_file, 'wb') as file:
+        np.savez(file, **arrays)
+    os.replace(temp_file, file_name)
+
+
+def read_checkpoint(file_name):
+    """
+    Read a checkpoint file.
+
+    Returns
+    -------
+    dict
+        'values', 'objective' and 'names' (None for the columns of the
+        sparse model) of the checkpoint or None, if there is none.
+    """
+    if not os.path.isfile(file_name):
+        return None
+    with np.load(file_name) as checkpoint:
+        return {
+            'values': checkpoint['values'],
+            'objective': float(checkpoint['objective']),
+            'names': (
+                checkpoint['names'] if 'names' in checkpoint.files else None
+                )
+            }
+
+
+def model_values(model):
+    """Get names and values of the variables of the model with a value."""
+    names = list()
+    values = list()
+    for var in model.component_data_objects(Var):
+        if var.value is not None:
+            names.append(var.name)
+            values.append(var.value)
+    return np.array(names, dtype=str), np.array(values, dtype=np.float64)
+
+
+def load_checkpoint(model, file_name):
+    """
+    Set variables of the model to the values of a checkpoint.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    file_name : str
+        npz file of the checkpoint.
+
+    Returns
+    -------
+    bool
+        True if values of the checkpoint were loaded as MIP start.
+    """
+    checkpoint = read_checkpoint(file_name)
+    if checkpoint is None or checkpoint['names'] is None:
+        return False
+
+    values = dict(zip(checkpoint['names'], checkpoint['values']))
+    loaded = False
+    for var in model.component_data_objects(Var):
+        var_value = values.get(var.name)
+        if var_value is not None and not var.fixed:
+            var.set_value(float(var_value), skip_validation=True)
+            loaded = True
+    return loaded
+
+
+def parse_solver_log(log_file, solver):
+    """
+    Get incumbent and bound over time from a solver log.
+
+    Parameters
+    ----------
+    log_file : str
+        Log file of the solver run.
+
+    solver : str
+        Name of the solver, the logs of 'gurobi' and 'cbc' are parsed.
+
+    Returns
+    -------
+    list of dict
+        'time' in s, 'incumbent' and 'bound' of the run.
+    """
+    progress = SolveProgress()
+    if not os.path.isfile(log_file):
+        return progress.entries
+
+    incumbent = None
+    bound = None
+    with open(log_file, 'r', errors='replace') as file:
+        for line in file:
+            if solver == 'gurobi':
+                match = LOG_PATTERNS['gurobi'].search(line)
+                if match:
+                    progress.add(match[3], match[1], match[2])
+            elif solver == 'cbc':
+                match = LOG_PATTERNS['cbc_incumbent'].search(line)
+                if match:
+                    incumbent = match[1]
+                    progress.add(match[2], incumbent, bound)
+                    continue
+                match = LOG_PATTERNS['cbc_bound'].search(line)
+                if match:
+                    incumbent = match[1]
+                    bound = match[2]
+                    progress.add(match[3], incumbent, bound)
+    return progress.entries
@@ -0,0 +1,638 @@
+# -*- coding: utf-8 -*-
+"""
+Solver backend for Generic Model energy system.
+
+Solver settings are given with generic names and translated to the options
+of the chosen solver. Settings a solver does not support are skipped.
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+import os
+from tempfile import TemporaryDirectory
+
+import numpy as np
+from pyomo.core.expr.symbol_map import SymbolMap
+from pyomo.environ import SolverFactory, Var, value
+from pyomo.opt import SolverResults, SolverStatus, TerminationCondition
+from pyomo.repn import generate_standard_repn
+
+from solve_progress import model_values, parse_solver_log, save_checkpoint
+
+
+# Named tuning profiles of generic solver settings
+SOLVER_PROFILES = {
+    'default': {'mipgap': 0.1},
+    'screening': {'mipgap': 0.2, 'time_limit': 600, 'mipfocus': 1},
+    'precise': {'mipgap': 0.01, 'mipfocus': 2},
+    'worker': {'mipgap': 0.1, 'threads': 1, 'presolve': True}
+    }
+
+# Names of the generic solver settings per solver
+SOLVER_OPTIONS = {
+    'gurobi': {
+        'mipgap': 'MIPGap', 'threads': 'Threads', 'time_limit': 'TimeLimit',
+        'presolve': 'Presolve', 'mipfocus': 'MIPFocus'
+        },
+    'cbc': {
+        'mipgap': 'ratio', 'threads': 'threads', 'time_limit': 'sec',
+        'presolve': 'presolve'
+        },
+    'glpk': {
+        'mipgap': 'mipgap', 'time_limit': 'tmlim', 'presolve': 'presol'
+        },
+    'highs': {
+        'mipgap': 'mip_rel_gap', 'threads': 'threads',
+        'time_limit': 'time_limit', 'presolve': 'presolve'
+        }
+    }
+
+# Values of the generic presolve setting per solver, None is skipped
+PRESOLVE_VALUES = {
+    'gurobi': {True: -1, False: 0},
+    'cbc': {True: 'on', False: 'off'},
+    'glpk': {True: '', False: None},
+    'highs': {True: 'on', False: 'off'}
+    }
+
+
+def solver_options(solver, profile='default', **settings):
+    """
+    Get solver specific options of a tuning profile.
+
+    Parameters
+    ----------
+    solver : str
+        Name of the solver, one of 'gurobi', 'cbc', 'glpk' or 'highs'.
+
+    profile : str
+        Name of the tuning profile in SOLVER_PROFILES.
+
+    **settings
+        Generic solver settings overwriting the ones of the profile:
+        'mipgap', 'threads', 'time_limit' in seconds, 'presolve' (bool) and
+        'mipfocus' (Gurobi only).
+
+    Returns
+    -------
+    dict
+        Options of the solver.
+    """
+    if solver not in SOLVER_OPTIONS:
+        raise ValueError(
+            f"The solver '{solver}' is not supported. Choose one of "
+            + f"{list(SOLVER_OPTIONS)}."
+            )
+    if profile not in SOLVER_PROFILES:
+        raise ValueError(
+            f"The solver profile '{profile}' does not exist. Choose one of "
+            + f"{list(SOLVER_PROFILES)}."
+            )
+
+    generic_settings = dict(SOLVER_PROFILES[profile], **settings)
+
+    options = dict()
+    for setting, value in generic_settings.items():
+        if setting not in SOLVER_OPTIONS[solver] or value is None:
+            continue
+        if setting == 'presolve':
+            value = PRESOLVE_VALUES[solver][bool(value)]
+            if value is None:
+                continue
+        elif setting == 'time_limit' and solver == 'glpk':
+            value = int(value)
+        options[SOLVER_OPTIONS[solver][setting]] = value
+
+    return options
+
+
+def solve(model, solver='gurobi', profile='default', tee=True,
+          warmstart=False, progress=None, **settings):
+    """
+    Solve optimization model with the chosen solver and tuning profile.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    solver : str
+        Name of the solver, one of 'gurobi', 'cbc', 'glpk' or 'highs'.
+
+    profile : str
+        Name of the tuning profile in SOLVER_PROFILES.
+
+    tee : bool
+        Show output of the solver.
+
+    warmstart : bool
+        Pass the current values of the variables to the solver as MIP
+        start. GLPK does not support a MIP start.
+
+    progress : solve_progress.SolveProgress
+        Optional record of the incumbent and bound over time. HiGHS and
+        Gurobi with a checkpoint file report every new incumbent by callback
+        and write it to the checkpoint file. For the other solvers the
+        progress is read from the log and only the final solution is
+        written to the checkpoint file.
+
+    **settings
+        Generic solver settings overwriting the ones of the profile.
+
+    Returns
+    -------
+    dict
+        Status of the solver run (see solver_status).
+    """
+    options = solver_options(solver, profile=profile, **settings)
+
+    if solver == 'highs':
+        solve_highs(
+            model, options, tee=tee, warmstart=warmstart, progress=progress
+            )
+    elif (solver == 'gurobi' and progress is not None
+          and progress.checkpoint_file):
+        PersistentGurobi(
+            model, options, tee=tee, progress=progress
+            ).solve(warmstart=warmstart)
+    else:
+        solve_kwargs = {'tee': tee}
+        if warmstart and solver != 'glpk':
+            solve_kwargs['warmstart'] = True
+        with TemporaryDirectory() as tmpdir:
+            if progress is not None:
+                solve_kwargs['logfile'] = os.path.join(tmpdir, 'solver.log')
+            model.solve(
+                solver=solver, solve_kwargs=solve_kwargs,
+                cmdline_options=options
+                )
+            if progress is not None:
+                progress.entries.extend(
+                    parse_solver_log(solve_kwargs['logfile'], solver)
+                    )
+        if progress is not None and progress.checkpoint_file:
+            names, values = model_values(model)
+            if len(names):
+                save_checkpoint(
+                    progress.checkpoint_file, values, value(model.objective),
+                    names=names
+                    )
+
+    return solver_status(solver, model.solver_results)
+
+
+def solve_highs(model, options, tee=True, warmstart=False,
+                progress=None):
+    """
+    Solve optimization model with HiGHS.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    options : dict
+        HiGHS options.
+
+    tee : bool
+        Show output of the solver.
+
+    warmstart : bool
+        Pass the current values of the variables to HiGHS as MIP start.
+
+    progress : solve_progress.SolveProgress
+        Optional record of the incumbent and bound over time.
+    """
+    highs = PersistentHighs(model, options, tee=tee, progress=progress)
+    if warmstart:
+        highs.set_warm_start()
+    highs.solve()
+
+
+class PersistentHighs():
+    """
+    HiGHS instance of an optimization model kept between solves.
+
+    The model is passed to HiGHS as lp file and the solution is loaded back
+    into the model by the symbol names, independent of the pyomo version.
+    Changed coefficients of the model are passed to the kept instance.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    options : dict
+        HiGHS options.
+
+    tee : bool
+        Show output of the solver.
+
+    progress : solve_progress.SolveProgress
+        Optional record of the incumbent and bound over time.
+    """
+
+    def __init__(self, model, options, tee=True, progress=None):
+        import highspy
+
+        self.model = model
+        self.highs = highspy.Highs()
+        self.highs.setOptionValue('output_flag', bool(tee))
+        for option, value in options.items():
+            self.highs.setOptionValue(option, value)
+
+        with TemporaryDirectory() as tmpdir:
+            lp_file = os.path.join(tmpdir, 'model.lp')
+            _, smap_id = model.write(
+                lp_file, io_options={'symbolic_solver_labels': True}
+                )
+            self.highs.readModel(lp_file)
+        self.symbol_map = model.solutions.symbol_map[smap_id]
+
+        self.cols = [
+            self.symbol_map.getObject(self.highs.getColName(col)[1])
+            for col in range(self.highs.getNumCol())
+            ]
+        self.col_index = {
+            id(var): col for col, var in enumerate(self.cols)
+            if var is not SymbolMap.UnknownSymbol
+            }
+        self.row_index = None
+        self.col_cost = np.array(self.highs.getLp().col_cost_)
+        self.cost_terms = dict()
+
+        if progress is not None:
+            cols = np.array([
+                col for col, var in enumerate(self.cols)
+                if var is not SymbolMap.UnknownSymbol
+                ], dtype=np.int64)
+            set_progress_callback(
+                self.highs, progress, cols=cols,
+                names=np.array([self.cols[col].name for col in cols])
+                )
+
+    def set_warm_start(self):
+        """Pass the current values of the variables as MIP start."""
+        cols = list()
+        values = list()
+        for col, var in enumerate(self.cols):
+            if var is not SymbolMap.UnknownSymbol and var.value is not None:
+                cols.append(col)
+                values.append(var.value)
+        self.highs.setSolution(
+            len(cols), np.array(cols, dtype=np.int32),
+            np.array(values, dtype=np.float64)
+            )
+
+    def update(self, constraints, cost_expression):
+        """
+        Pass changed constraints and objective coefficients to HiGHS.
+
+        Parameters
+        ----------
+        constraints : list of pyomo constraints
+            Linear constraints with changed coefficients or bounds.
+
+        cost_expression : pyomo expression
+            Part of the objective with changed coefficients, which was zero
+            when the instance was created.
+        """
+        if self.row_index is None:
+            self.row_index = {
+                self.highs.getRowName(row)[1]: row
+                for row in range(self.highs.getNumRow())
+                }
+
+        for con in constraints:
+            repn = generate_standard_repn(con.body)
+            symbol = self.symbol_map.byObject[id(con)]
+            if con.equality:
+                row = self.row_index['c_e_' + symbol + '_']
+            elif con.has_ub():
+                row = self.row_index['c_u_' + symbol + '_']
+            else:
+                row = self.row_index['c_l_' + symbol + '_']
+            for var, coef in zip(repn.linear_vars, repn.linear_coefs):
+                self.highs.changeCoeff(
+                    row, self.col_index[id(var)], value(coef)
+                    )
+            lower = -np.inf
+            upper = np.inf
+            if con.has_lb():
+                lower = value(con.lower) - value(repn.constant)
+            if con.has_ub():
+                upper = value(con.upper) - value(repn.constant)
+            self.highs.changeRowBounds(row, lower, upper)
+
+        repn = generate_standard_repn(cost_expression)
+        cost_terms = dict()
+        for var, coef in zip(repn.linear_vars, repn.linear_coefs):
+            col = self.col_index[id(var)]
+            cost_terms[col] = cost_terms.get(col, 0) + value(coef)
+        cols = sorted(set(cost_terms) | set(self.cost_terms))
+        if cols:
+            self.col_cost[cols] += [
+                cost_terms.get(col, 0) - self.cost_terms.get(col, 0)
+                for col in cols
+                ]
+            self.highs.changeColsCost(
+                len(cols), np.array(cols, dtype=np.int32), self.col_cost[cols]
+                )
+        self.cost_terms = cost_terms
+        self.highs.changeObjectiveOffset(value(repn.constant))
+
+    def solve(self):
+        """
+        Solve the model and load the solution into the model.
+
+        Returns
+        -------
+        dict
+            Status of the solver run (see solver_status).
+        """
+        highs = self.highs
+        highs.run()
+
+        if highs.getInfo().primal_solution_status == 2:
+            col_values = highs.getSolution().col_value
+            for var, col_value in zip(self.cols, col_values):
+                if var is not SymbolMap.UnknownSymbol:
+                    var.set_value(col_value, skip_validation=True)
+
+        solver_results = highs_solver_results(highs)
+
+        self.model.es.results = solver_results
+        self.model.solver_results = solver_results
+
+        return solver_status('highs', solver_results)
+
+
+class PersistentGurobi():
+    """
+    Gurobi instance of an optimization model kept between solves.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    options : dict
+        Gurobi options.
+
+    tee : bool
+        Show output of the solver.
+
+    progress : solve_progress.SolveProgress
+        Optional record of the incumbent and bound over time.
+    """
+
+    def __init__(self, model, options, tee=True, progress=None):
+        self.model = model
+        self.tee = tee
+        self.opt = SolverFactory('gurobi_persistent')
+        self.opt.set_instance(model)
+        for option, option_value in options.items():
+            self.opt.options[option] = option_value
+
+        if progress is not None:
+            self.set_callback(progress)
+
+    def set_callback(self, progress):
+        """Pass new incumbents and bounds of the runs to the progress."""
+        from gurobipy import GRB
+
+        variables = list(self.model.component_data_objects(Var))
+        names = np.array([var.name for var in variables])
+
+        def callback(model, opt, where):
+            if where == GRB.Callback.MIP:
+                progress.add(
+                    opt.cbGet(GRB.Callback.RUNTIME),
+                    opt.cbGet(GRB.Callback.MIP_OBJBST),
+                    opt.cbGet(GRB.Callback.MIP_OBJBND)
+                    )
+            elif where == GRB.Callback.MIPSOL:
+                opt.cbGetSolution(variables)
+                progress.new_incumbent(
+                    opt.cbGet(GRB.Callback.RUNTIME),
+                    opt.cbGet(GRB.Callback.MIPSOL_OBJ),
+                    opt.cbGet(GRB.Callback.MIPSOL_OBJBND),
+                    np.array([var.value for var in variables], dtype=float),
+                    names=names
+                    )
+
+        self.opt.set_callback(callback)
+
+    def update(self, constraints, cost_expression):
+        """
+        Pass changed constraints and the objective to Gurobi.
+
+        Parameters
+        ----------
+        constraints : list of pyomo constraints
+            Linear constraints with changed coefficients or bounds.
+
+        cost_expression : pyomo expression
+            Part of the objective with changed coefficients. The objective
+            is passed to Gurobi as a whole.
+        """
+        for con in constraints:
+            self.opt.remove_constraint(con)
+            self.opt.add_constraint(con)
+        self.opt.set_objective(self.model.objective)
+
+    def solve(self, warmstart=False):
+        """
+        Solve the model and load the solution into the model.
+
+        Parameters
+        ----------
+        warmstart : bool
+            Pass the current values of the variables to Gurobi as MIP
+            start.
+
+        Returns
+        -------
+        dict
+            Status of the solver run (see solver_status).
+        """
+        solver_results = self.opt.solve(tee=self.tee, warmstart=warmstart)
+        self.model.es.results = solver_results
+        self.model.solver_results = solver_results
+
+        return solver_status('gurobi', solver_results)
+
+
+def set_progress_callback(highs, progress, cols=None, names=None):
+    """
+    Pass new incumbents and bounds of HiGHS runs to the solve progress.
+
+    Parameters
+    ----------
+    highs : highspy.Highs
+        HiGHS instance of the model.
+
+    progress : solve_progress.SolveProgress
+        Record of the incumbent and bound over time.
+
+    cols : numpy.ndarray
+        Columns of the values written to the checkpoint file, all columns
+        by default.
+
+    names : numpy.ndarray
+        Names of the variables of the columns, None for the sparse model.
+    """
+    import highspy
+
+    callback_types = highspy.cb.HighsCallbackType
+    improving_solution = int(callback_types.kCallbackMipImprovingSolution)
+
+    def callback(callback_type, message, data_out, data_in, user_data):
+        if int(callback_type) == improving_solution:
+            values = np.asarray(data_out.mip_solution)
+            progress.new_incumbent(
+                data_out.running_time, data_out.objective_function_value,
+                data_out.mip_dual_bound,
+                values if cols is None else values[cols], names=names
+                )
+        else:
+            progress.add(
+                data_out.running_time, data_out.mip_primal_bound,
+                data_out.mip_dual_bound
+                )
+
+    highs.setCallback(callback, None)
+    highs.startCallback(callback_types.kCallbackMipImprovingSolution)
+    highs.startCallback(callback_types.kCallbackMipLogging)
+
+
+def highs_solver_results(highs):
+    """
+    Get results of a HiGHS run in the format of pyomo.
+
+    Parameters
+    ----------
+    highs : highspy.Highs
+        HiGHS instance after the run.
+
+    Returns
+    -------
+    pyomo.opt.SolverResults
+        Status, problem size and objective bounds of the run.
+    """
+    model_status = highs.getModelStatus()
+    info = highs.getInfo()
+    has_solution = info.primal_solution_status == 2
+
+    status = highs.modelStatusToString(model_status)
+    solver_results = SolverResults()
+    solver_results.solver.name = 'HiGHS'
+    solver_results.solver.wallclock_time = highs.getRunTime()
+    solver_results.solver.message = status
+    if status == 'Optimal':
+        solver_results.solver.status = SolverStatus.ok
+        solver_results.solver.termination_condition = (
+            TerminationCondition.optimal
+            )
+    elif status == 'Infeasible':
+        solver_results.solver.status = SolverStatus.warning
+        solver_results.solver.termination_condition = (
+            TerminationCondition.infeasible
+            )
+    elif status == 'Time limit reached':
+        solver_results.solver.status = SolverStatus.aborted
+        solver_results.solver.termination_condition = (
+            TerminationCondition.maxTimeLimit
+            )
+    else:
+        solver_results.solver.status = SolverStatus.warning
+        solver_results.solver.termination_condition = (
+            TerminationCondition.other
+            )
+
+    solver_results.problem.number_of_variables = highs.getNumCol()
+    solver_results.problem.number_of_constraints = highs.getNumRow()
+    if has_solution:
+        solver_results.problem.upper_bound = (
+            info.objective_function_value
+            )
+        solver_results.problem.lower_bound = info.mip_dual_bound
+
+    return solver_results
+
+
+def persistent_solver(model, solver='gurobi', profile='default', tee=True,
+                      **settings):
+    """
+    Get solver instance of an optimization model kept between solves.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    solver : str
+        Name of the solver, one of PERSISTENT_SOLVERS.
+
+    profile : str
+        Name of the tuning profile in SOLVER_PROFILES.
+
+    tee : bool
+        Show output of the solver.
+
+    **settings
+        Generic solver settings overwriting the ones of the profile.
+
+    Returns
+    -------
+    PersistentHighs or PersistentGurobi
+        Solver instance with the methods update() and solve().
+    """
+    if solver not in PERSISTENT_SOLVERS:
+        raise ValueError(
+            f"The solver '{solver}' has no persistent interface. Choose one "
+            + f"of {list(PERSISTENT_SOLVERS)}."
+            )
+    options = solver_options(solver, profile=profile, **settings)
+    return PERSISTENT_SOLVERS[solver](model, options, tee=tee)
+
+
+PERSISTENT_SOLVERS = {
+    'gurobi': PersistentGurobi,
+    'highs': PersistentHighs
+    }
+
+
+def solver_status(solver, solver_results):
+    """
+    Get status of a solver run independent of the solver.
+
+    Parameters
+    ----------
+    solver : str
+        Name of the solver.
+
+    solver_results : pyomo.opt.SolverResults
+        Results of the solver run.
+
+    Returns
+    -------
+    dict
+        Solver name, status, termination condition, wallclock time and the
+        bounds of the objective.
+    """
+    def number(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    return {
+        'solver': solver,
+        'status': str(solver_results.solver.status),
+        'termination_condition': str(
+            solver_results.solver.termination_condition
+            ),
+        'wallclock_time': number(solver_results.solver.wallclock_time),
+        'lower_bound': number(solver_results.problem.lower_bound),
+        'upper_bound': number(solver_results.problem.upper_bound)
+        }
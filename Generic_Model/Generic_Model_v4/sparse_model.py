@@ -0,0 +1,1084 @@
+# -*- coding: utf-8 -*-
+"""
+Sparse matrix model of Generic Model energy system.
+
+The optimization problem of the energy system is assembled directly as
+scipy.sparse matrix from the parameters and time series and passed to HiGHS
+without building a pyomo model. The components are formulated as in
+oemof.solph (Flow, NonConvexFlow, GenericCHP, OffsetTransformer and
+GenericStorage) and the results are returned in the format of
+solph.processing.results with the labels of the nodes as keys, so that the
+postprocessing is the same as for the solph model.
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from help_funcs import (
+    topology_check, timestep_length, unit_parameters, ComponentTypeError,
+    SolarUsageError
+    )
+from components import chp_parameters
+from chp_fidelity import chp_fidelity, fixed_ratio_factors
+from solver import (
+    solver_options, highs_solver_results, set_progress_callback, solver_status
+    )
+from presolve import presolve_active, flow_bounds
+from profiling import measure
+from solve_progress import SolveProgress, checkpoint_file, read_checkpoint
+from storage_exclusivity import storage_exclusivity
+from dispatch_heuristic import simulate_dispatch, sparse_mip_start
+from unit_aggregation import (
+    aggregated_amount, unit_labels, symmetric_units, symmetry_variables
+    )
+
+
+BUSSES = [
+    'Gasnetzwerk', 'Elektrizitätsnetzwerk', 'Wärmenetzwerk',
+    'LT-Wärmenetzwerk', 'TES Knoten', 'Sol Knoten'
+    ]
+
+
+class SparseModel():
+    """
+    Linear problem of an energy system in sparse matrix format.
+
+    Variables are added as blocks of one column per time step and
+    constraints as blocks of one row per time step, so that the components
+    are formulated with numpy arrays instead of single expressions.
+
+    Parameters
+    ----------
+    timeindex : pandas.DatetimeIndex
+        Time steps of the optimization.
+    """
+
+    def __init__(self, timeindex):
+        self.timeindex = timeindex
+        self.periods = len(timeindex)
+        self.hours = timestep_length(timeindex)
+
+        self.n_cols = 0
+        self.col_lower = list()
+        self.col_upper = list()
+        self.col_cost = list()
+        self.col_integer = list()
+        self.fixed = dict()
+        self.upper_bounds = list()
+
+        self.n_rows = 0
+        self.row_lower = list()
+        self.row_upper = list()
+        self.entries = list()
+
+        self.busses = set()
+        self.bus_flows = defaultdict(list)
+        self.flow_count = list()
+
+        # Label of the component the added variables and constraints belong
+        # to and their numbers per label
+        self.component = None
+        self.size = defaultdict(
+            lambda: {'variables': 0, 'constraints': 0, 'binaries': 0}
+            )
+
+        # Columns of the results and their factor by node key and name
+        self.sequences = defaultdict(dict)
+        self.scalars = defaultdict(dict)
+
+        self.solution = None
+
+    def series(self, value):
+        """Get value as array of the length of the time index."""
+        return np.broadcast_to(
+            np.asarray(value, dtype=float), (self.periods,)
+            )
+
+    def add_variable(self, lower=0, upper=np.inf, cost=0, integer=False,
+                     size=None):
+        """
+        Add a block of variables.
+
+        Parameters
+        ----------
+        lower, upper : float or array-like
+            Bounds of the variables.
+
+        cost : float or array-like
+            Objective coefficients of the variables.
+
+        integer : bool
+            Integer variables.
+
+        size : int
+            Number of variables, defaults to the number of time steps.
+
+        Returns
+        -------
+        numpy.ndarray
+            Column indices of the variables.
+        """
+        size = self.periods if size is None else size
+        cols = np.arange(self.n_cols, self.n_cols + size)
+        self.n_cols += size
+        for values, value in [
+                (self.col_lower, lower), (self.col_upper, upper),
+                (self.col_cost, cost)]:
+            values.append(
+                np.broadcast_to(np.asarray(value, dtype=float), (size,))
+                )
+        self.col_integer.append(np.full(size, integer))
+        self.size[self.component]['variables'] += size
+        if integer:
+            self.size[self.component]['binaries'] += size
+        return cols
+
+    def fix_variable(self, cols, value):
+        """Fix variables to a value."""
+        for col in np.atleast_1d(cols):
+            self.fixed[int(col)] = float(value)
+
+    def tighten_upper(self, cols, upper):
+        """Tighten upper bounds of variables, which are fixed if zero."""
+        self.upper_bounds.append((cols, np.asarray(upper, dtype=float)))
+
+    def add_constraint(self, terms, lower=-np.inf, upper=np.inf):
+        """
+        Add a block of linear constraints.
+
+        Parameters
+        ----------
+        terms : list of tuple
+            Column indices and coefficients (float or array-like) of the
+            terms. All terms have the same number of columns, which is the
+            number of constraints.
+
+        lower, upper : float or array-like
+            Bounds of the constraints.
+        """
+        size = len(terms[0][0])
+        rows = np.arange(self.n_rows, self.n_rows + size)
+        self.n_rows += size
+        self.size[self.component]['constraints'] += size
+        for cols, coeff in terms:
+            self.entries.append((
+                rows, cols,
+                np.broadcast_to(np.asarray(coeff, dtype=float), (size,))
+                ))
+        self.row_lower.append(
+            np.broadcast_to(np.asarray(lower, dtype=float), (size,))
+            )
+        self.row_upper.append(
+            np.broadcast_to(np.asarray(upper, dtype=float), (size,))
+            )
+
+    def add_sum_constraint(self, terms, lower=-np.inf, upper=np.inf):
+        """Add one constraint on the sum of the columns of the terms."""
+        self.n_rows += 1
+        self.size[self.component]['constraints'] += 1
+        for cols, coeff in terms:
+            self.entries.append((
+                np.full(len(cols), self.n_rows - 1), cols,
+                np.broadcast_to(np.asarray(coeff, dtype=float), (len(cols),))
+                ))
+        self.row_lower.append(np.array([lower], dtype=float))
+        self.row_upper.append(np.array([upper], dtype=float))
+
+    def add_result(self, key, name, cols, factor=1, scalar=False):
+        """Add columns scaled by a factor to the results of a node key."""
+        if scalar:
+            self.scalars[key][name] = (cols, factor)
+        else:
+            self.sequences[key][name] = (cols, factor)
+
+    def add_bus(self, label):
+        """Add bus with the balance of its in- and outflows."""
+        self.busses.add(label)
+
+    def add_flow(self, source, target, nominal_value=None, min_rel=0,
+                 max_rel=1, fix=None, variable_costs=0, nonconvex=False,
+                 storageflowlimit=False, units=1):
+        """
+        Add flow between two nodes.
+
+        Parameters
+        ----------
+        source, target : str
+            Labels of the nodes.
+
+        nominal_value : float
+            Nominal value of the flow, the flow is unbounded if not given.
+
+        min_rel, max_rel : float or array-like
+            Minimal and maximal flow relative to the nominal value.
+
+        fix : float or array-like
+            Fixed flow relative to the nominal value.
+
+        variable_costs : float or array-like
+            Costs per unit of the flow.
+
+        nonconvex : bool
+            Add binary status of the flow, the minimal flow only applies if
+            the flow is active.
+
+        storageflowlimit : bool
+            Count the status of the flow for the limit of active storage
+            flows.
+
+        units : int
+            Number of identical units of an aggregated unit. The status is
+            the integer number of active units.
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            Column indices of the flow and of its status (None if the flow
+            is not nonconvex).
+        """
+        component = self.component
+        self.component = target if source in self.busses else source
+
+        lower = 0
+        upper = np.inf
+        if nominal_value is not None:
+            upper = self.series(max_rel) * nominal_value * units
+            if fix is not None:
+                lower = upper = self.series(fix) * nominal_value
+            elif not nonconvex:
+                lower = self.series(min_rel) * nominal_value
+
+        flow = self.add_variable(
+            lower=lower, upper=upper,
+            cost=self.series(variable_costs) * self.hours
+            )
+        self.add_result((source, target), 'flow', flow)
+        if source in self.busses:
+            self.bus_flows[source].append((flow, -1))
+        if target in self.busses:
+            self.bus_flows[target].append((flow, 1))
+
+        status = None
+        if nonconvex:
+            status = self.add_variable(upper=units, integer=True)
+            self.add_result((source, target), 'status', status)
+            self.add_constraint(
+                [(flow, 1), (status, -self.series(min_rel) * nominal_value)],
+                lower=0
+                )
+            self.add_constraint(
+                [(flow, 1), (status, -self.series(max_rel) * nominal_value)],
+                upper=0
+                )
+            if storageflowlimit:
+                self.flow_count.append(status)
+
+        self.component = component
+        return flow, status
+
+    def add_minimum_uptime(self, status, minimum_uptime, initial_status=0):
+        """
+        Add minimum uptime of a nonconvex flow.
+
+        As in solph, the status is fixed to the initial status within the
+        minimum uptime at the start and the end of the optimization period.
+        """
+        inner = np.arange(minimum_uptime, self.periods - minimum_uptime)
+        self.fix_variable(
+            np.setdiff1d(status, status[inner]), initial_status
+            )
+        if len(inner):
+            terms = [
+                (status[inner], minimum_uptime),
+                (status[inner - 1], -minimum_uptime)
+                ]
+            terms += [(status[inner + u], -1) for u in range(minimum_uptime)]
+            self.add_constraint(terms, upper=0)
+
+    def add_conversion(self, inflow, outflow, input_factor=1,
+                       output_factor=1):
+        """Add conversion of a transformer with solph conversion factors."""
+        self.add_constraint(
+            [(inflow, self.series(output_factor)),
+             (outflow, -self.series(input_factor))],
+            lower=0, upper=0
+            )
+
+    def finalize(self):
+        """Add balances of the busses and the limit of active flows."""
+        for label in sorted(self.busses):
+            if self.bus_flows[label]:
+                self.component = label
+                self.add_constraint(self.bus_flows[label], lower=0, upper=0)
+        if self.flow_count:
+            self.component = 'storageflowlimit'
+            self.add_constraint(
+                [(status, 1) for status in self.flow_count],
+                lower=0, upper=1
+                )
+
+    def model_size(self):
+        """Get numbers of variables, constraints and binaries per label."""
+        total = {
+            key: sum(size[key] for size in self.size.values())
+            for key in ['variables', 'constraints', 'binaries']
+            }
+        return {
+            'total': total,
+            'components': dict(
+                sorted(self.size.items(), key=lambda item: str(item[0]))
+                )
+            }
+
+    def matrix(self):
+        """Get constraint matrix in compressed sparse column format."""
+        rows, cols, values = (
+            np.concatenate(entry) for entry in zip(*self.entries)
+            )
+        matrix = sparse.csc_matrix(
+            (values, (rows, cols)), shape=(self.n_rows, self.n_cols)
+            )
+        matrix.sum_duplicates()
+        matrix.eliminate_zeros()
+        return matrix
+
+    def highs_model(self):
+        """Get model in the format of highspy."""
+        import highspy
+
+        col_lower = np.concatenate(self.col_lower)
+        col_upper = np.concatenate(self.col_upper)
+        for cols, upper in self.upper_bounds:
+            col_upper[cols] = np.minimum(col_upper[cols], upper)
+        fixed_cols = np.array(list(self.fixed), dtype=int)
+        col_lower[fixed_cols] = list(self.fixed.values())
+        col_upper[fixed_cols] = list(self.fixed.values())
+        matrix = self.matrix()
+
+        lp = highspy.HighsLp()
+        lp.num_col_ = self.n_cols
+        lp.num_row_ = self.n_rows
+        lp.col_cost_ = np.concatenate(self.col_cost)
+        lp.col_lower_ = col_lower
+        lp.col_upper_ = col_upper
+        lp.row_lower_ = np.concatenate(self.row_lower)
+        lp.row_upper_ = np.concatenate(self.row_upper)
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        lp.a_matrix_.num_col_ = self.n_cols
+        lp.a_matrix_.num_row_ = self.n_rows
+        lp.a_matrix_.start_ = matrix.indptr
+        lp.a_matrix_.index_ = matrix.indices
+        lp.a_matrix_.value_ = matrix.data
+        lp.integrality_ = [
+            highspy.HighsVarType.kInteger if integer
+            else highspy.HighsVarType.kContinuous
+            for integer in np.concatenate(self.col_integer)
+            ]
+        return lp
+
+    def solve(self, profile='default', tee=True, save_model='', report=None,
+              progress=None, warm_start=None, **settings):
+        """
+        Solve the model with HiGHS.
+
+        Parameters
+        ----------
+        profile : str
+            Name of the tuning profile in solver.SOLVER_PROFILES.
+
+        tee : bool
+            Show output of the solver.
+
+        save_model : str
+            Optional file name to write the model to in lp format.
+
+        report : profiling.RunReport
+            Optional run report the phases are measured in.
+
+        progress : solve_progress.SolveProgress
+            Optional record of the incumbent and bound over time.
+
+        warm_start : numpy.ndarray
+            Optional values of all columns passed to HiGHS as MIP start.
+            Columns with NaN values are left to HiGHS to complete.
+
+        **settings
+            Generic solver settings overwriting the ones of the profile.
+
+        Returns
+        -------
+        pyomo.opt.SolverResults
+            Status, problem size and objective bounds of the run.
+        """
+        import highspy
+
+        highs = highspy.Highs()
+        highs.setOptionValue('output_flag', bool(tee))
+        for option, value in solver_options(
+                'highs', profile, **settings).items():
+            highs.setOptionValue(option, value)
+        with measure(report, 'model_build'):
+            highs.passModel(self.highs_model())
+        if save_model:
+            with measure(report, 'lp_write'):
+                highs.writeModel(f'{save_model}.lp')
+        if progress is not None:
+            set_progress_callback(highs, progress)
+        if warm_start is not None:
+            warm_start = np.asarray(warm_start, dtype=np.float64)
+            cols = np.flatnonzero(~np.isnan(warm_start)).astype(np.int32)
+            highs.setSolution(len(cols), cols, warm_start[cols])
+
+        with measure(report, 'solve'):
+            highs.run()
+        info = highs.getInfo()
+        if info.primal_solution_status == 2:
+            self.solution = np.array(highs.getSolution().col_value)
+            self.objective = info.objective_function_value
+
+        return highs_solver_results(highs)
+
+    def results(self):
+        """
+        Get results in the format of solph.processing.results.
+
+        Returns
+        -------
+        dict
+            Scalars and sequences of the variables by labels of the nodes.
+        """
+        results = dict()
+        for key in list(self.sequences) + list(self.scalars):
+            if key in results:
+                continue
+            sequences = pd.DataFrame(
+                {name: self.solution[cols] * factor
+                 for name, (cols, factor)
+                 in sorted(self.sequences[key].items())},
+                index=self.timeindex
+                )
+            sequences.columns.name = 'variable_name'
+            scalars = pd.Series(
+                {name: float(self.solution[cols][0] * factor)
+                 for name, (cols, factor)
+                 in sorted(self.scalars[key].items())},
+                dtype=float
+                )
+            results[key] = {'scalars': scalars, 'sequences': sequences}
+        return results
+
+
+def build_sparse_model(param, data, report=None):
+    """
+    Build the sparse matrix model of the Generic Model.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    report : profiling.RunReport
+        Optional run report the phases are measured in.
+
+    Returns
+    -------
+    SparseModel
+        Optimization model of the Generic Model.
+    """
+    timeindex = pd.date_range(
+        data.index[0], periods=len(data),
+        freq=pd.Timedelta(hours=timestep_length(data.index))
+        )
+
+    with measure(report, 'topology_check'):
+        topology_check(param)
+
+    with measure(report, 'components'):
+        model = SparseModel(timeindex)
+        for label in BUSSES:
+            model.add_bus(label)
+
+        add_sources(model, param, data)
+        add_sinks(model, param, data)
+        add_boilers(model, param, data)
+        for comp in ['BHKW', 'GuD', 'BPT']:
+            if param[comp]['active']:
+                labels, chp = chp_parameters(param, data, comp)
+                fidelity = chp_fidelity(param, comp)
+                for label in labels:
+                    if fidelity == 'fixed_ratio':
+                        add_fixed_ratio_chp(model, label, chp)
+                    else:
+                        add_chp(
+                            model, label, chp, integer=fidelity == 'milp'
+                            )
+        add_heat_pumps(model, param, data)
+        add_storages(model, param)
+        add_symmetry_breaking(model, param)
+        presolve_sparse_model(model, param, data)
+
+        model.finalize()
+
+    return model
+
+
+def add_sources(model, param, data):
+    """Add gas, electricity, must-run and solar thermal sources."""
+    prm = param['param']
+    model.add_flow(
+        'Gasquelle', 'Gasnetzwerk',
+        variable_costs=prm['gas_price'] + prm['co2_price'] * prm['ef_gas']
+        )
+    model.add_flow(
+        'Stromquelle', 'Elektrizitätsnetzwerk',
+        variable_costs=(
+            prm['elec_consumer_charges_grid']
+            - prm['elec_consumer_charges_self']
+            + data['el_spot_price']
+            + prm['co2_price'] * data['ef_om']
+            )
+        )
+
+    if param['MR']['active']:
+        if param['MR']['type'] == 'constant':
+            model.add_flow(
+                'Mustrun', 'Wärmenetzwerk',
+                nominal_value=float(param['MR']['Q_N']), fix=1,
+                variable_costs=param['MR']['op_cost_var']
+                )
+        elif param['MR']['type'] == 'time series':
+            model.add_flow(
+                'Mustrun', 'Wärmenetzwerk',
+                nominal_value=1, fix=data['Q_MR'],
+                variable_costs=param['MR']['op_cost_var']
+                )
+        else:
+            raise ComponentTypeError(param['MR']['type'], 'MR')
+
+    if param['Sol']['active']:
+        usage = param['Sol']['usage']
+        if usage == 'LT':
+            aux_label, bus = 'Sol_to_LT', 'LT-Wärmenetzwerk'
+        elif usage == 'HT':
+            aux_label, bus = 'Sol_to_HT', 'Wärmenetzwerk'
+        else:
+            raise SolarUsageError(usage)
+
+        model.add_flow(
+            'Solarthermie', 'Sol Knoten',
+            nominal_value=param['Sol']['A'], fix=data['solar_data_' + usage],
+            variable_costs=param['Sol']['op_cost_var']
+            )
+        add_auxiliary_transformer(model, aux_label, 'Sol Knoten', bus)
+        if param['Sol-EC']['active']:
+            model.add_flow(
+                'Sol Knoten', 'Sol-EC',
+                variable_costs=param['Sol-EC']['op_cost_var']
+                )
+
+
+def add_sinks(model, param, data):
+    """Add spot market, heat demand and emergency cooling."""
+    model.add_flow(
+        'Elektrizitätsnetzwerk', 'Spotmarkt',
+        variable_costs=-data['el_spot_price'] - param['param']['vNNE']
+        )
+    model.add_flow(
+        'Wärmenetzwerk', 'Wärmebedarf',
+        nominal_value=param['param']['rel_demand'], fix=data['heat_demand'],
+        variable_costs=-param['param']['heat_price']
+        )
+    if param['HT-EC']['active']:
+        model.add_flow(
+            'Wärmenetzwerk', 'HT-EC',
+            variable_costs=param['HT-EC']['op_cost_var']
+            )
+
+
+def add_auxiliary_transformer(model, label, input_bus, output_bus):
+    """Add lossless transformer between two busses."""
+    model.component = label
+    inflow, _ = model.add_flow(input_bus, label)
+    outflow, _ = model.add_flow(label, output_bus)
+    model.add_conversion(inflow, outflow)
+
+
+def add_boilers(model, param, data):
+    """Add electric boiler and peak load boiler."""
+    if param['EHK']['active']:
+        ehk = param['EHK']
+        if ehk['type'] == 'constant':
+            nominal_value = ehk['Q_N']
+            min_rel, max_rel = ehk['Q_min_rel'], 1
+        elif ehk['type'] == 'time series':
+            nominal_value = 1
+            min_rel, max_rel = data['Q_EHK'] * ehk['Q_min_rel'], data['Q_EHK']
+        else:
+            raise ComponentTypeError(ehk['type'], 'EHK')
+
+        for label in unit_labels(param, 'EHK'):
+            model.component = label
+            inflow, _ = model.add_flow('Elektrizitätsnetzwerk', label)
+            outflow, _ = model.add_flow(
+                label, 'Wärmenetzwerk',
+                nominal_value=nominal_value * aggregated_amount(param, 'EHK'),
+                min_rel=min_rel, max_rel=max_rel,
+                variable_costs=(
+                    ehk['op_cost_var']
+                    + param['param']['elec_consumer_charges_self']
+                    )
+                )
+            model.add_conversion(inflow, outflow, output_factor=ehk['eta'])
+
+    if param['SLK']['active']:
+        slk = param['SLK']
+        if slk['type'] == 'constant':
+            nominal_value = slk['Q_N']
+            min_rel, max_rel = slk['Q_min_rel'], slk['Q_max_rel']
+        elif slk['type'] == 'time series':
+            nominal_value = 1
+            min_rel, max_rel = 0, data['Q_SLK']
+        else:
+            raise ComponentTypeError(slk['type'], 'SLK')
+
+        for label in unit_labels(param, 'SLK'):
+            model.component = label
+            inflow, _ = model.add_flow('Gasnetzwerk', label)
+            outflow, _ = model.add_flow(
+                label, 'Wärmenetzwerk',
+                nominal_value=nominal_value * aggregated_amount(param, 'SLK'),
+                min_rel=min_rel, max_rel=max_rel,
+                variable_costs=(
+                    slk['op_cost_var'] + param['param']['energy_tax']
+                    )
+                )
+            model.add_conversion(inflow, outflow, output_factor=slk['eta'])
+
+
+def add_chp(model, label, chp, integer=True):
+    """
+    Add CHP with the formulation of the solph GenericCHP.
+
+    The fuel, electrical and heat flow are used as the variables H_F, P and
+    Q of the GenericCHP and the flue gas losses are derived from the fuel
+    flow, so that only the power without district heating and the operating
+    status are added as further variables.
+
+    Parameters
+    ----------
+    model : SparseModel
+        Optimization model of the Generic Model.
+
+    label : str
+        Label of the CHP.
+
+    chp : dict
+        GenericCHP parameters of the CHP (see chp_parameters).
+
+    integer : bool
+        Integer operating status, otherwise the status is continuous (CHP
+        fidelity 'lp').
+    """
+    model.component = label
+    fuel, _ = model.add_flow(
+        'Gasnetzwerk', label, nominal_value=chp['Q_in'] * chp['units']
+        )
+    power, _ = model.add_flow(
+        label, 'Elektrizitätsnetzwerk', variable_costs=chp['variable_costs']
+        )
+    heat, _ = model.add_flow(label, 'Wärmenetzwerk')
+    power_wodh = model.add_variable()
+    operation = model.add_variable(upper=chp['units'], integer=integer)
+
+    # Linear fuel consumption through the minimal and maximal load point
+    fuel_max = (
+        model.series(chp['P_max_woDH']) / model.series(chp['Eta_el_max_woDH'])
+        )
+    fuel_min = (
+        model.series(chp['P_min_woDH']) / model.series(chp['Eta_el_min_woDH'])
+        )
+    alpha_1 = (
+        (fuel_max - fuel_min)
+        / (model.series(chp['P_max_woDH']) - model.series(chp['P_min_woDH']))
+        )
+    alpha_0 = fuel_min - alpha_1 * model.series(chp['P_min_woDH'])
+    share_max = model.series(chp['H_L_FG_share_max'])
+    q_cw_min = model.series(chp['Q_CW_min'])
+
+    model.add_constraint(
+        [(fuel, -1), (operation, alpha_0), (power_wodh, alpha_1)],
+        lower=0, upper=0
+        )
+    model.add_constraint(
+        [(fuel, -1), (operation, alpha_0), (power, alpha_1),
+         (heat, alpha_1 * model.series(chp['Beta']))],
+        lower=0, upper=0
+        )
+    model.add_constraint([(fuel, 1), (operation, -fuel_max)], upper=0)
+    model.add_constraint([(fuel, 1), (operation, -fuel_min)], lower=0)
+    model.add_constraint(
+        [(power, 1), (heat, 1), (fuel, share_max - 1),
+         (operation, q_cw_min)],
+        lower=0 if chp['back_pressure'] else -np.inf, upper=0
+        )
+
+    key = (label, None)
+    model.add_result(key, 'H_F', fuel)
+    model.add_result(key, 'H_L_FG_max', fuel, factor=share_max)
+    model.add_result(key, 'P', power)
+    model.add_result(key, 'P_woDH', power_wodh)
+    model.add_result(key, 'Q', heat)
+    model.add_result(key, 'Y', operation)
+
+    if chp['H_L_FG_share_min'] is not None:
+        share_min = model.series(chp['H_L_FG_share_min'])
+        model.add_constraint(
+            [(power, 1), (heat, 1), (fuel, share_min - 1),
+             (operation, q_cw_min)],
+            lower=0
+            )
+        model.add_result(key, 'H_L_FG_min', fuel, factor=share_min)
+
+
+def add_fixed_ratio_chp(model, label, chp):
+    """Add CHP with fixed power to heat ratio as components.py."""
+    model.component = label
+    fuel_max, eta_el, eta_th = fixed_ratio_factors(chp, model.periods)
+    fuel, _ = model.add_flow(
+        'Gasnetzwerk', label, nominal_value=fuel_max.max() * chp['units'],
+        max_rel=fuel_max / fuel_max.max()
+        )
+    power, _ = model.add_flow(
+        label, 'Elektrizitätsnetzwerk', variable_costs=chp['variable_costs']
+        )
+    heat, _ = model.add_flow(label, 'Wärmenetzwerk')
+    model.add_conversion(fuel, power, output_factor=eta_el)
+    model.add_conversion(fuel, heat, output_factor=eta_th)
+
+
+def add_heat_pumps(model, param, data):
+    """Add high temperature and low temperature heat pump."""
+    if param['HP']['active']:
+        hp = param['HP']
+        if hp['type'] == 'constant':
+            nominal_value = hp['P_max']
+            min_rel, max_rel = hp['P_min'] / hp['P_max'], 1
+            c_0, c_1 = hp['c_0'], hp['c_1']
+        elif hp['type'] == 'time series':
+            nominal_value = 1
+            min_rel, max_rel = data['P_min_hp'], data['P_max_hp']
+            c_0, c_1 = data['c_0_hp'], data['c_1_hp']
+        else:
+            raise ComponentTypeError(hp['type'], 'HP')
+
+        # Offset transformer with the status of the nonconvex input
+        for label in unit_labels(param, 'HP'):
+            model.component = label
+            inflow, status = model.add_flow(
+                'Elektrizitätsnetzwerk', label, nominal_value=nominal_value,
+                min_rel=min_rel, max_rel=max_rel,
+                variable_costs=param['param']['elec_consumer_charges_self'],
+                nonconvex=True, units=aggregated_amount(param, 'HP')
+                )
+            outflow, _ = model.add_flow(
+                label, 'Wärmenetzwerk', variable_costs=hp['op_cost_var']
+                )
+            model.add_constraint(
+                [(outflow, -1), (inflow, model.series(c_1)),
+                 (status, model.series(c_0))],
+                lower=0, upper=0
+                )
+
+    if param['LT-HP']['active']:
+        if param['LT-HP']['type'] == 'constant':
+            cop = param['LT-HP']['cop']
+        elif param['LT-HP']['type'] == 'time series':
+            cop = data['cop_lthp']
+        else:
+            raise ComponentTypeError(param['LT-HP']['type'], 'LT-HP')
+        cop = model.series(cop)
+
+        for label in unit_labels(param, 'LT-HP'):
+            model.component = label
+            lt_inflow, _ = model.add_flow('LT-Wärmenetzwerk', label)
+            el_inflow, _ = model.add_flow(
+                'Elektrizitätsnetzwerk', label,
+                variable_costs=param['param']['elec_consumer_charges_self']
+                )
+            outflow, _ = model.add_flow(
+                label, 'Wärmenetzwerk',
+                variable_costs=param['HP']['op_cost_var']
+                )
+            model.add_conversion(el_inflow, outflow, input_factor=1 / cop)
+            model.add_conversion(
+                lt_inflow, outflow, input_factor=(cop - 1) / cop
+                )
+
+
+def add_storages(model, param):
+    """Add seasonal and short term thermal energy storage."""
+    formulation = storage_exclusivity(param)
+    if formulation == 'sos1':
+        raise ValueError(
+            "The storage exclusivity 'sos1' is not supported by HiGHS."
+            )
+    if param['TES']['active']:
+        add_auxiliary_transformer(
+            model, 'HT_to_TES_node', 'Wärmenetzwerk', 'TES Knoten'
+            )
+        add_auxiliary_transformer(
+            model, 'LT_to_TES_node', 'LT-Wärmenetzwerk', 'TES Knoten'
+            )
+        for i in range(1, param['TES']['amount']+1):
+            add_storage(
+                model, 'TES_' + str(i), unit_parameters(param['TES'], i),
+                'TES Knoten',
+                'LT-Wärmenetzwerk',
+                minimum_uptime=int(param['TES']['min_uptime']),
+                balanced=param['TES']['balanced'], formulation=formulation
+                )
+    if param['ST-TES']['active']:
+        # The short term storage is balanced as the solph GenericStorage
+        for i in range(1, param['ST-TES']['amount']+1):
+            add_storage(
+                model, 'ST-TES_' + str(i),
+                unit_parameters(param['ST-TES'], i), 'Wärmenetzwerk',
+                'Wärmenetzwerk', balanced=True, formulation=formulation
+                )
+
+
+def add_storage(model, label, prm, input_bus, output_bus,
+                minimum_uptime=None, balanced=True, formulation='flow_count'):
+    """
+    Add storage with the formulation of the solph GenericStorage.
+
+    Parameters
+    ----------
+    model : SparseModel
+        Optimization model of the Generic Model.
+
+    label : str
+        Label of the storage.
+
+    prm : dict
+        Parameters of the storage component.
+
+    input_bus, output_bus : str
+        Labels of the busses the storage is charged from and discharged to.
+
+    minimum_uptime : int
+        Optional minimum uptime of the charging and discharging flow.
+
+    balanced : bool
+        Storage content at the end equals the initial storage content.
+
+    formulation : str
+        Storage exclusivity, either 'flow_count', 'storage' or 'lp' (see
+        storage_exclusivity.py).
+    """
+    model.component = label
+    flow_count = formulation == 'flow_count'
+    inflow, status_in = model.add_flow(
+        input_bus, label, nominal_value=prm['Q_N_in'],
+        min_rel=prm['Q_rel_in_min'], max_rel=prm['Q_rel_in_max'],
+        variable_costs=prm['op_cost_var'], nonconvex=True,
+        storageflowlimit=flow_count
+        )
+    outflow, status_out = model.add_flow(
+        label, output_bus, nominal_value=prm['Q_N_out'],
+        min_rel=prm['Q_rel_out_min'], max_rel=prm['Q_rel_out_max'],
+        nonconvex=True, storageflowlimit=flow_count
+        )
+    if formulation == 'storage':
+        model.add_constraint([(status_in, 1), (status_out, 1)], upper=1)
+    if minimum_uptime is not None:
+        model.add_minimum_uptime(
+            status_in, minimum_uptime, initial_status=int(prm['init_status'])
+            )
+        model.add_minimum_uptime(status_out, minimum_uptime)
+
+    capacity = prm['Q']
+    content = model.add_variable(upper=capacity)
+    if prm['init_storage'] is not None:
+        init_content = model.add_variable(
+            lower=prm['init_storage'] * capacity,
+            upper=prm['init_storage'] * capacity, size=1
+            )
+    else:
+        init_content = model.add_variable(upper=capacity, size=1)
+    model.add_result((label, None), 'storage_content', content)
+    model.add_result((label, None), 'init_content', init_content, scalar=True)
+
+    hours = model.hours
+    model.add_constraint(
+        [(content, 1),
+         (np.concatenate([init_content, content[:-1]]),
+          -(1 - prm['Q_rel_loss']) ** hours),
+         (inflow, -prm['inflow_conv'] * hours),
+         (outflow, hours / prm['outflow_conv'])],
+        lower=0, upper=0
+        )
+    if balanced:
+        model.add_constraint(
+            [(content[-1:], 1), (init_content, -1)], lower=0, upper=0
+            )
+    if prm.get('final_storage') is not None:
+        model.add_constraint(
+            [(content[-1:], 1)], lower=prm['final_storage'] * capacity,
+            upper=prm['final_storage'] * capacity
+            )
+
+
+def presolve_sparse_model(model, param, data):
+    """Fix and tighten the variables as presolve.presolve_model."""
+    if not presolve_active(param):
+        return
+    for (key, name), upper in flow_bounds(param, data).items():
+        model.tighten_upper(model.sequences[key][name][0], upper)
+
+
+def add_symmetry_breaking(model, param):
+    """Order the separately modelled units as the solph model."""
+    for comp, labels in symmetric_units(param).items():
+        for first, second in zip(labels[:-1], labels[1:]):
+            model.component = second
+            (flow_1, status_1), (flow_2, status_2) = (
+                symmetry_variables(comp, label) for label in [first, second]
+                )
+            flow_1, flow_2 = (
+                model.sequences[key][name][0] for key, name in [flow_1, flow_2]
+                )
+            if status_1 is None:
+                model.add_sum_constraint(
+                    [(flow_2, 1), (flow_1, -1)], upper=0
+                    )
+                continue
+            status_1, status_2 = (
+                model.sequences[key][name][0]
+                for key, name in [status_1, status_2]
+                )
+            model.add_constraint([(status_2, 1), (status_1, -1)], upper=0)
+            model.add_constraint([(flow_2, 1), (flow_1, -1)], upper=0)
+
+
+def meta_results(model, solver_results):
+    """
+    Get meta results of the solved sparse model as solph.
+
+    Parameters
+    ----------
+    model : SparseModel
+        Solved optimization model of the Generic Model.
+
+    solver_results : pyomo.opt.SolverResults
+        Results of the solver run.
+
+    Returns
+    -------
+    dict
+        Objective and problem and solver information.
+    """
+    meta_results = {'objective': getattr(model, 'objective', None)}
+    for key in ['problem', 'solver']:
+        meta_results[key] = dict()
+        entries = solver_results[key][0]
+        for name in entries.keys():
+            try:
+                if str(entries[name]) != '<undefined>':
+                    meta_results[key][name] = entries[name]
+            except TypeError:
+                continue
+    return meta_results
+
+
+def solve_sparse_model(param, data, save_model='', profile='default',
+                       tee=True, report=None, checkpoint_dir='',
+                       heuristic_start=False, **settings):
+    """
+    Build and solve the sparse matrix model of the Generic Model.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    save_model : str
+        Optional file name to write the model to in lp format.
+
+    profile : str
+        Name of the tuning profile in solver.SOLVER_PROFILES.
+
+    tee : bool
+        Show output of the solver.
+
+    report : profiling.RunReport
+        Optional run report the phases and the model size are measured in.
+
+    checkpoint_dir : str
+        Optional directory of incumbent checkpoints (see
+        generic_model_v4.main).
+
+    heuristic_start : bool
+        Use the merit order dispatch of dispatch_heuristic.py as MIP start,
+        unless a checkpoint of the scenario exists.
+
+    **settings
+        Generic solver settings overwriting the ones of the profile.
+
+    Returns
+    -------
+    tuple
+        Results in the format of solph.processing.results and meta results.
+    """
+    model = build_sparse_model(param, data, report=report)
+    if report is not None:
+        report.count_model(model)
+
+    progress = None
+    warm_start = None
+    heuristic_meta = None
+    if heuristic_start:
+        with measure(report, 'heuristic'):
+            heuristic_results, heuristic_meta = simulate_dispatch(param, data)
+            warm_start = sparse_mip_start(model, heuristic_results)
+    if report is not None or checkpoint_dir:
+        progress = SolveProgress()
+    if checkpoint_dir:
+        progress.checkpoint_file = checkpoint_file(
+            checkpoint_dir, param, data, backend='sparse'
+            )
+        checkpoint = read_checkpoint(progress.checkpoint_file)
+        if checkpoint is not None and (
+                len(checkpoint['values']) == model.n_cols):
+            warm_start = checkpoint['values']
+
+    solver_results = model.solve(
+        profile=profile, tee=tee, save_model=save_model, report=report,
+        progress=progress, warm_start=warm_start, **settings
+        )
+    if report is not None:
+        report.add_progress(progress.entries)
+    if model.solution is None:
+        raise ValueError(
+            'The sparse model has no solution: '
+            + str(solver_results.solver.message)
+            )
+
+    with measure(report, 'results'):
+        results = model.results()
+    meta = meta_results(model, solver_results)
+    meta['status'] = solver_status('highs', solver_results)
+    if heuristic_meta is not None:
+        meta['heuristic'] = heuristic_meta
+
+    return results, meta
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Formulations of the storage exclusivity of Generic Model energy system.
+
+The storages must not be charged and discharged at once. The formulation is
+chosen with 'storage_exclusivity' in the global parameters:
+
+- 'flow_count' limits the number of active charging and discharging flows
+  of all storages to one per time step (default)
+- 'sos1' limits the number of nonzero charging and discharging flows of all
+  storages to one per time step with special ordered sets of type 1, which
+  are only supported by Gurobi and CBC
+- 'storage' only excludes charging and discharging of the same storage by
+  the binary status of its flows, so that different storages may operate
+  at once
+- 'lp' adds no constraint, which is valid if losses and prices make
+  simultaneous charging and discharging unprofitable. The time steps a
+  storage is charged and discharged at once are counted after the solve.
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+import warnings
+
+import numpy as np
+import oemof.solph as solph
+from pyomo.environ import Block, ConstraintList, SOSConstraint
+
+
+STORAGE_EXCLUSIVITY = ['flow_count', 'sos1', 'storage', 'lp']
+
+# Solvers supporting special ordered sets
+SOS_SOLVERS = ['gurobi', 'cbc']
+
+# Flows below are considered inactive in the check after the solve
+FLOW_TOLERANCE = 1e-6
+
+
+def storage_exclusivity(param):
+    """Get formulation of the storage exclusivity of the parameters."""
+    formulation = param['param'].get('storage_exclusivity', 'flow_count')
+    if formulation not in STORAGE_EXCLUSIVITY:
+        raise ValueError(
+            f"The storage exclusivity '{formulation}' does not exist. Choose "
+            + "one of " + ", ".join(f"'{f}'" for f in STORAGE_EXCLUSIVITY)
+            + "."
+            )
+    return formulation
+
+
+def storage_flows(model):
+    """Get charging and discharging flows of the storages per storage."""
+    flows = dict()
+    for i, o in model.FLOWS:
+        if hasattr(model.flows[i, o], 'storageflowlimit'):
+            storage = (
+                o if isinstance(o, solph.components.GenericStorage) else i
+                )
+            flows.setdefault(storage, list()).append((i, o))
+    return flows
+
+
+def add_storage_exclusivity(model, param):
+    """
+    Add the storage exclusivity to the model.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    param : dict
+        JSON parameter file of user defined constants.
+    """
+    formulation = storage_exclusivity(param)
+    if formulation == 'flow_count':
+        solph.constraints.limit_active_flow_count_by_keyword(
+            model, 'storageflowlimit', lower_limit=0, upper_limit=1)
+        return
+    if formulation == 'lp':
+        return
+
+    flows = storage_flows(model)
+    block = Block()
+    model.add_component('StorageExclusivityBlock', block)
+    if formulation == 'sos1':
+        all_flows = [flow for storage in flows.values() for flow in storage]
+        block.sos = SOSConstraint(
+            model.TIMESTEPS, sos=1,
+            rule=lambda block, t: [model.flow[i, o, t] for i, o in all_flows]
+            )
+    elif formulation == 'storage':
+        block.exclusive = ConstraintList()
+        status = model.NonConvexFlow.status
+        for storage in flows.values():
+            for t in model.TIMESTEPS:
+                block.exclusive.add(
+                    sum(status[i, o, t] for i, o in storage) <= 1
+                    )
+
+
+def check_storage_exclusivity(results, meta_results, param):
+    """
+    Count the time steps the storages are charged and discharged at once.
+
+    The counts are added to the meta results as 'storage_exclusivity'. A
+    warning is given, if a storage is charged and discharged at once.
+
+    Parameters
+    ----------
+    results : dict of pandas.Series and pandas.DataFrame
+        Full results from solph.processing.results() call.
+
+    meta_results : dict
+        Meta results of the solver run.
+
+    param : dict
+        JSON parameter file of user defined constants.
+    """
+    formulation = storage_exclusivity(param)
+    charging = dict()
+    discharging = dict()
+    for key, res in results.items():
+        if 'flow' not in res['sequences']:
+            continue
+        source, target = (str(node) for node in key)
+        active = res['sequences']['flow'].to_numpy() > FLOW_TOLERANCE
+        if target.startswith(('TES_', 'ST-TES_')):
+            charging[target] = active
+        elif source.startswith(('TES_', 'ST-TES_')):
+            discharging[source] = active
+
+    simultaneous = {
+        label: int(np.sum(charging[label] & discharging[label]))
+        for label in sorted(charging) if label in discharging
+        }
+    meta_results['storage_exclusivity'] = {
+        'formulation': formulation, 'simultaneous_operation': simultaneous
+        }
+    violated = {label: n for label, n in simultaneous.items() if n}
+    if violated:
+        warnings.warn(
+            f"The storages {violated} are charged and discharged at once in "
+            + "the given number of time steps with the storage exclusivity "
+            + f"'{formulation}'."
+            )
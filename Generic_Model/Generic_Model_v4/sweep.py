@@ -0,0 +1,413 @@
+# -*- coding: utf-8 -*-
+"""
+Parameter sweeps for Generic Model energy system.
+
+The optimization model is built once with mutable parameters for the prices
+and capacities of the sweep. Every point of the sweep only changes these
+parameters and is solved again by a solver instance kept between the points.
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+import warnings
+from copy import deepcopy
+
+from pyomo import environ as po
+from generic_model_v4 import build_model, get_results, main
+from resampling import resample_data, resample_param
+from postprocessing import postprocessing
+from result_extraction import POSTPROCESSING_SUBSET
+from solver import solve, persistent_solver, PERSISTENT_SOLVERS
+
+
+# Parameters of a sweep point, the spot market price is a scaling factor
+SWEEP_PARAMETERS = [
+    'gas_price', 'co2_price', 'heat_price', 'el_spot_price', 'TES.Q',
+    'TES.Q_N_in', 'HP.P_max'
+    ]
+
+
+def base_values(param):
+    """Get values of the sweep parameters in the parameter file."""
+    return {
+        'gas_price': param['param']['gas_price'],
+        'co2_price': param['param']['co2_price'],
+        'heat_price': param['param']['heat_price'],
+        'el_spot_price': 1,
+        'TES.Q': param['TES']['Q'],
+        'TES.Q_N_in': param['TES']['Q_N_in'],
+        'HP.P_max': param['HP']['P_max']
+        }
+
+
+def sweep_scenario(param, data, point):
+    """
+    Get parameters and time series of a sweep point.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    point : dict
+        Values of the sweep parameters, e.g. {'gas_price': 30,
+        'el_spot_price': 1.1, 'TES.Q': 4000}.
+
+    Returns
+    -------
+    tuple
+        Parameters and time series of the sweep point.
+    """
+    point_param = deepcopy(param)
+    point_data = data
+    for key, val in point.items():
+        if key not in SWEEP_PARAMETERS:
+            raise ValueError(
+                f"The parameter '{key}' can not be swept. Choose one of "
+                + f"{SWEEP_PARAMETERS}."
+                )
+        if key == 'el_spot_price':
+            point_data = data.copy()
+            point_data['el_spot_price'] *= val
+        elif '.' in key:
+            comp, name = key.split('.')
+            point_param[comp][name] = val
+        else:
+            point_param['param'][key] = val
+    return point_param, point_data
+
+
+def add_sweep_parameters(model, param, data):
+    """
+    Add mutable parameters of the sweep to the optimization model.
+
+    The changes of the prices are added to the objective and the bounds
+    depending on the capacities are replaced by constraints with the mutable
+    capacities.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+    """
+    values = base_values(param)
+    flows = {(str(i), str(o)): (i, o) for i, o in model.flows}
+    weighting = model.objective_weighting
+
+    block = po.Block()
+    model.add_component('SweepBlock', block)
+    block.base_values = values
+    block.value = po.Param(
+        SWEEP_PARAMETERS, initialize=values, mutable=True
+        )
+    block.constraints = {key: list() for key in SWEEP_PARAMETERS}
+
+    # Objective
+    gas_price = block.value['gas_price'] - values['gas_price']
+    co2_price = block.value['co2_price'] - values['co2_price']
+    heat_price = block.value['heat_price'] - values['heat_price']
+    spot_price = block.value['el_spot_price'] - values['el_spot_price']
+
+    cost = 0
+    for t in model.TIMESTEPS:
+        cost += (
+            model.flow[flows[('Gasquelle', 'Gasnetzwerk')] + (t,)]
+            * weighting[t]
+            * (gas_price + co2_price * param['param']['ef_gas'])
+            )
+        cost += (
+            model.flow[flows[('Stromquelle', 'Elektrizitätsnetzwerk')]
+                       + (t,)]
+            * weighting[t]
+            * (spot_price * data['el_spot_price'].iloc[t]
+               + co2_price * data['ef_om'].iloc[t])
+            )
+        cost += (
+            model.flow[flows[('Elektrizitätsnetzwerk', 'Spotmarkt')] + (t,)]
+            * weighting[t]
+            * (-spot_price * data['el_spot_price'].iloc[t])
+            )
+        cost += (
+            model.flow[flows[('Wärmenetzwerk', 'Wärmebedarf')] + (t,)]
+            * weighting[t]
+            * (-heat_price)
+            )
+    block.cost = po.Expression(expr=cost)
+
+    objective = model.objective.expr
+    model.del_component(model.objective)
+    model.objective = po.Objective(
+        sense=po.minimize, expr=objective + block.cost
+        )
+
+    # Capacities
+    block.capacity = po.ConstraintList()
+    if param['TES']['active']:
+        storage_block = model.GenericStorageBlock
+        for n in storage_block.STORAGES:
+            if not str(n.label).startswith('TES_'):
+                continue
+            for t in model.TIMESTEPS:
+                storage_block.storage_content[n, t].setub(None)
+                block.constraints['TES.Q'].append(block.capacity.add(
+                    storage_block.storage_content[n, t]
+                    <= block.value['TES.Q'] * n.max_storage_level[t]
+                    ))
+            storage_block.init_content[n].setub(None)
+            if n.initial_storage_level is not None:
+                storage_block.init_content[n].unfix()
+                block.constraints['TES.Q'].append(block.capacity.add(
+                    storage_block.init_content[n]
+                    == block.value['TES.Q'] * n.initial_storage_level
+                    ))
+
+            i = list(n.inputs)[0]
+            block.constraints['TES.Q_N_in'] += mutable_nominal_value(
+                model, block.capacity, (i, n), block.value['TES.Q_N_in'],
+                scale_min=True
+                )
+
+    if param['HP']['active'] and param['HP']['type'] == 'constant':
+        for (i, o) in flows.values():
+            if str(o.label).startswith('HP_'):
+                # The presolve bounds the heat output by the base capacity
+                for heat_bus in o.outputs:
+                    for t in model.TIMESTEPS:
+                        model.flow[o, heat_bus, t].setub(None)
+                block.constraints['HP.P_max'] += mutable_nominal_value(
+                    model, block.capacity, (i, o), block.value['HP.P_max'],
+                    scale_min=False
+                    )
+
+
+def mutable_nominal_value(model, constraints, flow, nominal_value,
+                          scale_min=True):
+    """
+    Replace the nominal value of a NonConvex flow by a mutable parameter.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    constraints : pyomo.ConstraintList
+        Constraint list the new constraints are added to.
+
+    flow : tuple
+        Input and output node of the flow.
+
+    nominal_value : pyomo.Param
+        Mutable nominal value of the flow.
+
+    scale_min : bool
+        Scale the minimal flow with the nominal value. Otherwise the absolute
+        minimal flow is kept.
+
+    Returns
+    -------
+    list
+        New constraints depending on the nominal value.
+    """
+    i, o = flow
+    nonconvex_block = model.NonConvexFlow
+    new_constraints = list()
+    for t in model.TIMESTEPS:
+        model.flow[i, o, t].setub(None)
+        if (i, o, t) in nonconvex_block.max:
+            nonconvex_block.max[i, o, t].deactivate()
+        new_constraints.append(constraints.add(
+            model.flow[i, o, t]
+            <= (nonconvex_block.status[i, o, t] * model.flows[i, o].max[t]
+                * nominal_value)
+            ))
+        if scale_min:
+            if (i, o, t) in nonconvex_block.min:
+                nonconvex_block.min[i, o, t].deactivate()
+            new_constraints.append(constraints.add(
+                model.flow[i, o, t]
+                >= (nonconvex_block.status[i, o, t]
+                    * model.flows[i, o].min[t] * nominal_value)
+                ))
+    return new_constraints
+
+
+def set_sweep_point(model, point):
+    """
+    Set mutable parameters of the model to the values of a sweep point.
+
+    Parameters not given in the point are reset to their base value.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model with sweep parameters.
+
+    point : dict
+        Values of the sweep parameters.
+
+    Returns
+    -------
+    list
+        Constraints depending on the changed capacities.
+    """
+    block = model.SweepBlock
+    changed_constraints = list()
+    for key in SWEEP_PARAMETERS:
+        val = point.get(key, block.base_values[key])
+        if po.value(block.value[key]) != val:
+            block.value[key] = val
+            changed_constraints += block.constraints[key]
+    return changed_constraints
+
+
+def sweep(param, data, points, resolution=1, solver='gurobi',
+          solver_profile='default', tee=True, **settings):
+    """
+    Solve the Generic Model for all points of a price or capacity sweep.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    points : list of dict
+        Values of the sweep parameters of every point, e.g.
+        [{'gas_price': 20}, {'gas_price': 30}]. The spot market price is
+        given as scaling factor of the time series.
+
+    resolution : int
+        Length of the time steps of the optimization in hours.
+
+    solver : str
+        Name of the solver. Gurobi and HiGHS keep their instance between
+        the points, other solvers get the model passed for every point.
+
+    solver_profile : str
+        Name of the tuning profile in solver.SOLVER_PROFILES.
+
+    tee : bool
+        Show output of the solver.
+
+    **settings
+        Generic solver settings overwriting the ones of the profile.
+
+    Returns
+    -------
+    list of tuple
+        data_dhs, data_invest, data_emission, data_cost_units and
+        meta_results of every point as returned by main().
+    """
+    param = resample_param(param, resolution)
+    data = resample_data(data, resolution)
+
+    model = build_model(param, data)
+    add_sweep_parameters(model, param, data)
+
+    opt = None
+    if solver in PERSISTENT_SOLVERS:
+        opt = persistent_solver(
+            model, solver=solver, profile=solver_profile, tee=tee, **settings
+            )
+
+    sweep_results = list()
+    for point in points:
+        point_param, point_data = sweep_scenario(param, data, point)
+        changed_constraints = set_sweep_point(model, point)
+
+        if opt is not None:
+            opt.update(changed_constraints, model.SweepBlock.cost)
+            status = opt.solve()
+        else:
+            status = solve(
+                model, solver=solver, profile=solver_profile, tee=tee,
+                **settings
+                )
+
+        results, meta_results = get_results(
+            model, result_subset=POSTPROCESSING_SUBSET
+            )
+        meta_results['status'] = status
+        sweep_results.append(
+            (*postprocessing(results, point_param, point_data), meta_results)
+            )
+
+    return sweep_results
+
+
+def check_sweep_point(param, data, point, resolution=1, solver='gurobi',
+                      solver_profile='default', tolerance=1e-6,
+                      **settings):
+    """
+    Compare the objective of a sweep point with the one of a rebuilt model.
+
+    The base values are solved first, so that the point is solved with
+    changed mutable parameters like in a sweep. A warning is given, if the
+    objectives deviate by more than the tolerance. They are only comparable
+    for optimal solutions, e.g. with a MIP gap of zero.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    point : dict
+        Values of the sweep parameters deviating from the base values, e.g.
+        {'HP.P_max': 20}.
+
+    resolution : int
+        Length of the time steps of the optimization in hours.
+
+    solver : str
+        Name of the solver.
+
+    solver_profile : str
+        Name of the tuning profile in solver.SOLVER_PROFILES.
+
+    tolerance : float
+        Maximal relative deviation of the objectives.
+
+    **settings
+        Generic solver settings overwriting the ones of the profile.
+
+    Returns
+    -------
+    float
+        Relative deviation of the objectives.
+    """
+    *_, sweep_meta = sweep(
+        param, data, [dict(), point], resolution=resolution, solver=solver,
+        solver_profile=solver_profile, tee=False, **settings
+        )[-1]
+    point_param, point_data = sweep_scenario(param, data, point)
+    *_, rebuilt_meta = main(
+        point_param, point_data, resolution=resolution, solver=solver,
+        solver_profile=solver_profile, tee=False, **settings
+        )
+
+    sweep_objective = sweep_meta['objective']
+    rebuilt_objective = rebuilt_meta['objective']
+    deviation = (
+        abs(sweep_objective - rebuilt_objective)
+        / max(abs(rebuilt_objective), 1)
+        )
+    if deviation > tolerance:
+        warnings.warn(
+            f"The objective {sweep_objective} of the sweep point {point} "
+            + f"deviates from the objective {rebuilt_objective} of the "
+            + "rebuilt model."
+            )
+    return deviation
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the symmetry breaking of identical units of Generic Model energy
+system.
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+from unit_aggregation import (
+    SYMMETRY_UNITS, UNIT_LABELS, identical_units, symmetric_units
+    )
+
+
+def storage_param(init_storage, init_status=0):
+    """Get parameters with two seasonal storages with symmetry breaking."""
+    param = {
+        comp: {'active': False, 'amount': 1}
+        for comp in [*UNIT_LABELS, *SYMMETRY_UNITS]
+        }
+    param['TES'] = {
+        'active': True, 'amount': 2, 'symmetry_breaking': True, 'Q': 2000,
+        'init_storage': init_storage, 'init_status': init_status,
+        'balanced': True
+        }
+    return param
+
+
+def test_identical_storages_are_ordered():
+    param = storage_param(0.1)
+    assert identical_units(param, 'TES')
+    assert symmetric_units(param) == {'TES': ['TES_1', 'TES_2']}
+
+
+def test_equal_storage_levels_per_unit_are_ordered():
+    param = storage_param([0.1, 0.1], init_status=[0, 0])
+    assert symmetric_units(param) == {'TES': ['TES_1', 'TES_2']}
+
+
+def test_unequal_storage_levels_are_not_ordered():
+    param = storage_param([0.1, 0.4])
+    assert not identical_units(param, 'TES')
+    assert symmetric_units(param) == dict()
+
+
+def test_unequal_initial_status_is_not_ordered():
+    param = storage_param(0.1, init_status=[0, 1])
+    assert symmetric_units(param) == dict()
+
+
+def test_unequal_final_storage_levels_are_not_ordered():
+    param = storage_param(0.1)
+    param['TES']['final_storage'] = [0.1, 0.2]
+    assert symmetric_units(param) == dict()
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+Aggregation and symmetry breaking of identical units of Generic Model
+energy system.
+
+Components with more than one unit ('amount') are modelled as identical
+labelled copies, e.g. 'BHKW_1' and 'BHKW_2'. If 'aggregate' is set in the
+parameters of the component, the units are modelled as one aggregated unit
+instead. Its operating status is the integer number of running units, so
+that the bounds of a single unit are scaled by the number of running units
+and the symmetric binaries of the copies are avoided. In the postprocessing
+the dispatch of the aggregated unit is split equally among the running
+units, which keeps the results of the single units and their labels.
+
+If 'symmetry_breaking' is set instead, the copies are kept and ordered, so
+that the solver does not search through the equivalent permutations of the
+units. The heat pumps and CHPs are ordered in every time step by their
+operating status (unit i+1 only runs if unit i runs) and their heat output.
+The seasonal storages are linked over time by their storage content, so
+they are only ordered by their charged heat over the optimization period.
+Units with different parameters, e.g. the initial storage levels per unit
+of the rolling horizon, are not identical and therefore not ordered.
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+import numpy as np
+from pyomo.environ import Block, ConstraintList, NonNegativeIntegers
+
+from chp_fidelity import CHP_LABELS, chp_fidelity
+from help_funcs import unit_parameters
+
+
+# Components which can be aggregated and the label of their units
+UNIT_LABELS = {
+    'EHK': 'Elektroheizkessel', 'SLK': 'Spitzenlastkessel', 'BHKW': 'BHKW',
+    'GuD': 'GuD', 'HP': 'HP', 'LT-HP': 'LT-HP'
+    }
+
+# Result variables which are the operating status of a unit
+STATUS_VARIABLES = ['status', 'Y']
+
+# Components whose separately modelled units can be ordered
+SYMMETRY_UNITS = ['BHKW', 'GuD', 'HP', 'TES']
+
+
+def aggregated_units(param):
+    """Get number of units of the components modelled as aggregated unit."""
+    return {
+        comp: param[comp]['amount'] for comp in UNIT_LABELS
+        if param[comp]['active'] and param[comp].get('aggregate', False)
+        and param[comp]['amount'] > 1
+        }
+
+
+def aggregated_amount(param, comp):
+    """Get number of units represented by each unit of the model."""
+    return aggregated_units(param).get(comp, 1)
+
+
+def unit_labels(param, comp):
+    """
+    Get labels of the units of a component in the model.
+
+    Parameters
+    ----------
+    param : dict
+        JSON parameter file of user defined constants.
+
+    comp : str
+        Name of the component, one of UNIT_LABELS.
+
+    Returns
+    -------
+    list of str
+        Label of the aggregated unit or labels of all units.
+    """
+    if comp in aggregated_units(param):
+        return [UNIT_LABELS[comp]]
+    return [
+        UNIT_LABELS[comp] + '_' + str(i)
+        for i in range(1, param[comp]['amount']+1)
+        ]
+
+
+def set_unit_counts(model, param):
+    """
+    Set the number of running units as status of the aggregated units.
+
+    The binary status of the NonConvex flows and GenericCHPs of aggregated
+    units is changed to an integer between zero and the number of units. The
+    upper bound of the NonConvex flows is scaled by the number of units, as
+    their maximum is given by the status.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    param : dict
+        JSON parameter file of user defined constants.
+    """
+    amounts = {
+        UNIT_LABELS[comp]: amount
+        for comp, amount in aggregated_units(param).items()
+        }
+    if not amounts:
+        return
+
+    variables = list()
+    if hasattr(model, 'NonConvexFlow'):
+        block = model.NonConvexFlow
+        for i, o in block.NONCONVEX_FLOWS:
+            for node in [i, o]:
+                if str(node) in amounts:
+                    variables.append((
+                        [block.status[i, o, t] for t in model.TIMESTEPS],
+                        amounts[str(node)]
+                        ))
+                    for t in model.TIMESTEPS:
+                        flow = model.flow[i, o, t]
+                        if flow.ub is not None:
+                            flow.setub(flow.ub * amounts[str(node)])
+    if hasattr(model, 'GenericCHPBlock'):
+        block = model.GenericCHPBlock
+        for n in block.GENERICCHPS:
+            if str(n) in amounts:
+                variables.append((
+                    [block.Y[n, t] for t in model.TIMESTEPS], amounts[str(n)]
+                    ))
+
+    for status, amount in variables:
+        for var in status:
+            var.domain = NonNegativeIntegers
+            var.setub(amount)
+
+
+def identical_units(param, comp):
+    """Check whether all units of a component have the same parameters."""
+    first = unit_parameters(param[comp], 1)
+    return all(
+        unit_parameters(param[comp], nr) == first
+        for nr in range(2, param[comp]['amount']+1)
+        )
+
+
+def symmetric_units(param):
+    """Get labels of the units of the components with symmetry breaking."""
+    return {
+        comp: [comp + '_' + str(i) for i in range(1, param[comp]['amount']+1)]
+        for comp in SYMMETRY_UNITS
+        if param[comp]['active']
+        and param[comp].get('symmetry_breaking', False)
+        and comp not in aggregated_units(param) and param[comp]['amount'] > 1
+        and (comp not in CHP_LABELS or chp_fidelity(param, comp) == 'milp')
+        and identical_units(param, comp)
+        }
+
+
+def symmetry_variables(comp, label):
+    """
+    Get the variables of a unit ordered by the symmetry breaking.
+
+    Parameters
+    ----------
+    comp : str
+        Name of the component, one of SYMMETRY_UNITS.
+
+    label : str
+        Label of the unit.
+
+    Returns
+    -------
+    tuple
+        Result key and name of the ordered flow and of the operating status
+        (None for the storages).
+    """
+    if comp == 'TES':
+        return (('TES Knoten', label), 'flow'), None
+    flow = ((label, 'Wärmenetzwerk'), 'flow')
+    if comp == 'HP':
+        return flow, (('Elektrizitätsnetzwerk', label), 'status')
+    return flow, ((label, None), 'Y')
+
+
+def model_variables(model, key, name):
+    """
+    Get the variables of a result key and name of the solph model.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    key : tuple of str
+        Labels of the nodes of the result key.
+
+    name : str
+        Name of the variable, either 'flow', 'status', 'storage_content' or
+        a variable of the GenericCHP, e.g. 'Y'.
+
+    Returns
+    -------
+    list
+        Variables of all time steps.
+    """
+    nodes = {str(n): n for n in model.es.nodes}
+    source, target = (nodes.get(label) for label in key)
+    if name == 'flow':
+        return [model.flow[source, target, t] for t in model.TIMESTEPS]
+    if name == 'status':
+        return [
+            model.NonConvexFlow.status[source, target, t]
+            for t in model.TIMESTEPS
+            ]
+    if name == 'storage_content':
+        block = getattr(model, 'GenericStorageBlock', None)
+        if block is None or source not in block.STORAGES:
+            block = model.GenericInvestmentStorageBlock
+        return [block.storage_content[source, t] for t in model.TIMESTEPS]
+    variable = getattr(model.GenericCHPBlock, name)
+    return [variable[source, t] for t in model.TIMESTEPS]
+
+
+def add_symmetry_breaking(model, param):
+    """
+    Order the separately modelled units of the components.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    param : dict
+        JSON parameter file of user defined constants.
+    """
+    units = symmetric_units(param)
+    if not units:
+        return
+
+    block = Block()
+    model.add_component('SymmetryBreakingBlock', block)
+    block.commitment = ConstraintList()
+    block.output = ConstraintList()
+    block.charged_heat = ConstraintList()
+
+    for comp, labels in units.items():
+        for first, second in zip(labels[:-1], labels[1:]):
+            (flow_1, status_1), (flow_2, status_2) = (
+                symmetry_variables(comp, label) for label in [first, second]
+                )
+            if status_1 is None:
+                block.charged_heat.add(
+                    sum(model_variables(model, *flow_2))
+                    <= sum(model_variables(model, *flow_1))
+                    )
+                continue
+            for var_1, var_2 in zip(model_variables(model, *status_1),
+                                    model_variables(model, *status_2)):
+                block.commitment.add(var_2 <= var_1)
+            for var_1, var_2 in zip(model_variables(model, *flow_1),
+                                    model_variables(model, *flow_2)):
+                block.output.add(var_2 <= var_1)
+
+
+def running_units(results, amounts):
+    """
+    Get number of running units of the aggregated units per time step.
+
+    Units without operating status are running all together.
+
+    Parameters
+    ----------
+    results : dict of pandas.Series and pandas.DataFrame
+        Full results from solph.processing.results() call.
+
+    amounts : dict
+        Number of units of the aggregated units by label.
+
+    Returns
+    -------
+    dict of numpy.ndarray
+        Number of running units by label of the aggregated unit.
+    """
+    counts = dict()
+    for key, res in results.items():
+        labels = [str(node) for node in key if node is not None]
+        for label in set(labels) & set(amounts):
+            sequences = res['sequences']
+            status = [col for col in STATUS_VARIABLES if col in sequences]
+            if status:
+                counts[label] = np.clip(
+                    np.round(sequences[status[0]].to_numpy()), 0,
+                    amounts[label]
+                    )
+            elif label not in counts:
+                counts[label] = np.full(len(sequences), amounts[label])
+    return counts
+
+
+def disaggregate_units(results, param):
+    """
+    Split the results of the aggregated units among their single units.
+
+    The dispatch of an aggregated unit is split equally among the running
+    units, which are the first units by their number. The status of each
+    unit is whether it is running.
+
+    Parameters
+    ----------
+    results : dict of pandas.Series and pandas.DataFrame
+        Full results from solph.processing.results() call.
+
+    param : dict
+        JSON parameter file of user defined constants.
+
+    Returns
+    -------
+    dict of pandas.Series and pandas.DataFrame
+        Results with the single units instead of the aggregated units keyed
+        by the labels of the nodes.
+    """
+    amounts = {
+        UNIT_LABELS[comp]: amount
+        for comp, amount in aggregated_units(param).items()
+        }
+    if not amounts:
+        return results
+
+    counts = running_units(results, amounts)
+    disaggregated = dict()
+    for key, res in results.items():
+        labels = tuple(
+            str(node) if node is not None else None for node in key
+            )
+        label = next((lbl for lbl in labels if lbl in amounts), None)
+        if label is None:
+            disaggregated[key] = res
+            continue
+
+        count = counts[label]
+        share = np.divide(
+            1, count, out=np.zeros(len(count)), where=count > 0
+            )
+        for i in range(1, amounts[label]+1):
+            running = (count >= i).astype(float)
+            sequences = res['sequences'].copy()
+            for col in sequences.columns:
+                if col in STATUS_VARIABLES:
+                    sequences[col] = running
+                else:
+                    sequences[col] = sequences[col] * share * running
+            unit_key = tuple(
+                label + '_' + str(i) if lbl == label else lbl
+                for lbl in labels
+                )
+            disaggregated[unit_key] = {
+                'scalars': res['scalars'].copy(), 'sequences': sequences
+                }
+    return disaggregated
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Warm start cache for Generic Model energy system.
+
+The binary variables of solved scenarios (status of the NonConvex flows of
+HP, TES and ST-TES and the operating status of the GenericCHPs) are stored
+in a cache directory. A new scenario is started from the cached solution of
+the same or the most similar scenario with the same binary variables.
+
+@author: Malte Fritz & Jonas Freißmann
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from help_funcs import flatten_param
+
+
+def scenario_fingerprint(param, data):
+    """Get hash of the parameters and the time dependent parameters."""
+    sha = hashlib.sha256()
+    sha.update(json.dumps(param, sort_keys=True, default=str).encode())
+    sha.update(json.dumps(list(data.columns), default=str).encode())
+    sha.update(pd.util.hash_pandas_object(data).to_numpy().tobytes())
+    return sha.hexdigest()
+
+
+def scenario_features(param, data):
+    """Get numeric parameters and mean of each time series of a scenario."""
+    features = {
+        key: float(value) for key, value in flatten_param(param).items()
+        if isinstance(value, (bool, int, float))
+        }
+    for col in data.columns:
+        features['data.' + str(col)] = float(data[col].mean())
+    return features
+
+
+def scenario_distance(features, other_features):
+    """Get sum of the relative deviations of two scenarios' features."""
+    distance = 0
+    for key in set(features) | set(other_features):
+        if key not in features or key not in other_features:
+            distance += 1
+            continue
+        scale = max(abs(features[key]), abs(other_features[key]))
+        if scale > 0:
+            distance += abs(features[key] - other_features[key]) / scale
+    return distance
+
+
+def binary_variables(model):
+    """
+    Get binary variables of the model per flow or CHP.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    Returns
+    -------
+    dict of list
+        Binary variables of all time steps with the labels of the flow or
+        the CHP joined by '->' as key.
+    """
+    variables = dict()
+    if hasattr(model, 'NonConvexFlow'):
+        block = model.NonConvexFlow
+        for i, o in block.NONCONVEX_FLOWS:
+            variables[f'{i}->{o}'] = [
+                block.status[i, o, t] for t in model.TIMESTEPS
+                ]
+    if hasattr(model, 'GenericCHPBlock'):
+        block = model.GenericCHPBlock
+        for n in block.GENERICCHPS:
+            variables[str(n)] = [block.Y[n, t] for t in model.TIMESTEPS]
+    return variables
+
+
+def binary_structure(variables):
+    """Get hash of the names and lengths of the binary variables."""
+    structure = sorted((key, len(var)) for key, var in variables.items())
+    return hashlib.sha256(json.dumps(structure).encode()).hexdigest()
+
+
+def load_warm_start(model, cache_dir, param, data):
+    """
+    Set binary variables of the model to the nearest cached solution.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Optimization model of the Generic Model.
+
+    cache_dir : str
+        Directory of the warm start cache.
+
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+
+    Returns
+    -------
+    bool
+        True if a cached solution was loaded as warm start.
+    """
+    if not os.path.isdir(cache_dir):
+        return False
+
+    variables = binary_variables(model)
+    if not variables:
+        return False
+    structure = binary_structure(variables)
+    fingerprint = scenario_fingerprint(param, data)
+    features = scenario_features(param, data)
+
+    nearest = None
+    min_distance = np.inf
+    for file in os.listdir(cache_dir):
+        if not file.endswith('.json'):
+            continue
+        with open(os.path.join(cache_dir, file), 'r') as infile:
+            entry = json.load(infile)
+        if entry['structure'] != structure:
+            continue
+        if entry['fingerprint'] == fingerprint:
+            nearest = entry['fingerprint']
+            break
+        distance = scenario_distance(features, entry['features'])
+        if distance < min_distance:
+            nearest = entry['fingerprint']
+            min_distance = distance
+
+    if nearest is None:
+        return False
+
+    with np.load(os.path.join(cache_dir, nearest + '.npz')) as statuses:
+        for key, var in variables.items():
+            for var_t, value in zip(var, statuses[key]):
+                if not var_t.fixed:
+                    var_t.value = int(value)
+    return True
+
+
+def save_warm_start(model, cache_dir, param, data):
+    """
+    Store binary variables of the solved model in the cache.
+
+    Parameters
+    ----------
+    model : solph.Model
+        Solved optimization model of the Generic Model.
+
+    cache_dir : str
+        Directory of the warm start cache.
+
+    param : dict
+        JSON parameter file of user defined constants.
+
+    data : pandas.DataFrame
+        csv file of user defined time dependent parameters.
+    """
+    variables = binary_variables(model)
+    if not variables:
+        return
+
+    statuses = dict()
+    for key, var in variables.items():
+        values = [var_t.value for var_t in var]
+        if None in values:
+            return
+        statuses[key] = np.round(values).astype(np.int8)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    fingerprint = scenario_fingerprint(param, data)
+    np.savez_compressed(
+        os.path.join(cache_dir, fingerprint + '.npz'), **statuses
+        )
+    entry = {
+        'fingerprint': fingerprint,
+        'structure': binary_structure(variables),
+        'features': scenario_features(param, data)
+        }
+    with open(os.path.join(cache_dir, fingerprint + '.json'), 'w') as file:
+        json.dump(entry, file, indent=4)
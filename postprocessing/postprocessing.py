@@ -5,12 +5,51 @@ Created on Thu Jan 16 14:23:17 2020
 @author: Jonas Freißmann
 """
 import os.path as path
+from functools import lru_cache
+
 import pandas as pd
 import matplotlib.pyplot as plt
 from invest import npv, LCOH, invest_stes
 from znes_plotting import plot as zplt
 from znes_plotting import shared
 
+E_FUEL = 0.2012    # in t/MWh aus "Emissionsbewertung Daten"
+
+
+@lru_cache(maxsize=None)
+def emission_factors(file='emissions2016.csv'):
+    """Load emission factors of overall and displacement mix once.
+
+    Returns
+    -------
+    numpy.ndarray
+        Read-only emission factors in t/MWh with a row per hour and the
+        overall mix and displacement mix as columns.
+    """
+    co2 = pd.read_csv(file, sep=";", index_col=0)
+    factors = co2.to_numpy(dtype=float)
+    factors.setflags(write=False)
+    return factors
+
+
+def total_emissions(fuel, P_source, P_spot):
+    """Calculate total emissions of overall and displacement mix.
+
+    Parameters
+    ----------
+    fuel, P_source, P_spot : numpy.ndarray
+        Hourly fuel consumption, electricity purchase and electricity sale
+        in MWh, matched to the emission factors by position.
+
+    Returns
+    -------
+    numpy.ndarray
+        Total emissions of overall and displacement mix in t CO2.
+    """
+    co2 = emission_factors()[:len(fuel)]
+    emissions = fuel[:, None] * E_FUEL + (P_source - P_spot)[:, None] * co2
+    return emissions.sum(axis=0)
+
 
 def pp_Ref():
     """Calculate NPV and LCOH and generate plots for Ref system.
@@ -38,14 +77,6 @@ def pp_Ref():
                                 'Ergebnisse\\Ref_Ergebnisse\\Ref_CO2.csv'),
                       sep=";", index_col=0, parse_dates=True)
 
-    co2 = pd.read_csv('emissions2016.csv', sep=";", index_col=0,
-                      parse_dates=True)
-
-    Em_om = []
-    Em_dm = []
-
-    e_fuel = 0.2012    # in t/MWh aus "Emissionsbewertung Daten"
-
     # Ergebnisvisualisierung
     wnw = pd.read_csv(path.join(dirpath,
                                 'Ergebnisse\\Ref_Ergebnisse\\Ref_wnw.csv'),
@@ -63,20 +94,11 @@ def pp_Ref():
     print("Wärmegestehungskosten (LCOH): " + '{:.2f}'.format(lcoh) + " €/MWh")
 
     # %% Ergebnisse der Emissionsrechnung
-    for idx in range(0, len(use)):
-        OM = ((use.iloc[idx, 0] + use.iloc[idx, 1]) * e_fuel
-              + use.iloc[idx, 3] * co2.iloc[idx, 0]
-              - use.iloc[idx, 2] * co2.iloc[idx, 0])
-
-        DM = ((use.iloc[idx, 0] + use.iloc[idx, 1]) * e_fuel
-              + use.iloc[idx, 3] * co2.iloc[idx, 1]
-              - use.iloc[idx, 2] * co2.iloc[idx, 1])
-
-        Em_om.append(OM)
-        Em_dm.append(DM)
-
-    totEm_om = sum(Em_om)
-    totEm_dm = sum(Em_dm)
+    use_values = use.to_numpy(dtype=float)
+    totEm_om, totEm_dm = total_emissions(
+        use_values[:, 0] + use_values[:, 1], use_values[:, 3],
+        use_values[:, 2]
+        )
 
     dfEm = pd.DataFrame({'Gesamtmix': [totEm_om],
                          'Verdrängungsmix': [totEm_dm]})
@@ -139,14 +161,6 @@ def pp_TES():
                                 'Ergebnisse\\TES_Ergebnisse\\TES_CO2.csv'),
                       sep=";", index_col=0, parse_dates=True)
 
-    co2 = pd.read_csv('emissions2016.csv', sep=";", index_col=0,
-                      parse_dates=True)
-
-    Em_om = []
-    Em_dm = []
-
-    e_fuel = 0.2012    # in t/MWh aus "Emissionsbewertung Daten"
-
     # Ergebnisvisualisierung
     wnw = pd.read_csv(path.join(dirpath,
                                 'Ergebnisse\\TES_Ergebnisse\\TES_wnw.csv'),
@@ -167,20 +181,11 @@ def pp_TES():
     print("Wärmegestehungskosten (LCOH): " + '{:.2f}'.format(lcoh) + " €/MWh")
 
     # %% Ergebnisse der Emissionsrechnung
-    for idx in range(0, len(use)):
-        OM = ((use.iloc[idx, 0] + use.iloc[idx, 1]) * e_fuel
-              + use.iloc[idx, 3] * co2.iloc[idx, 0]
-              - use.iloc[idx, 2] * co2.iloc[idx, 0])
-
-        DM = ((use.iloc[idx, 0] + use.iloc[idx, 1]) * e_fuel
-              + use.iloc[idx, 3] * co2.iloc[idx, 1]
-              - use.iloc[idx, 2] * co2.iloc[idx, 1])
-
-        Em_om.append(OM)
-        Em_dm.append(DM)
-
-    totEm_om = sum(Em_om)
-    totEm_dm = sum(Em_dm)
+    use_values = use.to_numpy(dtype=float)
+    totEm_om, totEm_dm = total_emissions(
+        use_values[:, 0] + use_values[:, 1], use_values[:, 3],
+        use_values[:, 2]
+        )
 
     dfEm = pd.DataFrame({'Gesamtmix': [totEm_om],
                          'Verdrängungsmix': [totEm_dm]})
@@ -261,14 +266,6 @@ def pp_Sol():
                                 'Ergebnisse\\Sol_Ergebnisse\\Sol_CO2.csv'),
                       sep=";", index_col=0, parse_dates=True)
 
-    co2 = pd.read_csv('emissions2016.csv', sep=";", index_col=0,
-                      parse_dates=True)
-
-    Em_om = []
-    Em_dm = []
-
-    e_fuel = 0.2012    # in t/MWh aus "Emissionsbewertung Daten"
-
     # Ergebnisvisualisierung
     wnw = pd.read_csv(path.join(dirpath,
                                 'Ergebnisse\\Sol_Ergebnisse\\Sol_wnw.csv'),
@@ -289,20 +286,11 @@ def pp_Sol():
     print("Wärmegestehungskosten (LCOH): " + '{:.2f}'.format(lcoh) + " €/MWh")
 
     # %% Ergebnisse der Emissionsrechnung
-    for idx in range(0, len(use)):
-        OM = ((use.iloc[idx, 0] + use.iloc[idx, 1]) * e_fuel
-              + use.iloc[idx, 3] * co2.iloc[idx, 0]
-              - use.iloc[idx, 2] * co2.iloc[idx, 0])
-
-        DM = ((use.iloc[idx, 0] + use.iloc[idx, 1]) * e_fuel
-              + use.iloc[idx, 3] * co2.iloc[idx, 1]
-              - use.iloc[idx, 2] * co2.iloc[idx, 1])
-
-        Em_om.append(OM)
-        Em_dm.append(DM)
-
-    totEm_om = sum(Em_om)
-    totEm_dm = sum(Em_dm)
+    use_values = use.to_numpy(dtype=float)
+    totEm_om, totEm_dm = total_emissions(
+        use_values[:, 0] + use_values[:, 1], use_values[:, 3],
+        use_values[:, 2]
+        )
 
     dfEm = pd.DataFrame({'Gesamtmix': [totEm_om],
                          'Verdrängungsmix': [totEm_dm]})
@@ -391,9 +379,6 @@ def pp_Vorarbeit():
     use = pd.read_csv(path.join(dirpath, 'Vor_CO2.csv'),
                       sep=";", index_col=0, parse_dates=True)
 
-    co2 = pd.read_csv('emissions2016.csv', sep=";", index_col=0,
-                      parse_dates=True)
-
     znescolors = {
         'darkblue': '#00395B',
         'red': '#B54036',
@@ -406,11 +391,6 @@ def pp_Vorarbeit():
         'darkgrey': '#A9A9A9'
     }
 
-    Em_om = []
-    Em_dm = []
-
-    e_fuel = 0.2012    # in t/MWh aus "Emissionsbewertung Daten"
-
     # Ergebnisvisualisierung
     wnw = pd.read_csv(path.join(dirpath, 'Vor_wnw.csv'),
                       sep=";", index_col=0, parse_dates=True)
@@ -430,20 +410,10 @@ def pp_Vorarbeit():
     print("Wärmegestehungskosten (LCOH): " + '{:.2f}'.format(lcoh) + " €/MWh")
 
     # %% Ergebnisse der Emissionsrechnung
-    for idx in range(0, len(use)):
-        OM = (use.iloc[idx, 0] * e_fuel
-              + use.iloc[idx, 2] * co2.iloc[idx, 0]
-              - use.iloc[idx, 1] * co2.iloc[idx, 0])
-
-        DM = (use.iloc[idx, 0] * e_fuel
-              + use.iloc[idx, 2] * co2.iloc[idx, 1]
-              - use.iloc[idx, 1] * co2.iloc[idx, 1])
-
-        Em_om.append(OM)
-        Em_dm.append(DM)
-
-    totEm_om = sum(Em_om)
-    totEm_dm = sum(Em_dm)
+    use_values = use.to_numpy(dtype=float)
+    totEm_om, totEm_dm = total_emissions(
+        use_values[:, 0], use_values[:, 2], use_values[:, 1]
+        )
 
     dfEm = pd.DataFrame({'Gesamtmix': [totEm_om],
                          'Verdrängungsmix': [totEm_dm]})